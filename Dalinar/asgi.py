@@ -2,6 +2,10 @@
 ASGI config for Dalinar project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The web process is served through it (see Procfile), so streaming responses such as
+job progress events (api.views.JobEvents) don't hold a worker thread while they wait.
+Downloads are streamed with async iterators (see streaming_content in api/views.py), as
+Django buffers sync iterators of streaming responses entirely under ASGI.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -1,5 +1,7 @@
 from pathlib import Path
 import os
+import tempfile
+from botocore.config import Config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -27,6 +29,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # Search lookups, see api/search.py
     
     'allauth',
     'allauth.account',
@@ -159,6 +162,51 @@ AWS_QUERYSTRING_AUTH = True
 
 AWS_DEFAULT_ACL =  "public-read"
 
+# Number of loaded Keras models kept in memory per process for prediction and evaluation (see api/model_cache.py)
+TF_MODEL_CACHE_SIZE = 8
+
+# Model files are written to and read from storage through buffers kept in memory up to this size (see api/model_store.py)
+MODEL_BUFFER_MAX_MEMORY = 64 * 1024 ** 2
+
+# Seconds between progress updates of training jobs, and between checks for updates by JobEvents streams (see api/jobs.py)
+JOB_PROGRESS_INTERVAL = 0.5
+JOB_EVENTS_POLL_INTERVAL = 0.5
+JOB_EVENTS_HEARTBEAT = 15   # Seconds between comments sent to keep idle streams open through proxies
+
+# Running jobs whose worker hasn't renewed their lease for this many seconds (e.g. killed workers) are claimed by other workers,
+# training continues from its last checkpoint. Jobs are failed after being claimed JOB_MAX_ATTEMPTS times
+JOB_LEASE_SECONDS = 120
+JOB_MAX_ATTEMPTS = 3
+
+# Weights are saved to storage every this many epochs while training, so interrupted training can be resumed (see api/checkpoints.py)
+TRAINING_CHECKPOINT_INTERVAL = 1
+
+# Element files downloaded for training and evaluation are cached on local disk (see api/file_cache.py)
+ELEMENT_FILE_CACHE_DIR = os.path.join(tempfile.gettempdir(), "dalinar-element-cache")
+ELEMENT_FILE_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Images decoded and resized to a model's input shape, reused between training and evaluation runs (see api/tensor_cache.py)
+PREPROCESSED_DATASET_CACHE_DIR = os.path.join(tempfile.gettempdir(), "dalinar-preprocessed-datasets")
+PREPROCESSED_DATASET_CACHE_MAX_BYTES = 8 * 1024 ** 3
+
+# Element files are uploaded by a bounded pool of threads (see api/uploads.py). MediaStore keeps one boto3 resource per thread,
+# while get_s3_client in api/views.py is a single client shared by all threads. Both are created with AWS_S3_CLIENT_CONFIG
+ELEMENT_UPLOAD_WORKERS = 16
+
+# Images sent to batch prediction are decoded (and element files downloaded) by a shared pool of threads (see PredictModelBatch)
+PREDICTION_WORKERS = 8
+
+# Dataset exports read element files with a bounded pool of threads, TFRecord exports are stored under DATASET_EXPORT_DIR (see api/export.py)
+DATASET_EXPORT_WORKERS = 8
+DATASET_EXPORT_DIR = "exports"
+DATASET_EXPORT_SHARD_SIZE = 1000    # Elements per TFRecord shard when the number of shards isn't specified
+DATASET_EXPORT_PROGRESS_INTERVAL = 100  # TFRecord exports are built by jobs, which report their progress every this many elements
+
+AWS_S3_CLIENT_CONFIG = Config(
+    max_pool_connections=ELEMENT_UPLOAD_WORKERS * 2 + DATASET_EXPORT_WORKERS,    # Per client, the shared client is used by uploads, existence checks and exports
+    retries={"max_attempts": 10, "mode": "adaptive"}    # Backs off and rate limits client side when S3 throttles (SlowDown)
+)
+
 if PRODUCTION:
     AWS_LOCATION = 'static'
     STATICFILES_DIRS = [
@@ -2,4 +2,11 @@ from storages.backends.s3boto3 import S3Boto3Storage
 
 class MediaStore(S3Boto3Storage):
     location = 'media'
-    file_overwrite = False
\ No newline at end of file
+    file_overwrite = False
+    
+    @property
+    def bucket(self):   # One per thread like the connection, as boto3 resources aren't thread safe (the default caches the first thread's)
+        bucket = getattr(self._connections, "bucket", None)
+        if bucket is None:
+            bucket = self._connections.bucket = self.connection.Bucket(self.bucket_name)
+        return bucket
@@ -8,4 +8,6 @@ admin.site.register(Element)
 admin.site.register(Label)
 admin.site.register(Area)
 admin.site.register(Model)
-admin.site.register(Layer)
\ No newline at end of file
+admin.site.register(Layer)
+admin.site.register(Job)
+admin.site.register(TrainingCheckpoint)
\ No newline at end of file
@@ -0,0 +1,100 @@
+import random
+
+import tensorflow as tf
+from django.conf import settings
+
+from .models import TrainingCheckpoint
+from . import model_store
+
+
+class CheckpointCallback(tf.keras.callbacks.Callback):  # Saves weights to checkpoint during training
+    """
+    Weights are saved every TRAINING_CHECKPOINT_INTERVAL epochs and when training ends (also when stopped
+    early or cancelled), and separately whenever val_accuracy improves, so the best epoch can be restored
+    afterwards. Replaced weights files are deleted in the background.
+    """
+    def __init__(self, checkpoint):
+        super().__init__()
+        self.checkpoint = checkpoint
+        self.history = {key: list(values) for key, values in checkpoint.history.items()}
+
+    def on_epoch_end(self, epoch, logs=None):
+        logs = logs or {}
+        checkpoint = self.checkpoint
+        for key, value in logs.items():
+            self.history.setdefault(key, []).append(float(value))
+
+        fields = []
+        val_accuracy = logs.get("val_accuracy")
+        if val_accuracy is not None and (checkpoint.best_val_accuracy is None or val_accuracy > checkpoint.best_val_accuracy):
+            replace_weights(self.model, checkpoint.best_weights_file, "best-epoch-" + str(epoch + 1))
+            checkpoint.best_epoch = epoch + 1
+            checkpoint.best_val_accuracy = float(val_accuracy)
+            fields += ["best_weights_file", "best_epoch", "best_val_accuracy"]
+
+        if (epoch + 1) % settings.TRAINING_CHECKPOINT_INTERVAL == 0:
+            fields += self.save_epoch(epoch + 1)
+
+        if fields:
+            checkpoint.save(update_fields=fields + ["updated_at"])
+
+    def on_train_end(self, logs=None):
+        epochs = len(self.history.get("loss", []))
+        if epochs > self.checkpoint.epoch:
+            self.checkpoint.save(update_fields=self.save_epoch(epochs) + ["updated_at"])
+
+    def save_epoch(self, epoch):    # Saves the weights after epoch (counted from 1), returns the changed fields
+        checkpoint = self.checkpoint
+        replace_weights(self.model, checkpoint.weights_file, "epoch-" + str(epoch))
+        checkpoint.epoch = epoch
+        checkpoint.history = {key: values[:epoch] for key, values in self.history.items()}
+        return ["weights_file", "epoch", "history"]
+
+
+def replace_weights(model, file_field, name):
+    old_name = file_field.name
+    model_store.save_weights(model, file_field, name)
+    if old_name:
+        model_store.delete_stored_file(old_name)
+
+
+def start_training(model_instance, label_mapping, validation_split, dataset=None, tensorflow_dataset="", resume=True):     # Returns the checkpoint to train with
+    """
+    With resume, the checkpoint of an earlier, interrupted run is returned if it trained the same version of
+    the model on the same data and labels, and training continues after its last saved epoch (see resume_training).
+    Otherwise earlier checkpoints of the model are deleted and a new one is created.
+    """
+    checkpoints = TrainingCheckpoint.objects.filter(model=model_instance)
+    if resume:
+        checkpoint = checkpoints.filter(dataset=dataset, tensorflow_dataset=tensorflow_dataset or "", model_file=model_instance.model_file.name,
+                                        validation_split=validation_split, epoch__gt=0).order_by("-updated_at").first()
+        if checkpoint is not None and checkpoint.label_mapping == label_mapping:
+            return checkpoint
+
+    for checkpoint in checkpoints:  # Deleted one by one so their files are deleted
+        checkpoint.delete()
+    return TrainingCheckpoint.objects.create(model=model_instance, dataset=dataset, tensorflow_dataset=tensorflow_dataset or "",
+                                             model_file=model_instance.model_file.name, validation_split=validation_split,
+                                             seed=random.randrange(2 ** 31), label_mapping=label_mapping)
+
+
+def resume_training(model, checkpoint):     # Loads the checkpoint's weights into model, returns the epoch to continue from
+    if checkpoint.epoch and checkpoint.weights_file:
+        model_store.load_weights(model, checkpoint.weights_file.name)
+        return checkpoint.epoch
+    return 0
+
+
+def finish_training(model, checkpoint, restore_best=False):    # Returns the Keras history of all epochs, and the epoch model ends up with
+    """
+    With restore_best, the weights of the epoch with the highest val_accuracy are loaded into model.
+    The checkpoint is deleted, as the model file is saved after training.
+    """
+    epoch = checkpoint.epoch
+    if restore_best and checkpoint.best_weights_file:
+        model_store.load_weights(model, checkpoint.best_weights_file.name)
+        epoch = checkpoint.best_epoch
+
+    history = checkpoint.history
+    checkpoint.delete()
+    return history, epoch
@@ -0,0 +1,254 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import tempfile
+import zipfile
+
+import tensorflow as tf
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+
+EXPORT_LAYOUTS = ("folders", "files", "area")
+NO_LABEL_FOLDER = "No_Label"
+
+# Shared by all exports so the number of concurrent storage reads stays bounded per process
+EXPORT_EXECUTOR = ThreadPoolExecutor(max_workers=settings.DATASET_EXPORT_WORKERS, thread_name_prefix="dataset-export")
+
+
+class StreamBuffer:     # Write-only file object for zipfile, emptied after every written entry
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def fetch_in_order(fetch, items):   # Yields (item, fetch(item)) in the order of items
+    """
+    Runs fetch in the shared export pool with at most twice as many items in flight as there are workers,
+    so memory use doesn't depend on the size of the dataset. fetch must not query the database.
+    """
+    window = settings.DATASET_EXPORT_WORKERS * 2
+    pending = deque()
+
+    for item in items:
+        pending.append((item, EXPORT_EXECUTOR.submit(fetch, item)))
+        if len(pending) >= window:
+            item, future = pending.popleft()
+            yield item, future.result()
+
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result()
+
+
+def with_extension(name, file_name):    # Adds the extension of the stored file if name doesn't have it
+    extension = file_name.split(".")[-1]
+    if name.split(".")[-1] != extension:
+        name += "." + extension
+    return name
+
+
+def unique_name(name, used):    # Appends _2, _3, ... before the extension if name is already in the archive
+    if name not in used:
+        used[name] = 1
+        return name
+
+    base, extension = os.path.splitext(name)
+    while True:
+        used[name] += 1
+        candidate = base + "_" + str(used[name]) + extension
+        if candidate not in used:
+            used[candidate] = 1
+            return candidate
+
+
+def archive_names(elements, labels, layout):    # Returns the path of every element in the ZIP archive
+    """
+    elements are dicts with name, file and label (id or None), labels maps label ids to names.
+    folders: one folder per label (and No_Label), files: files named after their labels (label_0.png, ...),
+    area: files in the root, as when downloading from the dataset page.
+    """
+    used = {}
+    counts = {}
+    names = []
+    for element in elements:
+        label_name = labels.get(element["label"])
+
+        if layout == "folders":
+            name = (label_name or NO_LABEL_FOLDER) + "/" + with_extension(element["name"], element["file"])
+        elif layout == "files":
+            prefix = label_name if label_name else "no_label"
+            counts[prefix] = counts.get(prefix, -1) + 1
+            name = with_extension(prefix + "_" + str(counts[prefix]), element["file"])
+        else:
+            name = element["name"]
+
+        names.append(unique_name(name, used))
+    return names
+
+
+def area_annotations(elements, names, labels, areas):   # Contents of the JSON file included with area datasets
+    """Same format as created by the dataset page, every label name maps to the points of its area (or []). Unlabelled areas are left out."""
+    res = {}
+    for element, name in zip(elements, names):
+        temp = {label_name: [] for label_name in labels.values()}
+        for area in areas.get(element["id"], []):
+            if area["label"] is not None:
+                temp[labels[area["label"]]] = area["points"]
+        res[name] = temp
+    return json.dumps(res)
+
+
+def stream_zip(elements, fetch, names, extra_files=()):    # Yields the bytes of a ZIP archive as elements are fetched
+    """
+    Entries are stored without compression, as images are already compressed, and the archive is written
+    without seeking so nothing but the entries in flight is held in memory. extra_files are (name, str) pairs
+    added after the elements. Elements that could not be read are skipped and listed in errors.txt.
+    """
+    buffer = StreamBuffer()
+    errors = []
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for (element, name), (data, error) in fetch_in_order(lambda item: safe_fetch(fetch, item[0]), zip(elements, names)):
+            if error:
+                errors.append(name + ": " + error)
+                continue
+            archive.writestr(name, data)
+            yield buffer.drain()
+
+        for name, content in extra_files:
+            archive.writestr(name, content)
+        if errors:
+            archive.writestr("errors.txt", "\n".join(errors))
+    yield buffer.drain()
+
+
+def safe_fetch(fetch, element):     # Returns (data, None) or (None, error message)
+    try:
+        return fetch(element), None
+    except Exception as e:
+        return None, str(e)
+
+
+# TFRECORD
+
+def bytes_feature(values):
+    return tf.train.Feature(bytes_list=tf.train.BytesList(value=values))
+
+
+def int64_feature(values):
+    return tf.train.Feature(int64_list=tf.train.Int64List(value=values))
+
+
+def element_example(element, data, label_index, label_name, areas=None):    # Serialized tf.train.Example of an element
+    features = {
+        "element/encoded": bytes_feature([data]),
+        "element/filename": bytes_feature([element["name"].encode()]),
+        "element/id": int64_feature([element["id"]]),
+        "label/index": int64_feature([label_index]),    # -1 for unlabelled elements
+        "label/name": bytes_feature([label_name.encode()]),
+    }
+    if areas is not None:   # Area datasets, label indices (-1 for unlabelled areas) and points (as JSON) of every area
+        features["area/label_index"] = int64_feature([area["label_index"] for area in areas])
+        features["area/points"] = bytes_feature([json.dumps(area["points"]).encode() for area in areas])
+    return tf.train.Example(features=tf.train.Features(feature=features)).SerializeToString()
+
+
+def export_version(elements, labels, areas, shards):    # Hash of everything a cached TFRecord export depends on
+    digest = hashlib.sha256()
+    digest.update(repr((shards, sorted(labels))).encode())
+    for element in sorted(elements, key=lambda element: element["id"]):
+        digest.update(repr((element["id"], element["file"], element["label"], areas.get(element["id"]))).encode())
+    return digest.hexdigest()[:16]
+
+
+class ExportFailed(Exception):   # An element of a TFRecord export could not be read
+    pass
+
+
+class TFRecordExportCache:  # Sharded TFRecord exports, stored in default_storage until the dataset changes
+    """
+    Exports are stored as <directory>/<dataset id>/<version>.zip, containing the shards
+    (data-00000-of-00004.tfrecord, ...) and labels.json, the label names in label index order.
+    Older versions of a dataset's export are deleted when a new one is stored.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, dataset_id, version):
+        return self.directory + "/" + str(dataset_id) + "/" + version + ".zip"
+
+    def get(self, dataset_id, version):     # Returns the stored file name, or None
+        path = self.path(dataset_id, version)
+        return path if default_storage.exists(path) else None
+
+    def build(self, dataset_id, version, elements, fetch, label_names, label_indices, shards, areas=None, progress=None):
+        """
+        Elements are assigned to shards in turns, so every shard gets a similar mix of labels.
+        label_indices maps label ids to indices, areas maps element ids to lists of dicts with label (or None) and points.
+        Raises ExportFailed if an element can't be read, as an incomplete export would be reused until the dataset changes.
+        progress is called with (elements written, total) every DATASET_EXPORT_PROGRESS_INTERVAL elements.
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            shard_paths = [os.path.join(temp_dir, "data-%05d-of-%05d.tfrecord" % (shard, shards)) for shard in range(shards)]
+            writers = [tf.io.TFRecordWriter(path) for path in shard_paths]
+            try:
+                for position, (element, (data, error)) in enumerate(fetch_in_order(lambda element: safe_fetch(fetch, element), elements)):
+                    if error:
+                        raise ExportFailed("Could not read " + element["name"] + ": " + error)
+                    label_id = element["label"]
+                    element_areas = None
+                    if areas is not None:
+                        element_areas = [{"label_index": label_indices[area["label"]] if area["label"] is not None else -1, "points": area["points"]}
+                                         for area in areas.get(element["id"], [])]
+                    writers[position % shards].write(element_example(
+                        element, data,
+                        label_indices[label_id] if label_id is not None else -1,
+                        label_names[label_indices[label_id]] if label_id is not None else "",
+                        element_areas
+                    ))
+                    if progress and (position + 1) % settings.DATASET_EXPORT_PROGRESS_INTERVAL == 0:
+                        progress(position + 1, len(elements))
+            finally:
+                for writer in writers:
+                    writer.close()
+
+            archive_path = os.path.join(temp_dir, "export.zip")
+            with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+                for path in shard_paths:
+                    archive.write(path, os.path.basename(path))
+                archive.writestr("labels.json", json.dumps(label_names))
+
+            path = self.path(dataset_id, version)
+            with open(archive_path, "rb") as f:
+                name = default_storage.save(path, File(f))
+
+        self.remove_dataset(dataset_id, keep=name)
+        return name
+
+    def remove_dataset(self, dataset_id, keep=None):  # Deletes stored exports of a dataset, except keep
+        directory = self.directory + "/" + str(dataset_id)
+        try:
+            _, files = default_storage.listdir(directory)
+        except FileNotFoundError:
+            return
+        for file_name in files:
+            path = directory + "/" + file_name
+            if path != keep:
+                default_storage.delete(path)
+
+
+tfrecord_export_cache = TFRecordExportCache(settings.DATASET_EXPORT_DIR)
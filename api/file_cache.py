@@ -0,0 +1,70 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+
+class FileCache:    # On-disk LRU cache of storage object bytes, keyed by storage key and ETag
+    """
+    A changed object gets a new ETag and therefore a new cache entry, so entries never need to be invalidated.
+    Least recently used entries (by modification time, which is updated on every hit) are removed once the
+    cache grows above max_bytes. Entries are written atomically, so several processes can share a directory.
+    """
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.size = None    # Total size of entries, computed on first write
+        
+    def path(self, key, etag):
+        digest = hashlib.sha256((key + "\0" + etag.strip('"')).encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+    
+    def get(self, key, etag):   # Returns the cached bytes or None
+        path = self.path(key, etag)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used
+            return data
+        except FileNotFoundError:
+            return None
+        
+    def put(self, key, etag, data):
+        path = self.path(key, etag)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as temp_file:
+            temp_file.write(data)
+        os.replace(temp_file.name, path)
+        
+        with self.lock:
+            if self.size is None:
+                self.size = sum(size for _, _, size in self.entries())
+            else:
+                self.size += len(data)
+            if self.size > self.max_bytes:
+                self.evict()
+                
+    def entries(self):  # (modification time, path, size) of every entry
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    yield stat.st_mtime, path, stat.st_size
+                except FileNotFoundError:   # Removed by another process
+                    continue
+                
+    def evict(self):    # Removes least recently used entries until the cache is below 90% of max_bytes
+        entries = sorted(self.entries())
+        self.size = sum(size for _, _, size in entries)
+        
+        for _, path, size in entries:
+            if self.size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
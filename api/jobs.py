@@ -0,0 +1,219 @@
+import json
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+import traceback
+
+import tensorflow as tf
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+from .views import trainModelDatasetInstance, trainModelTensorflowDataset, evaluateModelDatasetInstance, resize_dataset_elements, export_dataset_tfrecord
+from .export import ExportFailed
+
+
+class JobFailed(Exception):
+    pass
+
+
+def cancel_requested(job):
+    return Job.objects.filter(id=job.id, cancel_requested=True).exists()
+
+
+def lease_expiry():
+    return timezone.now() + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+
+
+def renew_lease(job):
+    Job.objects.filter(id=job.id, status="running").update(lease_expires_at=lease_expiry())
+
+
+def set_progress(job, progress):
+    Job.objects.filter(id=job.id).update(progress=min(max(progress, 0.0), 1.0), lease_expires_at=lease_expiry())
+
+
+class JobProgressCallback(tf.keras.callbacks.Callback):     # Publishes the progress of training jobs and stops training when the job is cancelled
+    """
+    Loss, accuracy, throughput (samples per second) and ETA are written to job.progress_info after batches,
+    at most every JOB_PROGRESS_INTERVAL seconds, and after every epoch, renewing the job's lease. Clients follow them through JobEvents.
+    batch_size is that of the training data, used for the throughput.
+    """
+    def __init__(self, job, epochs, batch_size=32):
+        super().__init__()
+        self.job = job
+        self.epochs = max(epochs, 1)
+        self.batch_size = batch_size
+        self.epoch = 0
+        self.started = time.monotonic()
+        self.batches_done = 0
+        self.last_published = 0.0
+        
+    def on_train_begin(self, logs=None):
+        self.started = time.monotonic()
+        self.batches_done = 0
+        
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch = epoch
+        
+    def on_train_batch_end(self, batch, logs=None):
+        self.batches_done += 1
+        if time.monotonic() - self.last_published >= settings.JOB_PROGRESS_INTERVAL:
+            self.publish(batch + 1, logs)
+        
+    def on_epoch_end(self, epoch, logs=None):
+        self.publish(self.params.get("steps") or self.batches_done, logs, epoch_done=True)
+        if cancel_requested(self.job):
+            self.model.stop_training = True
+            
+    def publish(self, batch, logs, epoch_done=False):
+        now = time.monotonic()
+        elapsed = now - self.started
+        steps = self.params.get("steps")
+        
+        epoch_progress = 1.0 if epoch_done else (batch / steps if steps else 0.0)
+        info = {
+            "epoch": self.epoch + 1,
+            "epochs": self.epochs,
+            "batch": batch,
+            "batches": steps,
+            "samples_per_second": self.batches_done * self.batch_size / elapsed if elapsed > 0 else None,
+            "eta_seconds": None
+        }
+        if steps and self.batches_done:
+            remaining_batches = (self.epochs - self.epoch - epoch_progress) * steps
+            info["eta_seconds"] = remaining_batches * elapsed / self.batches_done
+        for key, value in (logs or {}).items():
+            info[key] = float(value)
+            
+        Job.objects.filter(id=self.job.id).update(progress=min(max((self.epoch + epoch_progress) / self.epochs, 0.0), 1.0), progress_info=info,
+                                                       lease_expires_at=lease_expiry())
+        self.last_published = now
+            
+            
+def response_result(response):     # Result payload of a job wrapping one of the synchronous view functions
+    data = json.loads(json.dumps(response.data, default=float))    # NumPy floats are not JSON serializable
+    if response.status_code != 200:
+        raise JobFailed(next(iter(data.values())) if isinstance(data, dict) and data else str(data))
+    return data
+
+
+def run_train_job(job):
+    params = job.params
+    user = job.owner.user
+    callbacks = [JobProgressCallback(job, params["epochs"])]
+    
+    if params["dataset"] and params["dataset"] > 0 and not params["tensorflow_dataset"]:
+        response = trainModelDatasetInstance(job.model_id, params["dataset"], params["epochs"], params["validation_split"], user, callbacks=callbacks,
+                                             resume=params.get("resume", True), restore_best=params.get("restore_best", False),
+                                             early_stopping_patience=params.get("early_stopping_patience"))
+    else:
+        response = trainModelTensorflowDataset(params["tensorflow_dataset"], job.model_id, params["epochs"], params["validation_split"], user, callbacks=callbacks)
+    return response_result(response)
+
+
+def run_evaluate_job(job):
+    return response_result(evaluateModelDatasetInstance(job.model_id, job.dataset_id, job.owner.user))
+
+
+def run_resize_dataset_job(job):
+    resized = resize_dataset_elements(job.dataset, job.params["width"], job.params["height"],
+                                      progress=lambda done, total: set_progress(job, done / total),
+                                      should_stop=lambda: cancel_requested(job))
+    return {"resized": resized}
+
+
+def run_export_tfrecord_job(job):
+    try:
+        name = export_dataset_tfrecord(job.dataset, job.params["shards"], progress=lambda done, total: set_progress(job, done / total))
+    except ExportFailed as e:
+        raise JobFailed(str(e))
+    return {"file": name}
+
+
+JOB_HANDLERS = {
+    "train": run_train_job,
+    "evaluate": run_evaluate_job,
+    "resize_dataset": run_resize_dataset_job,
+    "export_tfrecord": run_export_tfrecord_job
+}
+
+
+def claim_next_job(worker_name):     # Marks the oldest claimable job as running and returns it, or None if there is nothing to do
+    """
+    Claimable jobs are queued jobs and running jobs whose lease has expired because their worker stopped without
+    finishing them (killed, out of memory, machine restarted). Those are run again, training jobs resume from their
+    last checkpoint. Jobs that have already been claimed JOB_MAX_ATTEMPTS times are failed instead.
+    """
+    now = timezone.now()
+    claimable = Q(status="queued") | Q(status="running", lease_expires_at__lt=now)
+    for job in Job.objects.filter(claimable).order_by("created_at")[:10]:
+        # Conditional update on the values read, so only one worker can claim a job (works without SELECT FOR UPDATE)
+        unchanged = Job.objects.filter(id=job.id, status=job.status, lease_expires_at=job.lease_expires_at, attempts=job.attempts)
+        
+        if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+            unchanged.update(status="failed", error="The job was stopped " + str(job.attempts) + " times before finishing.", finished_at=now)
+            continue
+        
+        claimed = unchanged.update(status="running", worker=worker_name, started_at=now, lease_expires_at=lease_expiry(), attempts=job.attempts + 1)
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+class LeaseHeartbeat(threading.Thread):     # Renews the lease of a job while it runs, for jobs that don't report progress often
+    def __init__(self, job):
+        super().__init__(daemon=True)
+        self.job = job
+        self.finished = threading.Event()
+        
+    def run(self):
+        try:
+            while not self.finished.wait(settings.JOB_LEASE_SECONDS / 3):
+                renew_lease(self.job)
+        finally:
+            connection.close()  # Connections are per thread
+            
+    def stop(self):
+        self.finished.set()
+        self.join()
+
+
+def run_job(job):
+    handler = JOB_HANDLERS.get(job.job_type)
+    heartbeat = LeaseHeartbeat(job)
+    heartbeat.start()
+    
+    try:
+        if handler is None:
+            raise JobFailed("Unknown job type: " + job.job_type)
+        
+        result = handler(job)
+        
+        job.refresh_from_db(fields=["cancel_requested", "progress"])
+        job.status = "cancelled" if job.cancel_requested else "done"
+        job.result = result
+        if not job.cancel_requested:
+            job.progress = 1.0
+    except Exception as e:
+        job.refresh_from_db(fields=["cancel_requested", "progress"])
+        job.status = "cancelled" if job.cancel_requested else "failed"
+        job.error = str(e)
+        if not isinstance(e, JobFailed):
+            traceback.print_exc()
+    finally:
+        heartbeat.stop()
+        
+    job.finished_at = timezone.now()
+    job.lease_expires_at = None
+    job.save(update_fields=["status", "result", "progress", "error", "finished_at", "lease_expires_at"])
+    return job
+
+
+def get_worker_name():
+    return socket.gethostname() + ":" + str(os.getpid())
@@ -0,0 +1,48 @@
+import numpy as np
+
+
+class LabelEncoder:     # Maps label ids to model output indices, built once per training or evaluation run
+    """
+    labels are (id, name, color) of the labels in output order, usually those of a dataset ordered by index.
+    The mapping is stored with trained models (Model.label_mapping) so predictions are decoded with the
+    same order they were trained with, even if the dataset's labels are later reordered or removed.
+    """
+    def __init__(self, labels):
+        self.labels = [{"id": id, "name": name, "color": color} for id, name, color in labels]
+
+        ids = np.array([label["id"] for label in self.labels], dtype=np.int64)
+        self._order = np.argsort(ids)
+        self._sorted_ids = ids[self._order]
+
+    @classmethod
+    def from_dataset(cls, dataset):
+        return cls(dataset.labels.values_list("id", "name", "color"))
+
+    @classmethod
+    def from_mapping(cls, mapping):     # Inverse of to_mapping
+        return cls([(label["id"], label["name"], label["color"]) for label in mapping])
+
+    def to_mapping(self):   # JSON serializable
+        return [dict(label) for label in self.labels]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def encode(self, label_ids):    # Returns the output index of every label id
+        label_ids = np.asarray(label_ids, dtype=np.int64)
+        if label_ids.size == 0:
+            return np.zeros(0, dtype=np.int64)
+
+        positions = np.searchsorted(self._sorted_ids, label_ids)
+        positions = np.minimum(positions, max(len(self._sorted_ids) - 1, 0))
+
+        if len(self._sorted_ids) == 0 or not np.array_equal(self._sorted_ids[positions], label_ids):
+            unknown = set(label_ids.tolist()) - set(self._sorted_ids.tolist())
+            raise ValueError("Unknown label ids: " + ", ".join(map(str, sorted(unknown))))
+        return self._order[positions]
+
+    def one_hot(self, label_ids):   # Returns a (len(label_ids), number of labels) float32 array
+        return np.eye(len(self.labels), dtype=np.float32)[self.encode(label_ids)]
+
+    def decode(self, index):    # Returns the label (dict with id, name and color) of an output index
+        return self.labels[int(index)]
@@ -0,0 +1,169 @@
+from tensorflow.keras import layers
+
+from .models import *
+from .serializers import LAYER_SERIALIZERS, CREATE_LAYER_SERIALIZERS
+from . import shapes
+
+
+class LayerType:    # How a layer type is stored, serialized, built with Keras and imported from Keras models
+    """
+    keras_arguments returns the arguments of keras_class for a layer instance (besides activation and input_shape),
+    fields_from_keras the fields of a layer instance from the config of a Keras layer. input_fields are the
+    input dimensions the type can specify (input_shape in Keras), activation is whether it has an activation function.
+    infer returns the output shape, parameter count and FLOPs of a layer instance for an input shape (see api/shapes.py).
+    The fields of its create serializer can be set when creating the layer and changed with EditLayer.
+    """
+    def __init__(self, name, model, keras_class, keras_arguments, fields_from_keras, infer, input_fields=(), activation=False):
+        self.name = name
+        self.model = model
+        self.serializer = LAYER_SERIALIZERS[model]
+        self.create_serializer = CREATE_LAYER_SERIALIZERS[model]
+        self.keras_class = keras_class
+        self.keras_arguments = keras_arguments
+        self.fields_from_keras = fields_from_keras
+        self.infer = infer
+        self.input_fields = input_fields
+        self.activation = activation
+
+    def build(self, layer):     # Keras layer for a Layer instance
+        arguments = self.keras_arguments(layer)
+        if self.activation:
+            arguments["activation"] = layer.activation_function or None
+        input_shape = tuple(getattr(layer, field) for field in self.input_fields)
+        if any(input_shape):    # Dimensions specified
+            arguments["input_shape"] = input_shape
+        return self.keras_class(**arguments)
+
+    def from_keras(self, tf_layer, input_shape=None):   # Field values of a Layer instance (without model and index) for a Keras layer
+        """input_shape is the input shape of the model (see model_input_shape), given for its first layer."""
+        config = tf_layer.get_config()
+        fields = self.fields_from_keras(config)
+
+        input_shape = input_shape or config.get("batch_input_shape")   # Only Keras 2 stores it in the first layer's config
+        if input_shape:     # First dimension is the batch size (None)
+            fields.update(zip(self.input_fields, input_shape[1:]))
+
+        fields["layer_type"] = self.name
+        activation = config.get("activation") or ""
+        fields["activation_function"] = activation if activation != "linear" else ""   # Keras' default, no activation
+        return fields
+
+
+XYZ = ("input_x", "input_y", "input_z")
+
+LAYER_TYPES = {layer_type.name: layer_type for layer_type in [
+    LayerType("dense", DenseLayer, layers.Dense,
+              lambda layer: {"units": layer.nodes_count},
+              lambda config: {"nodes_count": config["units"]},
+              shapes.dense,
+              input_fields=("input_x",), activation=True),
+    LayerType("conv2d", Conv2DLayer, layers.Conv2D,
+              lambda layer: {"filters": layer.filters, "kernel_size": layer.kernel_size},
+              lambda config: {"filters": config["filters"], "kernel_size": config["kernel_size"][0]},
+              shapes.conv2d,
+              input_fields=XYZ, activation=True),
+    LayerType("maxpool2d", MaxPool2DLayer, layers.MaxPool2D,
+              lambda layer: {"pool_size": layer.pool_size},
+              lambda config: {"pool_size": config["pool_size"][0]},
+              shapes.maxpool2d),
+    LayerType("flatten", FlattenLayer, layers.Flatten,
+              lambda layer: {},
+              lambda config: {},
+              shapes.flatten,
+              input_fields=("input_x", "input_y")),
+    LayerType("dropout", DropoutLayer, layers.Dropout,
+              lambda layer: {"rate": layer.rate},
+              lambda config: {"rate": config["rate"]},
+              shapes.identity),
+    LayerType("rescaling", RescalingLayer, layers.Rescaling,
+              lambda layer: {"scale": layer.get_scale_value(), "offset": layer.offset},
+              lambda config: {"scale": str(config["scale"]), "offset": config["offset"]},
+              shapes.rescaling,
+              input_fields=XYZ),
+    LayerType("randomflip", RandomFlipLayer, layers.RandomFlip,
+              lambda layer: {"mode": layer.mode},
+              lambda config: {"mode": config["mode"]},
+              shapes.identity,
+              input_fields=XYZ),
+    LayerType("resizing", ResizingLayer, layers.Resizing,
+              lambda layer: {"height": layer.output_y, "width": layer.output_x},
+              lambda config: {"output_x": config["width"], "output_y": config["height"]},
+              shapes.resizing,
+              input_fields=XYZ),
+    LayerType("batchnormalization", BatchNormalizationLayer, layers.BatchNormalization,
+              lambda layer: {"momentum": layer.momentum, "epsilon": layer.epsilon},
+              lambda config: {"momentum": config["momentum"], "epsilon": config["epsilon"]},
+              shapes.batch_normalization),
+    LayerType("globalaveragepooling2d", GlobalAveragePooling2DLayer, layers.GlobalAveragePooling2D,
+              lambda layer: {},
+              lambda config: {},
+              shapes.global_average_pooling2d),
+    LayerType("separableconv2d", SeparableConv2DLayer, layers.SeparableConv2D,
+              lambda layer: {"filters": layer.filters, "kernel_size": layer.kernel_size},
+              lambda config: {"filters": config["filters"], "kernel_size": config["kernel_size"][0]},
+              shapes.separable_conv2d,
+              input_fields=XYZ, activation=True),
+]}
+
+LAYER_TYPES_BY_KERAS_CLASS = {layer_type.keras_class: layer_type for layer_type in LAYER_TYPES.values()}
+
+
+def model_input_shape(tf_model):   # Input shape of a Keras model including the batch dimension, or None
+    try:
+        return tuple(tf_model.inputs[0].shape)
+    except (AttributeError, IndexError, TypeError):    # Sequential models without an Input have no inputs
+        pass
+    for tf_layer in tf_model.layers:    # Functional models start with an InputLayer
+        if isinstance(tf_layer, layers.InputLayer):
+            return tuple(tf_layer.get_config()["batch_shape"])
+    return None
+
+
+def keras_layer_type(tf_layer):     # LayerType of a Keras layer (or of the closest registered base class), or None
+    for keras_class in type(tf_layer).__mro__:
+        if keras_class in LAYER_TYPES_BY_KERAS_CLASS:
+            return LAYER_TYPES_BY_KERAS_CLASS[keras_class]
+    return None
+
+
+def infer_shapes(model_layers):     # Output shape, parameters, FLOPs and activation memory of every layer, computed without TensorFlow
+    """
+    model_layers are Layer instances in order. The input shape is given by the input dimensions of the first
+    layer, as when building the model (input dimensions of later layers are ignored by Keras as well).
+    Inference stops at the first layer that can't be applied to its input, later layers get no shapes.
+    Activation memory is the size of a layer's output for one sample, as float32.
+    """
+    results = []
+    totals = {"parameters": 0, "flops": 0, "activation_memory": 0}
+    error = None
+    shape = None
+
+    for position, layer in enumerate(model_layers):
+        layer_type = LAYER_TYPES[layer.layer_type]
+        result = {"id": layer.id, "layer_type": layer.layer_type, "input_shape": None, "output_shape": None,
+                  "parameters": None, "flops": None, "activation_memory": None, "error": None}
+        results.append(result)
+        if error:
+            continue
+
+        try:
+            if position == 0:
+                shape = tuple(getattr(layer, field) for field in layer_type.input_fields)
+                if not shape or not all(shape):
+                    raise shapes.ShapeError("Input dimensions must be specified on the first layer.")
+
+            output, parameters, flops = layer_type.infer(layer, shape)
+            if layer_type.activation and layer.activation_function:     # One FLOP per value (exp and division for softmax are estimated as one)
+                flops += shapes.size(output)
+        except shapes.ShapeError as e:
+            error = "Layer " + str(position + 1) + ": " + str(e)
+            result["error"] = str(e)
+            continue
+
+        result.update(input_shape=shape, output_shape=output, parameters=parameters, flops=flops,
+                      activation_memory=shapes.size(output) * shapes.FLOAT_BYTES)
+        for key in totals:
+            totals[key] += result[key]
+        shape = output
+
+    return {"layers": results, "output_shape": shape if not error else None, "valid": error is None, "error": error, **totals}
@@ -0,0 +1,40 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.jobs import claim_next_job, run_job, get_worker_name
+
+
+class Command(BaseCommand):
+    help = "Runs queued jobs (training, evaluation, dataset resizing and TFRecord exports) one at a time. Start several workers to run jobs in parallel."
+    
+    def add_arguments(self, parser):
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds to wait between checks when no job is queued.")
+        parser.add_argument("--once", action="store_true", help="Run queued jobs until there are none left, then exit.")
+        
+    def handle(self, *args, **options):
+        worker_name = get_worker_name()
+        stopping = False
+        
+        def stop(signum, frame):    # Finish the current job before exiting
+            nonlocal stopping
+            stopping = True
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        
+        self.stdout.write(f"Worker {worker_name} waiting for jobs.")
+        while not stopping:
+            close_old_connections()
+            job = claim_next_job(worker_name)
+            
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+                continue
+            
+            self.stdout.write(f"Running job {job.id} ({job.job_type}).")
+            job = run_job(job)
+            self.stdout.write(f"Job {job.id} finished: {job.status}.")
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:31
+
+import api.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='model',
+            name='model_file',
+            field=models.FileField(null=True, upload_to=api.models.model_file_path),
+        ),
+    ]
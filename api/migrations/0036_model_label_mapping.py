@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0035_alter_model_model_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='model',
+            name='label_mapping',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
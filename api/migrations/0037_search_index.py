@@ -0,0 +1,67 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:44
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Copied from api/search.py as it was when this migration was written, so later changes there don't affect it
+SQLITE_SEARCH_TABLE = "api_search_index"
+
+SEARCH_VECTORS = {     # Same as search_vector(model_name) in api/search.py
+    "api_dataset": "setweight(to_tsvector('english', COALESCE(name, '')), 'A') || "
+                   "setweight(to_tsvector('english', COALESCE(keywords::text, '')), 'B') || "
+                   "setweight(to_tsvector('english', COALESCE(description, '')), 'C')",
+    "api_model": "setweight(to_tsvector('english', COALESCE(name, '')), 'A') || "
+                 "setweight(to_tsvector('english', COALESCE(description, '')), 'C')",
+}
+
+
+def create_search_indexes(apps, schema_editor):   # GIN indexes on Postgres, an FTS5 table on SQLite, filled with existing rows
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for table in ("api_dataset", "api_model"):
+            schema_editor.execute("UPDATE " + table + " SET search_vector = " + SEARCH_VECTORS[table])
+            schema_editor.execute("CREATE INDEX " + table + "_search_vector_gin ON " + table + " USING gin (search_vector)")
+            schema_editor.execute("CREATE INDEX " + table + "_name_trgm ON " + table + " USING gin (name gin_trgm_ops)")
+    
+    elif schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS " + SQLITE_SEARCH_TABLE + " USING fts5("
+                              "kind UNINDEXED, object_id UNINDEXED, name, keywords, description, tokenize='unicode61 remove_diacritics 2')")
+        rows = []
+        for model_name in ("dataset", "model"):
+            model_class = apps.get_model("api", model_name)
+            for instance in model_class.objects.using(schema_editor.connection.alias).all():
+                keywords = getattr(instance, "keywords", None) or []
+                rows.append([model_name, instance.pk, instance.name or "", " ".join(keywords), instance.description or ""])
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany("INSERT INTO " + SQLITE_SEARCH_TABLE + " VALUES (%s, %s, %s, %s, %s)", rows)
+
+
+def remove_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for table in ("api_dataset", "api_model"):
+            schema_editor.execute("DROP INDEX IF EXISTS " + table + "_search_vector_gin")
+            schema_editor.execute("DROP INDEX IF EXISTS " + table + "_name_trgm")
+    elif schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS " + SQLITE_SEARCH_TABLE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0036_model_label_mapping'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataset',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='model',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, remove_search_indexes),
+    ]
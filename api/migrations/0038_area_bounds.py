@@ -0,0 +1,52 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:49
+
+import json
+
+from django.db import migrations, models
+
+
+def set_area_bounds(apps, schema_editor):
+    Area = apps.get_model("api", "Area")
+    areas = list(Area.objects.all())
+    for area in areas:
+        points = json.loads(area.area_points) if isinstance(area.area_points, str) and area.area_points else area.area_points
+        if points:
+            xs = [float(point[0]) for point in points]
+            ys = [float(point[1]) for point in points]
+            area.min_x, area.max_x, area.min_y, area.max_y = min(xs), max(xs), min(ys), max(ys)
+    Area.objects.bulk_update(areas, ["min_x", "max_x", "min_y", "max_y"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0037_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='area',
+            name='max_x',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='area',
+            name='max_y',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='area',
+            name='min_x',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='area',
+            name='min_y',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='area',
+            index=models.Index(fields=['element', 'min_x', 'max_x', 'min_y', 'max_y'], name='area_element_bounds'),
+        ),
+        migrations.RunPython(set_area_bounds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.16 on 2026-10-18 09:58
+
+import api.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0038_area_bounds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrainingCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tensorflow_dataset', models.CharField(blank=True, max_length=100)),
+                ('model_file', models.CharField(max_length=200)),
+                ('validation_split', models.FloatField(default=0.0)),
+                ('seed', models.PositiveIntegerField(default=0)),
+                ('label_mapping', models.JSONField(blank=True, null=True)),
+                ('epoch', models.PositiveIntegerField(default=0)),
+                ('weights_file', models.FileField(blank=True, null=True, upload_to=api.models.checkpoint_file_path)),
+                ('history', models.JSONField(default=dict)),
+                ('best_epoch', models.PositiveIntegerField(blank=True, null=True)),
+                ('best_val_accuracy', models.FloatField(blank=True, null=True)),
+                ('best_weights_file', models.FileField(blank=True, null=True, upload_to=api.models.checkpoint_file_path)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('dataset', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='api.dataset')),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='api.model')),
+            ],
+        ),
+    ]
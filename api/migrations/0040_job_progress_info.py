@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0039_training_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='progress_info',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:09
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0040_job_progress_info'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BatchNormalizationLayer',
+            fields=[
+                ('layer_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='api.layer')),
+                ('momentum', models.FloatField(default=0.99, validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(1.0)])),
+                ('epsilon', models.FloatField(default=0.001, validators=[django.core.validators.MinValueValidator(0.0)])),
+            ],
+            options={
+                'abstract': False,
+                'base_manager_name': 'objects',
+            },
+            bases=('api.layer',),
+        ),
+        migrations.CreateModel(
+            name='GlobalAveragePooling2DLayer',
+            fields=[
+                ('layer_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='api.layer')),
+            ],
+            options={
+                'abstract': False,
+                'base_manager_name': 'objects',
+            },
+            bases=('api.layer',),
+        ),
+        migrations.CreateModel(
+            name='SeparableConv2DLayer',
+            fields=[
+                ('layer_ptr', models.OneToOneField(auto_created=True, on_delete=django.db.models.deletion.CASCADE, parent_link=True, primary_key=True, serialize=False, to='api.layer')),
+                ('filters', models.PositiveIntegerField(default=1)),
+                ('kernel_size', models.PositiveIntegerField(default=3)),
+            ],
+            options={
+                'abstract': False,
+                'base_manager_name': 'objects',
+            },
+            bases=('api.layer',),
+        ),
+        migrations.AlterField(
+            model_name='layer',
+            name='layer_type',
+            field=models.CharField(choices=[('dense', 'Dense'), ('conv2d', 'Conv2D'), ('maxpool2d', 'MaxPool2d'), ('flatten', 'Flatten'), ('dropout', 'Dropout'), ('rescaling', 'Rescaling'), ('randomflip', 'RandomFlip'), ('resizing', 'Resizing'), ('batchnormalization', 'BatchNormalization'), ('globalaveragepooling2d', 'GlobalAveragePooling2D'), ('separableconv2d', 'SeparableConv2D')], default='dense', max_length=100),
+        ),
+    ]
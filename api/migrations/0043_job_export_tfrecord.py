@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 10:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0042_job_lease'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='job_type',
+            field=models.CharField(choices=[('train', 'Train'), ('evaluate', 'Evaluate'), ('resize_dataset', 'Resize dataset'), ('export_tfrecord', 'Export dataset as TFRecords')], max_length=20),
+        ),
+    ]
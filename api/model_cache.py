@@ -0,0 +1,62 @@
+from collections import OrderedDict
+import threading
+
+
+class ModelCache:   # Size bounded LRU cache of loaded Keras models, shared by all requests in a process
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.models = OrderedDict()     # (model id, model_file name) -> Keras model, least recently used first
+        self.lock = threading.Lock()
+        self.loading_locks = {}     # Prevents loading the same model twice at once
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+    def get(self, key, load):     # Returns the cached model for key, calling load() on a miss
+        with self.lock:
+            if key in self.models:
+                self.models.move_to_end(key)
+                self.hits += 1
+                return self.models[key]
+            loading_lock = self.loading_locks.setdefault(key, threading.Lock())
+            
+        with loading_lock:
+            with self.lock:     # Loaded by another thread while waiting
+                if key in self.models:
+                    self.models.move_to_end(key)
+                    self.hits += 1
+                    return self.models[key]
+                self.misses += 1
+                
+            try:
+                model = load()
+                self.put(key, model)
+            finally:
+                with self.lock:
+                    self.loading_locks.pop(key, None)
+        return model
+        
+    def put(self, key, model):
+        model_id = key[0]
+        with self.lock:
+            # Other files of the same model are outdated, as every saved model file gets a new name
+            for old_key in [k for k in self.models.keys() if k[0] == model_id and k != key]:
+                del self.models[old_key]
+                self.evictions += 1
+                
+            self.models[key] = model
+            self.models.move_to_end(key)
+            while len(self.models) > self.max_size:
+                self.models.popitem(last=False)
+                self.evictions += 1
+                
+    def invalidate(self, model_id):
+        with self.lock:
+            for key in [k for k in self.models.keys() if k[0] == model_id]:
+                del self.models[key]
+                
+    def stats(self):
+        with self.lock:
+            return {"size": len(self.models), "max_size": self.max_size,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+import keras
+import tensorflow as tf
+
+# The public keras.saving API only saves to and loads from paths, Keras 3's internal saving_lib also takes file objects.
+# It is private, so it is only used with the Keras versions it is known to work with, and paths are used otherwise.
+# saving_lib only treats io.IOBase instances as file objects, which SpooledTemporaryFile isn't before Python 3.11
+saving_lib = None
+if keras.__version__.split(".")[0] == "3":
+    try:
+        from keras.src.saving import saving_lib
+    except ImportError:
+        pass
+
+
+COPY_CHUNK_SIZE = 1024 ** 2
+
+# Replaced model and weights files are deleted in the background, so saving a model doesn't wait for the delete
+DELETE_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-file-delete")
+
+
+def model_buffer():     # Kept in memory up to MODEL_BUFFER_MAX_MEMORY bytes, then spooled to a temporary file
+    return tempfile.SpooledTemporaryFile(max_size=settings.MODEL_BUFFER_MAX_MEMORY)
+
+
+def use_saving_lib(fileobj):    # Whether saving_lib can read or write fileobj directly
+    return saving_lib is not None and isinstance(fileobj, io.IOBase)
+
+
+def write_keras_file(model, fileobj):  # Saves model in the .keras format to a file object
+    if use_saving_lib(fileobj):
+        saving_lib.save_model(model, fileobj)
+        return
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "model.keras")
+        keras.saving.save_model(model, path)
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, fileobj, COPY_CHUNK_SIZE)
+
+
+def read_keras_file(fileobj):   # Loads a model saved in the .keras format from a seekable file object
+    if use_saving_lib(fileobj):
+        return saving_lib.load_model(fileobj)
+    
+    with tempfile.NamedTemporaryFile(suffix=".keras") as temp_file:
+        shutil.copyfileobj(fileobj, temp_file, COPY_CHUNK_SIZE)
+        temp_file.flush()
+        return keras.saving.load_model(temp_file.name)
+
+
+def read_model(fileobj, extension):   # Loads a Keras model from a file object, extension is that of the file it was saved as
+    with model_buffer() as buffer:
+        shutil.copyfileobj(fileobj, buffer, COPY_CHUNK_SIZE)    # Storage files and uploads aren't always seekable io.IOBase objects
+        buffer.seek(0)
+
+        if extension == "keras":
+            return read_keras_file(buffer)
+
+        # Legacy formats (.h5) can only be loaded from a path
+        with tempfile.NamedTemporaryFile(suffix="." + extension) as temp_file:
+            shutil.copyfileobj(buffer, temp_file, COPY_CHUNK_SIZE)
+            temp_file.flush()
+            return tf.keras.models.load_model(temp_file.name)
+
+
+def load_model(model_instance):     # Loads the Keras model stored in model_instance.model_file
+    name = model_instance.model_file.name
+    with default_storage.open(name, "rb") as f:
+        return read_model(f, name.split(".")[-1])
+
+
+def save_model(model_instance, model):   # Stores model as a new version of model_instance.model_file
+    """
+    Every save gets a new file name (see model_file_path in api/models.py), written to storage from a
+    spooled buffer (S3 uploads are multipart for large models). model_file is updated in the database right
+    away, and the previous version is deleted in the background once the transaction is committed, so
+    readers never see a missing file. Models are always stored in the .keras format.
+    """
+    old_name = model_instance.model_file.name if model_instance.model_file else None
+
+    with model_buffer() as buffer:
+        write_keras_file(model, buffer)
+        buffer.seek(0)
+        model_instance.model_file.save(model_instance.name + ".keras", File(buffer), save=False)
+    type(model_instance).objects.filter(pk=model_instance.pk).update(model_file=model_instance.model_file.name)
+
+    if old_name:
+        transaction.on_commit(lambda: delete_stored_file(old_name))
+
+
+def save_weights(model, file_field, name):    # Saves the weights of model (as .weights.h5) to file_field, without saving its instance
+    with tempfile.TemporaryDirectory() as temp_dir:     # Keras only writes weights files to paths
+        path = os.path.join(temp_dir, name + ".weights.h5")
+        model.save_weights(path)
+        with open(path, "rb") as f:
+            file_field.save(name + ".weights.h5", File(f), save=False)
+
+
+def load_weights(model, name):  # Loads weights saved with save_weights into model
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "checkpoint.weights.h5")
+        with default_storage.open(name, "rb") as f, open(path, "wb") as temp_file:
+            shutil.copyfileobj(f, temp_file, COPY_CHUNK_SIZE)
+        model.load_weights(path)
+
+
+def delete_stored_file(name):    # Deletes a replaced model or weights file in the background
+    def delete():
+        try:
+            default_storage.delete(name)
+        except Exception as e:
+            print("Could not delete " + name + ": ", e)
+    DELETE_EXECUTOR.submit(delete)
@@ -4,13 +4,20 @@ from django.contrib.auth.models import User
 from django.db.models.signals import post_save, post_delete
 from django.core.validators import FileExtensionValidator
 import os
+import json
+import uuid
 from django.core.validators import MaxLengthValidator, MinValueValidator, MaxValueValidator
 
 from PIL import Image
 from io import BytesIO
-from django.core.files.base import ContentFile
+from django.core.files.base import File
 import pillow_avif # Adds .avif support
 from polymorphic.models import PolymorphicModel
+from django.contrib.postgres.search import SearchVectorField
+
+from .tensor_cache import preprocessed_image_cache
+from .export import tfrecord_export_cache
+from .search import update_search_index, remove_from_search_index
 
 
 ALLOWED_IMAGE_FILE_EXTENSIONS = ["png", "jpg", "jpeg", "webp", "avif"]
@@ -74,6 +81,8 @@ class Dataset(models.Model):
     ]
     dataset_type = models.CharField(max_length=20, choices=DATASET_TYPE_CHOICES, default="Image")
     
+    search_vector = SearchVectorField(null=True, editable=False)   # Only used on Postgres, see api/search.py
+    
     def __str__(self):
         return self.name + " - " + self.owner.name + " (" + self.dataset_type + ")"
 
@@ -83,6 +92,8 @@ def delete_dataset_image(sender, instance, **kwargs):
     if instance.image:
         instance.image.delete(save=False)
         instance.imageSmall.delete(save=False)
+    preprocessed_image_cache.remove_dataset(instance.id)
+    tfrecord_export_cache.remove_dataset(instance.id)
     
 # LABELS
 # Elements in datasets, such as files, are given labels
@@ -105,6 +116,28 @@ class Label(models.Model):
 # ELEMENTS
 # Datasets contain elements, which can be e.g. files
 
+MAX_IMAGE_SIZE = 1024   # Larger uploaded images are scaled down to fit
+
+
+def get_image_format(extension):    # PIL format used when encoding an image with the given file extension
+    return Image.registered_extensions().get("." + extension.lower(), "JPEG")
+
+
+def resize_image(file, size, extension):    # Decodes, resizes and encodes an image once, returns a buffer with the encoded image
+    with Image.open(file) as img:
+        img.draft(img.mode, size)   # JPEG only: decodes directly at up to 1/8 scale, as long as the result stays above size
+        # reducing_gap shrinks by an integer factor with reduce() before the final LANCZOS pass
+        img = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+        
+    img_format = get_image_format(extension)
+    if img_format == "JPEG" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+        
+    buffer = BytesIO()
+    img.save(buffer, format=img_format, quality=90)
+    buffer.seek(0)
+    return buffer
+
 def element_file_path(instance, filename):
     """Generate a dynamic path for file uploads based on dataset ID and name."""
     if instance.dataset:
@@ -131,46 +164,47 @@ class Element(models.Model):
     def __str__(self):
         return self.name + " - " + self.dataset.name
     
+    def get_target_image_size(self, width, height):  # Final size of an uploaded image, or None if it is kept as is
+        if self.dataset and self.dataset.imageWidth and self.dataset.imageHeight:
+            return (self.dataset.imageWidth, self.dataset.imageHeight)
+        
+        # Prevent too large images
+        if width > MAX_IMAGE_SIZE or height > MAX_IMAGE_SIZE:
+            # Calculate new size while preserving aspect ratio
+            ratio = min(MAX_IMAGE_SIZE / width, MAX_IMAGE_SIZE / height)
+            return (int(width * ratio), int(height * ratio))
+        
+        return None
+    
+    def process_file(self):    # Sets name and image dimensions for a newly uploaded file, resizing images before they are stored
+        # Set the name field to the file's name (without the path)
+        self.name = os.path.basename(self.file.name)
+        
+        ext = self.file.name.split(".")[-1].lower()
+        if ext in ALLOWED_IMAGE_FILE_EXTENSIONS:
+            try:
+                with Image.open(self.file) as img:  # Only reads the header
+                    self.imageWidth, self.imageHeight = img.size
+                    
+                new_size = self.get_target_image_size(self.imageWidth, self.imageHeight)
+                if new_size and new_size != (self.imageWidth, self.imageHeight):
+                    new_name = self.name.rsplit(".", 1)[0]
+                    if self.dataset and self.dataset.imageWidth and self.dataset.imageHeight:
+                        new_name += "-" + str(new_size[0]) + "x" + str(new_size[1])
+                    
+                    # Replace the upload before it is stored, so the file is only written to storage once (when saved)
+                    self.file = File(resize_image(self.file, new_size, ext), name=new_name + "." + ext)
+                    self.imageWidth, self.imageHeight = new_size
+                    
+            except Exception as e:
+                print(f"Error processing image: {e}")
+                self.imageWidth, self.imageHeight = None, None    
+    
     def save(self, *args, **kwargs):
 
         # If a new file is uploaded
         if self.file and not self.name:
-            # Set the name field to the file's name (without the path)
-            self.name = os.path.basename(self.file.name)
-            
-            ext = self.file.name.split(".")[-1].lower()
-            if ext in ALLOWED_IMAGE_FILE_EXTENSIONS:
-                try:
-                    with Image.open(self.file) as img:
-                        self.imageWidth, self.imageHeight = img.size
-                        
-                        # Check if resizing is needed, to prevent too large images
-                        max_size = 1024
-                        if self.imageWidth > max_size or self.imageHeight > max_size:
-                            # Calculate new size while preserving aspect ratio
-                            ratio = min(max_size / self.imageWidth, max_size / self.imageHeight)
-                            new_size = (int(self.imageWidth * ratio), int(self.imageHeight * ratio))
-
-                            # Resize image
-                            img = img.resize(new_size, Image.Resampling.LANCZOS)
-
-                            # Save resized image to file field
-                            img_io = BytesIO()
-                            img_format = "JPEG" if ext in ["jpg", "jpeg"] else "PNG"
-                            img.save(img_io, format=img_format, quality=90)  # Adjust quality if needed
-
-                            # Replace the uploaded file with the resized image
-                            old_name = self.file.name
-                            self.file.delete(save=False)
-                            self.file.save(old_name, ContentFile(img_io.getvalue()), save=False)
-
-                            # Update image size attributes
-                            self.imageWidth, self.imageHeight = new_size
-                            
-                        
-                except Exception as e:
-                    print(f"Error processing image: {e}")
-                    self.imageWidth, self.imageHeight = None, None    
+            self.process_file()
             
         super().save(*args, **kwargs)
         
@@ -190,11 +224,46 @@ class Area(models.Model):   # Only used for datasets of datatype "area"
     element = models.ForeignKey(Element, on_delete=models.CASCADE, related_name="areas", null=True)
     area_points = models.JSONField(default=list)  # Store as a list of [x, y] points
     
+    # Bounding box of area_points, set when saved. Used to find areas in a part of an element
+    min_x = models.FloatField(null=True, blank=True)
+    min_y = models.FloatField(null=True, blank=True)
+    max_x = models.FloatField(null=True, blank=True)
+    max_y = models.FloatField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [models.Index(fields=["element", "min_x", "max_x", "min_y", "max_y"], name="area_element_bounds")]
+    
     def __str__(self):
         return "Element: " + self.element.name + ", Label: " + self.label.name + ". Points: " + str(self.area_points)
     
+    def get_points(self):   # area_points is sent as a JSON string by the frontend
+        points = self.area_points
+        if isinstance(points, str):
+            points = json.loads(points) if points else []
+        return points
+    
+    def update_bounds(self):
+        points = self.get_points()
+        if points:
+            xs = [float(point[0]) for point in points]
+            ys = [float(point[1]) for point in points]
+            self.min_x, self.max_x, self.min_y, self.max_y = min(xs), max(xs), min(ys), max(ys)
+        else:
+            self.min_x = self.max_x = self.min_y = self.max_y = None
+    
+    def save(self, *args, **kwargs):
+        self.update_bounds()
+        super().save(*args, **kwargs)
+    
     
 # MODELS
+
+def model_file_path(instance, filename):
+    """Every saved model file gets a unique name, so cached models keyed on the file name are never stale."""
+    name, extension = os.path.splitext(filename)
+    return f"models/{name}-{uuid.uuid4().hex[:8]}{extension}"
+
+
 class Model(models.Model):
     name = models.CharField(max_length=100)
     owner = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="models")
@@ -214,6 +283,7 @@ class Model(models.Model):
     trained_on = models.ForeignKey(Dataset, on_delete=models.SET_NULL, related_name="trained_with", blank=True, null=True)   # Last trained on
     trained_on_tensorflow = models.CharField(max_length=100, blank=True, null=True)  # Used when training on TensorFlow datasets
     trained_accuracy = models.FloatField(validators=[MinValueValidator(0.0), MaxValueValidator(1.0)], blank=True, null=True)
+    label_mapping = models.JSONField(blank=True, null=True)   # Labels (id, name and color) in output order when last trained, see api/label_encoder.py
     
     evaluated_on = models.ForeignKey(Dataset, on_delete=models.SET_NULL, related_name="evaluated_with", blank=True, null=True)
     evaluated_on_tensorflow = models.CharField(max_length=100, blank=True, null=True)   # Used when evaluating on TensorFlow datasets
@@ -225,10 +295,12 @@ class Model(models.Model):
     ]
     visibility = models.CharField(max_length=10, choices=VISIBILITY_CHOICES, default="private")
     
-    model_file = models.FileField(upload_to="models/", null=True)
+    model_file = models.FileField(upload_to=model_file_path, null=True)
     optimizer = models.CharField(max_length=100, blank=True, null=True)
     loss_function = models.CharField(max_length=100, blank=True, null=True)
     
+    search_vector = SearchVectorField(null=True, editable=False)   # Only used on Postgres, see api/search.py
+    
     def __str__(self):
         return self.name + " - " + self.owner.name
     
@@ -240,6 +312,59 @@ def delete_model_files(sender, instance, **kwargs):
         instance.imageSmall.delete(save=False)
     if instance.model_file:
         instance.model_file.delete(save=False)
+        
+        
+def checkpoint_file_path(instance, filename):
+    name, extension = filename.split(".", 1)     # Keeps .weights.h5
+    return f"checkpoints/{instance.model_id}/{name}-{uuid.uuid4().hex[:8]}.{extension}"
+
+
+class TrainingCheckpoint(models.Model):  # Weights saved while training a model, so interrupted training can be resumed (see api/checkpoints.py)
+    model = models.ForeignKey(Model, on_delete=models.CASCADE, related_name="checkpoints")
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name="checkpoints", blank=True, null=True)
+    tensorflow_dataset = models.CharField(max_length=100, blank=True)
+    model_file = models.CharField(max_length=200)   # Model file trained from, checkpoints are only resumed from the same version
+    validation_split = models.FloatField(default=0.0)
+    seed = models.PositiveIntegerField(default=0)   # Used to split off the same validation data when resuming
+    label_mapping = models.JSONField(blank=True, null=True)     # Output order of the labels, see api/label_encoder.py
+    
+    epoch = models.PositiveIntegerField(default=0)  # Number of epochs trained when weights_file was saved
+    weights_file = models.FileField(upload_to=checkpoint_file_path, null=True, blank=True)
+    history = models.JSONField(default=dict)    # Keras history (accuracy, loss, ...) of the first epoch epochs
+    
+    best_epoch = models.PositiveIntegerField(blank=True, null=True)     # Epoch with the highest val_accuracy
+    best_val_accuracy = models.FloatField(blank=True, null=True)
+    best_weights_file = models.FileField(upload_to=checkpoint_file_path, null=True, blank=True)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return "Checkpoint (epoch " + str(self.epoch) + ") - " + self.model.name
+    
+    
+@receiver(post_delete, sender=TrainingCheckpoint)
+def delete_checkpoint_files(sender, instance, **kwargs):
+    if instance.weights_file:
+        instance.weights_file.delete(save=False)
+    if instance.best_weights_file:
+        instance.best_weights_file.delete(save=False)
+        
+        
+# SEARCH
+# Datasets and models are reindexed when saved, see api/search.py
+
+@receiver(post_save, sender=Dataset)
+@receiver(post_save, sender=Model)
+def update_search(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {"name", "description", "keywords"} & set(update_fields):
+        return
+    update_search_index(instance)
+    
+    
+@receiver(post_delete, sender=Dataset)
+@receiver(post_delete, sender=Model)
+def remove_search(sender, instance, **kwargs):
+    remove_from_search_index(instance)
     
     
 # LAYERS
@@ -247,12 +372,18 @@ class AbstractLayer(models.Model):
     model = models.ForeignKey(Model, on_delete=models.CASCADE, related_name="layers", null=True, blank=True)
     index = models.PositiveIntegerField(default=0)
     
-    LAYER_CHOICES = [
+    LAYER_CHOICES = [   # Every type must be registered in api/layers.py
         ("dense", "Dense"),
         ("conv2d", "Conv2D"),
         ("maxpool2d", "MaxPool2d"),
         ("flatten", "Flatten"),
-        ("dropout", "Dropout")
+        ("dropout", "Dropout"),
+        ("rescaling", "Rescaling"),
+        ("randomflip", "RandomFlip"),
+        ("resizing", "Resizing"),
+        ("batchnormalization", "BatchNormalization"),
+        ("globalaveragepooling2d", "GlobalAveragePooling2D"),
+        ("separableconv2d", "SeparableConv2D")
     ]
     layer_type = models.CharField(max_length=100, choices=LAYER_CHOICES, default="dense")
     
@@ -372,4 +503,76 @@ class ResizingLayer(Layer):
     def __str__(self):
         res = f"Resizing ({self.output_x}, {self.output_y})"
         if self.model: res += " - " + self.model.name
-        return res
\ No newline at end of file
+        return res    
+    
+    
+class BatchNormalizationLayer(Layer):
+    momentum = models.FloatField(default=0.99, validators=[MinValueValidator(0.0), MaxValueValidator(1.0)])
+    epsilon = models.FloatField(default=0.001, validators=[MinValueValidator(0.0)])
+    
+    def __str__(self):
+        res = f"BatchNormalization ({self.momentum}, {self.epsilon})"
+        if self.model: res += " - " + self.model.name
+        return res
+    
+    
+class GlobalAveragePooling2DLayer(Layer):
+    def __str__(self):
+        res = "GlobalAveragePooling2D"
+        if self.model: res += " - " + self.model.name
+        return res
+    
+    
+class SeparableConv2DLayer(Layer):
+    filters = models.PositiveIntegerField(default=1)
+    kernel_size = models.PositiveIntegerField(default=3)
+    
+    def __str__(self):
+        res = f"SeparableConv2D ({self.filters}, {self.kernel_size})"
+        if self.model: res += " - " + self.model.name
+        return res
+    
+    
+# JOBS
+# Long running work (training, evaluation, resizing datasets) run by the runjobs management command instead of in requests
+class Job(models.Model):
+    owner = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name="jobs")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    
+    JOB_TYPE_CHOICES = [
+        ("train", "Train"),
+        ("evaluate", "Evaluate"),
+        ("resize_dataset", "Resize dataset"),
+        ("export_tfrecord", "Export dataset as TFRecords")
+    ]
+    job_type = models.CharField(max_length=20, choices=JOB_TYPE_CHOICES)
+    params = models.JSONField(default=dict)     # Arguments for the job, e.g. epochs
+    
+    model = models.ForeignKey(Model, on_delete=models.CASCADE, related_name="jobs", blank=True, null=True)
+    dataset = models.ForeignKey(Dataset, on_delete=models.CASCADE, related_name="jobs", blank=True, null=True)
+    
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+        ("cancelled", "Cancelled")
+    ]
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    progress = models.FloatField(default=0.0, validators=[MinValueValidator(0.0), MaxValueValidator(1.0)])
+    progress_info = models.JSONField(blank=True, null=True)     # Latest metrics of training jobs (epoch, batch, loss, accuracy, throughput, ETA)
+    cancel_requested = models.BooleanField(default=False)
+    worker = models.CharField(max_length=200, blank=True)   # hostname:pid of the worker running the job
+    lease_expires_at = models.DateTimeField(blank=True, null=True)  # Renewed while the worker is alive, running jobs with an expired lease are claimed again
+    attempts = models.IntegerField(default=0)   # Number of times the job has been claimed
+    
+    result = models.JSONField(blank=True, null=True)    # Same payload as the synchronous endpoint, e.g. accuracy and loss after training
+    error = models.TextField(blank=True)
+    
+    def __str__(self):
+        return self.job_type + " (" + self.status + ") - " + self.owner.name
+    
+    class Meta:
+        ordering = ["created_at"]
@@ -0,0 +1,99 @@
+import json
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+def reverse_ordering(ordering):
+    return tuple(field[1:] if field.startswith("-") else "-" + field for field in ordering)
+
+
+class KeysetCursorPagination(CursorPagination):     # Cursors hold the values of every ordering field, whose last field must be unique
+    """
+    CursorPagination only stores the value of the first ordering field in cursors and skips rows with that same value
+    using an offset, which is capped at offset_cutoff. Paging through many rows with equal values (e.g. datasets
+    without downloads) therefore repeats rows. Here rows after a cursor are found by comparing all ordering fields
+    in order, so the unique last field breaks ties and offsets are never needed.
+    """
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        current_position = self.cursor.position if self.cursor is not None else None
+        
+        ordering = reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self.after_position(ordering, current_position))
+        
+        results = list(queryset[:self.page_size + 1])   # One extra row to know if there is a following page
+        self.page = results[:self.page_size]
+        following_position = self._get_position_from_instance(results[-1], self.ordering) if len(results) > len(self.page) else None
+        
+        if reverse:     # Loaded backwards from the cursor
+            self.page.reverse()
+            self.next_position, self.previous_position = current_position, following_position
+        else:
+            self.next_position, self.previous_position = following_position, current_position
+        self.has_next = self.next_position is not None
+        self.has_previous = self.previous_position is not None
+        
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+    
+    def after_position(self, ordering, position):    # Rows following position in ordering
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        
+        condition = None
+        for field, value in reversed(list(zip(ordering, values))):
+            name = field.lstrip("-")
+            following = Q(**{name + ("__lt" if field.startswith("-") else "__gt"): value})
+            condition = following if condition is None else following | (Q(**{name: value}) & condition)
+        return condition
+    
+    def _get_position_from_instance(self, instance, ordering):
+        values = [instance[field.lstrip("-")] if isinstance(instance, dict) else getattr(instance, field.lstrip("-")) for field in ordering]
+        return json.dumps(values, default=lambda value: value.isoformat())  # Dates keep their microseconds, unlike DjangoJSONEncoder
+
+
+class DatasetCursorPagination(KeysetCursorPagination):    # Used by the dataset list views, sorted by the sort query parameter
+    """
+    Sort options match those of the explore and home pages. Counts and search_rank are annotated by the
+    views (see annotate_dataset_counts in api/views.py), and every ordering ends with the id to break ties between equal values.
+    """
+    page_size = 24
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+    SORT_ORDERINGS = {
+        "downloads": ("-download_count", "-id"),
+        "alphabetical": ("name", "id"),
+        "date": ("-created_at", "-id"),
+        "elements": ("-element_count", "-id"),
+        "labels": ("-label_count", "-id"),
+        "relevance": ("-search_rank", "-id"),
+    }
+
+    def get_ordering(self, request, queryset, view):   # Searches are sorted by relevance by default
+        default = "relevance" if request.query_params.get("search") else "date"
+        return self.SORT_ORDERINGS.get(request.query_params.get("sort"), self.SORT_ORDERINGS[default])
+
+
+class ElementCursorPagination(KeysetCursorPagination):    # Used when loading the elements of a dataset, in the order shown when labelling
+    page_size = 200
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    ordering = ("index", "id")
@@ -0,0 +1,116 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection, connections
+from django.db.models import Case, F, FloatField, Q, TextField, Value, When
+from django.db.models.functions import Cast
+
+
+# Indexed fields and their weights, by model name (Dataset and Model)
+SEARCH_FIELDS = {
+    "dataset": (("name", "A"), ("keywords", "B"), ("description", "C")),
+    "model": (("name", "A"), ("description", "C")),
+}
+SEARCH_CONFIG = "english"
+
+SQLITE_SEARCH_TABLE = "api_search_index"    # FTS5 table used instead on SQLite (DEBUG)
+SQLITE_MAX_RESULTS = 1000
+
+
+def is_postgres():
+    return connection.vendor == "postgresql"
+
+
+def sqlite_search_table_exists():
+    return connection.vendor == "sqlite" and SQLITE_SEARCH_TABLE in connection.introspection.table_names()
+
+
+def create_sqlite_search_table(cursor):
+    cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS " + SQLITE_SEARCH_TABLE + " USING fts5("
+                   "kind UNINDEXED, object_id UNINDEXED, name, keywords, description, tokenize='unicode61 remove_diacritics 2')")
+
+
+def search_vector(model_name):    # Expression for the search_vector field of a model
+    vector = None
+    for field, weight in SEARCH_FIELDS[model_name]:
+        value = Cast(field, TextField()) if field == "keywords" else field     # Keywords are a JSON list
+        field_vector = SearchVector(value, weight=weight, config=SEARCH_CONFIG)
+        vector = field_vector if vector is None else vector + field_vector
+    return vector
+
+
+def sqlite_row(model_name, instance):    # Values of a row of the FTS5 table
+    values = {field: getattr(instance, field) for field, _ in SEARCH_FIELDS[model_name]}
+    row = [model_name, instance.pk]
+    for field in ("name", "keywords", "description"):
+        value = values.get(field) or ""
+        row.append(" ".join(value) if isinstance(value, list) else value)
+    return row
+
+
+def update_search_index(instance):  # Called when a dataset or model is saved
+    model_name = instance._meta.model_name
+    if is_postgres():
+        type(instance)._default_manager.filter(pk=instance.pk).update(search_vector=search_vector(model_name))
+    elif sqlite_search_table_exists():
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM " + SQLITE_SEARCH_TABLE + " WHERE kind = %s AND object_id = %s", [model_name, instance.pk])
+            cursor.execute("INSERT INTO " + SQLITE_SEARCH_TABLE + " VALUES (%s, %s, %s, %s, %s)", sqlite_row(model_name, instance))
+
+
+def remove_from_search_index(instance):     # Called when a dataset or model is deleted
+    if sqlite_search_table_exists():
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM " + SQLITE_SEARCH_TABLE + " WHERE kind = %s AND object_id = %s", [instance._meta.model_name, instance.pk])
+
+
+def rebuild_search_index(model_class, using="default"):  # Indexes every row of model_class again, e.g. after changing SEARCH_FIELDS
+    model_name = model_class._meta.model_name
+    db = connections[using]
+
+    if db.vendor == "postgresql":
+        model_class._default_manager.using(using).update(search_vector=search_vector(model_name))
+    elif db.vendor == "sqlite":
+        with db.cursor() as cursor:
+            create_sqlite_search_table(cursor)
+            cursor.execute("DELETE FROM " + SQLITE_SEARCH_TABLE + " WHERE kind = %s", [model_name])
+            cursor.executemany("INSERT INTO " + SQLITE_SEARCH_TABLE + " VALUES (%s, %s, %s, %s, %s)",
+                               [sqlite_row(model_name, instance) for instance in model_class._default_manager.using(using).all()])
+
+
+def search_queryset(queryset, text):     # Filters queryset (of datasets or models) by text, annotated with search_rank
+    """
+    On Postgres, matches are found with the GIN indexed search_vector, or trigram similarity of the name
+    (for partial and misspelled words), and ranked by both. On SQLite the FTS5 table is used, with prefix
+    matching of every word. Other databases fall back to substring matching of the name.
+    """
+    text = text.strip()
+    no_rank = Value(0.0, output_field=FloatField())
+    if not text:
+        return queryset.annotate(search_rank=no_rank)
+
+    if is_postgres():
+        query = SearchQuery(text, search_type="websearch", config=SEARCH_CONFIG)
+        return queryset.filter(Q(search_vector=query) | Q(name__trigram_similar=text)).annotate(
+            search_rank=SearchRank(F("search_vector"), query) + TrigramSimilarity("name", text)
+        )
+
+    if sqlite_search_table_exists():
+        words = re.findall(r"\w+", text)
+        if not words:
+            return queryset.none().annotate(search_rank=no_rank)
+
+        match = " ".join('"' + word + '"*' for word in words)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT object_id, bm25(" + SQLITE_SEARCH_TABLE + ", 0, 0, 10, 5, 1) FROM " + SQLITE_SEARCH_TABLE +
+                           " WHERE kind = %s AND " + SQLITE_SEARCH_TABLE + " MATCH %s ORDER BY 2 LIMIT %s",
+                           [queryset.model._meta.model_name, match, SQLITE_MAX_RESULTS])
+            ranks = {int(object_id): -score for object_id, score in cursor.fetchall()}   # Lower bm25 is better
+
+        if not ranks:
+            return queryset.none().annotate(search_rank=no_rank)
+        return queryset.filter(pk__in=ranks.keys()).annotate(search_rank=Case(
+            *[When(pk=pk, then=Value(rank)) for pk, rank in ranks.items()], output_field=FloatField()
+        ))
+
+    return queryset.filter(name__icontains=text).annotate(search_rank=no_rank)
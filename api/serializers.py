@@ -9,6 +9,7 @@ class AreaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Area
         fields = "__all__"
+        read_only_fields = ("min_x", "min_y", "max_x", "max_y")   # Set from area_points
 
 
 # ELEMENT HANDLING
@@ -60,10 +61,35 @@ class DatasetSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Dataset
-        fields = "__all__"
+        exclude = ("search_vector",)
+        extra_kwargs = {"owner": {"read_only": True}}
+        
+        
+class DatasetHeaderSerializer(serializers.ModelSerializer):    # Dataset without its elements, which are loaded in pages
+    labels = LabelSerializer(many=True, read_only=True)
+    ownername = serializers.CharField(source="owner.name", read_only=True)
+    element_count = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = Dataset
+        exclude = ("search_vector",)
         extra_kwargs = {"owner": {"read_only": True}}
         
         
+class DatasetSummarySerializer(serializers.ModelSerializer):   # Used for dataset lists, counts are annotated by the views
+    ownername = serializers.CharField(source="owner.name", read_only=True)
+    element_count = serializers.IntegerField(read_only=True)
+    label_count = serializers.IntegerField(read_only=True)
+    download_count = serializers.IntegerField(read_only=True)
+    saved_count = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = Dataset
+        fields = ("id", "name", "description", "created_at", "owner", "ownername", "imageSmall", "verified", "keywords",
+                  "imageWidth", "imageHeight", "visibility", "datatype", "dataset_type",
+                  "element_count", "label_count", "download_count", "saved_count")
+        
+        
 class CreateDatasetSerializer(serializers.ModelSerializer):
     class Meta:
         model = Dataset
@@ -72,56 +98,28 @@ class CreateDatasetSerializer(serializers.ModelSerializer):
        
 # PROFILE HANDLING
 
-class ProfileSerializer(serializers.ModelSerializer):
-    saved_datasets = DatasetSerializer(many=True, read_only=True)
+class CurrentProfileSerializer(serializers.ModelSerializer):    # Loaded on every page, saved datasets and counts are prefetched and annotated by GetCurrentProfile
+    saved_datasets = DatasetSummarySerializer(many=True, read_only=True)
+    datasetsCount = serializers.IntegerField(read_only=True)
+    modelsCount = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Profile
-        fields = "__all__"
+        fields = ("user", "name", "saved_datasets", "datasetsCount", "modelsCount")
         
         
 # LAYER HANDLING
 
-class LayerSerializer(serializers.BaseSerializer):
+class LayerSerializer(serializers.BaseSerializer):  # Serializes layers with the serializer of their type, see LAYER_SERIALIZERS
     def to_representation(self, instance):
-        if isinstance(instance, DenseLayer):
-            return DenseLayerSerializer(instance).data
-        elif isinstance(instance, Conv2DLayer):
-            return Conv2DLayerSerializer(instance).data
-        elif isinstance(instance, MaxPool2DLayer):
-            return MaxPool2DLayerSerializer(instance).data
-        elif isinstance(instance, FlattenLayer):
-            return FlattenLayerSerializer(instance).data
-        elif isinstance(instance, DropoutLayer):
-            return DropoutLayerSerializer(instance).data
-        elif isinstance(instance, RescalingLayer):
-            return RescalingLayerSerializer(instance).data
-        elif isinstance(instance, RandomFlipLayer):
-            return RandomFlipLayerSerializer(instance).data
-        elif isinstance(instance, ResizingLayer):
-            return ResizingLayerSerializer(instance).data
-        return None  # Handles unexpected cases
+        serializer_class = LAYER_SERIALIZERS.get(type(instance))
+        return serializer_class(instance).data if serializer_class else None  # Handles unexpected cases
     
     
-class CreateLayerSerializer(serializers.BaseSerializer):
+class CreateLayerSerializer(serializers.BaseSerializer):  # Serializes layers with the create serializer of their type, see CREATE_LAYER_SERIALIZERS
     def to_representation(self, instance):
-        if isinstance(instance, DenseLayer):
-            return CreateDenseLayerSerializer(instance).data
-        elif isinstance(instance, Conv2DLayer):
-            return CreateConv2DLayerSerializer(instance).data
-        elif isinstance(instance, MaxPool2DLayer):
-            return CreateMaxPool2DLayer(instance).data
-        elif isinstance(instance, FlattenLayer):
-            return CreateFlattenLayerSerializer(instance).data
-        elif isinstance(instance, DropoutLayer):
-            return CreateDropoutLayerSerializer(instance).data
-        elif isinstance(instance, RescalingLayer):
-            return CreateRescalingLayerSerializer(instance).data
-        elif isinstance(instance, RandomFlipLayer):
-            return CreateRandomFlipLayer(instance).data
-        elif isinstance(instance, ResizingLayer):
-            return CreateResizingLayerSerializer(instance).data
-        return None  # Handles unexpected cases
+        serializer_class = CREATE_LAYER_SERIALIZERS.get(type(instance))
+        return serializer_class(instance).data if serializer_class else None  # Handles unexpected cases
     
 
 class DenseLayerSerializer(serializers.ModelSerializer):
@@ -203,18 +201,101 @@ class CreateResizingLayerSerializer(serializers.ModelSerializer):
         model = ResizingLayer
         fields = ["input_x", "input_y", "input_z", "output_x", "output_y"]      
 
+
+class BatchNormalizationLayerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BatchNormalizationLayer
+        fields = "__all__"
+class CreateBatchNormalizationLayerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BatchNormalizationLayer
+        fields = ["momentum", "epsilon"]
+
+
+class GlobalAveragePooling2DLayerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GlobalAveragePooling2DLayer
+        fields = "__all__"
+class CreateGlobalAveragePooling2DLayerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = GlobalAveragePooling2DLayer
+        fields = []
+
+
+class SeparableConv2DLayerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SeparableConv2DLayer
+        fields = "__all__"
+class CreateSeparableConv2DLayerSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SeparableConv2DLayer
+        fields = ["filters", "kernel_size", "input_x", "input_y", "input_z"]
+
+
+# Layer class -> serializers, polymorphic queries return instances of the layer classes. Used by the layer registry in api/layers.py
+LAYER_SERIALIZERS = {
+    DenseLayer: DenseLayerSerializer,
+    Conv2DLayer: Conv2DLayerSerializer,
+    MaxPool2DLayer: MaxPool2DLayerSerializer,
+    FlattenLayer: FlattenLayerSerializer,
+    DropoutLayer: DropoutLayerSerializer,
+    RescalingLayer: RescalingLayerSerializer,
+    RandomFlipLayer: RandomFlipLayerSerializer,
+    ResizingLayer: ResizingLayerSerializer,
+    BatchNormalizationLayer: BatchNormalizationLayerSerializer,
+    GlobalAveragePooling2DLayer: GlobalAveragePooling2DLayerSerializer,
+    SeparableConv2DLayer: SeparableConv2DLayerSerializer,
+}
+CREATE_LAYER_SERIALIZERS = {
+    DenseLayer: CreateDenseLayerSerializer,
+    Conv2DLayer: CreateConv2DLayerSerializer,
+    MaxPool2DLayer: CreateMaxPool2DLayerSerializer,
+    FlattenLayer: CreateFlattenLayerSerializer,
+    DropoutLayer: CreateDropoutLayerSerializer,
+    RescalingLayer: CreateRescalingLayerSerializer,
+    RandomFlipLayer: CreateRandomFlipLayerSerializer,
+    ResizingLayer: CreateResizingLayerSerializer,
+    BatchNormalizationLayer: CreateBatchNormalizationLayerSerializer,
+    GlobalAveragePooling2DLayer: CreateGlobalAveragePooling2DLayerSerializer,
+    SeparableConv2DLayer: CreateSeparableConv2DLayerSerializer,
+}
+        
         
 # MODEL HANDLING
 
 
-class ModelSerializer(serializers.ModelSerializer):
+def linked_dataset(dataset, element_count):    # Dataset a model was trained or evaluated on, element_count is annotated by the views
+    if dataset is None:
+        return None
+    return {"id": dataset.id, "name": dataset.name, "visibility": dataset.visibility, "dataset_type": dataset.dataset_type, "element_count": element_count}
+
+
+class ModelSummarySerializer(serializers.ModelSerializer):     # Used for model lists, counts are annotated by the views (see annotate_model_counts)
+    ownername = serializers.CharField(source="owner.name", read_only=True)
+    layer_count = serializers.IntegerField(read_only=True)
+    download_count = serializers.IntegerField(read_only=True)
+    trained_on = serializers.SerializerMethodField()
+    evaluated_on = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Model
+        fields = ("id", "name", "description", "created_at", "owner", "ownername", "imageSmall", "verified", "visibility", "model_type",
+                  "trained_on", "trained_on_tensorflow", "trained_accuracy", "evaluated_on", "evaluated_on_tensorflow", "evaluated_accuracy",
+                  "layer_count", "download_count")
+        
+    def get_trained_on(self, model):
+        return linked_dataset(model.trained_on, getattr(model, "trained_on_element_count", None))
+    
+    def get_evaluated_on(self, model):
+        return linked_dataset(model.evaluated_on, getattr(model, "evaluated_on_element_count", None))
+        
+        
+class ModelDetailSerializer(ModelSummarySerializer):    # A model with its layers, linked datasets are summarized as in lists
     layers = LayerSerializer(many=True, read_only=True)
-    trained_on = DatasetSerializer(read_only=True)
-    evaluated_on = DatasetSerializer(read_only=True)
     
     class Meta:
         model = Model
-        fields = "__all__"
+        exclude = ("search_vector",)
         extra_kwargs = {"owner": {"read_only": True}}
         
 class CreateModelSerializer(serializers.ModelSerializer):
@@ -223,3 +304,11 @@ class CreateModelSerializer(serializers.ModelSerializer):
         fields = ("name", "model_type", "description", "visibility", "image")
         
         
+        
+        
+# JOB HANDLING
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ("id", "job_type", "status", "progress", "progress_info", "params", "model", "dataset", "result", "error", "created_at", "started_at", "finished_at")
@@ -0,0 +1,98 @@
+import math
+
+
+# Output shapes, parameter counts and FLOPs of layers, computed without TensorFlow. Used by the layer registry in api/layers.py
+# Shapes are tuples without the batch dimension, as in Keras (input_x, input_y, input_z for image layers).
+# FLOPs are estimates per sample, with multiply-adds counted as 2 FLOPs.
+
+FLOAT_BYTES = 4     # Models use float32
+
+
+class ShapeError(ValueError):   # A layer can't be applied to its input
+    pass
+
+
+def size(shape):    # Number of values in a shape
+    return math.prod(shape)
+
+
+def format_shape(shape):
+    return "(" + ", ".join(str(dimension) for dimension in shape) + ")"
+
+
+def image_input(shape, layer_name):     # Returns (width, height, depth) of a shape that must have 3 dimensions
+    if len(shape) != 3:
+        raise ShapeError(layer_name + " expects input with 3 dimensions (width, height, depth), got " + format_shape(shape) + ".")
+    return shape
+
+
+def window_output(dimension, window, stride, layer_name, window_name):    # Output size of a dimension with valid padding
+    if not window:
+        raise ShapeError(layer_name + " must have a " + window_name + ".")
+    if window > dimension:
+        raise ShapeError(layer_name + " " + window_name + " (" + str(window) + ") is larger than its input (" + str(dimension) + ").")
+    return (dimension - window) // stride + 1
+
+
+# Every function takes a Layer instance and its input shape, and returns (output shape, parameters, FLOPs)
+
+def dense(layer, shape):
+    if not shape:
+        raise ShapeError("Dense expects input with at least 1 dimension.")
+    units = layer.nodes_count
+    return shape[:-1] + (units,), shape[-1] * units + units, 2 * size(shape) * units
+
+
+def conv2d(layer, shape):
+    width, height, depth = image_input(shape, "Conv2D")
+    kernel = layer.kernel_size
+    output = (window_output(width, kernel, 1, "Conv2D", "kernel size"), window_output(height, kernel, 1, "Conv2D", "kernel size"), layer.filters)
+    return output, kernel * kernel * depth * layer.filters + layer.filters, 2 * kernel * kernel * depth * size(output)
+
+
+def separable_conv2d(layer, shape):     # Depthwise convolution of every channel, then a 1x1 convolution
+    width, height, depth = image_input(shape, "SeparableConv2D")
+    kernel = layer.kernel_size
+    output = (window_output(width, kernel, 1, "SeparableConv2D", "kernel size"),
+              window_output(height, kernel, 1, "SeparableConv2D", "kernel size"), layer.filters)
+    positions = output[0] * output[1]
+    parameters = kernel * kernel * depth + depth * layer.filters + layer.filters
+    return output, parameters, 2 * positions * (kernel * kernel * depth + depth * layer.filters)
+
+
+def maxpool2d(layer, shape):
+    width, height, depth = image_input(shape, "MaxPool2D")
+    pool = layer.pool_size
+    output = (window_output(width, pool, pool, "MaxPool2D", "pool size"), window_output(height, pool, pool, "MaxPool2D", "pool size"), depth)
+    return output, 0, size(output) * pool * pool   # One comparison per value in every window
+
+
+def global_average_pooling2d(layer, shape):
+    width, height, depth = image_input(shape, "GlobalAveragePooling2D")
+    return (depth,), 0, size(shape)
+
+
+def flatten(layer, shape):
+    return (size(shape),), 0, 0
+
+
+def identity(layer, shape):     # Dropout and RandomFlip don't change values when predicting
+    return shape, 0, 0
+
+
+def rescaling(layer, shape):
+    return shape, 0, 2 * size(shape)
+
+
+def batch_normalization(layer, shape):  # Mean, variance, scale and offset per channel
+    if not shape:
+        raise ShapeError("BatchNormalization expects input with at least 1 dimension.")
+    return shape, 4 * shape[-1], 2 * size(shape)
+
+
+def resizing(layer, shape):     # Bilinear interpolation of 4 input values per output value
+    width, height, depth = image_input(shape, "Resizing")
+    if not layer.output_x or not layer.output_y:
+        raise ShapeError("Resizing output dimensions must be positive.")
+    output = (layer.output_y, layer.output_x, depth)    # Keras Resizing takes (height, width), see api/layers.py
+    return output, 0, 8 * size(output)
@@ -0,0 +1,125 @@
+import errno
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+from django.conf import settings
+
+
+class PreprocessedImageCache:   # Decoded and resized images of a dataset, stored as memory mapped .npy files
+    """
+    Entries are stored in <directory>/<dataset id>/<content version>-<x>x<y>x<z>/ as images.npy (uint8,
+    one row per element), labels.npy (label id per row) and elements.npy (element id per row).
+    The content version changes whenever elements, their files or labels change, so outdated entries are
+    never read. They are removed when a newer version of the dataset is stored.
+    Least recently used entries (by modification time of their directory, updated on every load) of other datasets
+    are removed once the cache grows above max_bytes, as in FileCache.
+    """
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        
+    def path(self, dataset_id, version, shape):
+        return os.path.join(self.directory, str(dataset_id), version + "-" + "x".join(map(str, shape)))
+    
+    def load(self, dataset_id, version, shape):     # Returns (images, label ids, element ids) or None
+        path = self.path(dataset_id, version, shape)
+        try:
+            loaded = (np.load(os.path.join(path, "images.npy"), mmap_mode="r"),
+                      np.load(os.path.join(path, "labels.npy")),
+                      np.load(os.path.join(path, "elements.npy")))
+            os.utime(path)  # Mark as recently used
+            return loaded
+        except FileNotFoundError:
+            return None
+    
+    def build(self, dataset_id, version, shape, batches, label_ids, element_ids):
+        """batches yields uint8 arrays of images, in the order of label_ids and element_ids."""
+        os.makedirs(os.path.join(self.directory, str(dataset_id)), exist_ok=True)
+        temp_path = tempfile.mkdtemp(dir=os.path.join(self.directory, str(dataset_id)), prefix=".building-")
+        
+        try:
+            images = np.lib.format.open_memmap(os.path.join(temp_path, "images.npy"), mode="w+", dtype=np.uint8, shape=(len(element_ids),) + tuple(shape))
+            row = 0
+            for batch in batches:
+                images[row:row + len(batch)] = batch
+                row += len(batch)
+            images.flush()
+            del images
+            
+            np.save(os.path.join(temp_path, "labels.npy"), np.asarray(label_ids, dtype=np.int64))
+            np.save(os.path.join(temp_path, "elements.npy"), np.asarray(element_ids, dtype=np.int64))
+            
+            self.remove_dataset(dataset_id, keep_version=version)
+            path = self.path(dataset_id, version, shape)
+            try:
+                os.rename(temp_path, path)
+            except OSError as e:
+                # Renaming onto a directory that isn't empty fails, the entry was built by another process at the same time
+                if e.errno not in (errno.EEXIST, errno.ENOTEMPTY) or not os.path.isdir(path):
+                    raise
+                shutil.rmtree(temp_path, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            raise
+        
+        self.evict(keep=path)
+        return self.load(dataset_id, version, shape)
+    
+    def entries(self):  # (modification time, path, size) of every entry
+        for dataset_name in os.listdir(self.directory):
+            dataset_path = os.path.join(self.directory, dataset_name)
+            try:
+                names = os.listdir(dataset_path)
+            except (FileNotFoundError, NotADirectoryError):     # Removed by another process
+                continue
+            for name in names:
+                if name.startswith("."):    # Being built
+                    continue
+                path = os.path.join(dataset_path, name)
+                try:
+                    size = sum(entry.stat().st_size for entry in os.scandir(path))
+                    yield os.stat(path).st_mtime, path, size
+                except FileNotFoundError:
+                    continue
+    
+    def evict(self, keep=None):     # Removes least recently used entries (except keep) until the cache is below 90% of max_bytes
+        with self.lock:
+            entries = sorted(self.entries())
+            total = sum(size for _, _, size in entries)
+            
+            for _, path, size in entries:
+                if total <= self.max_bytes * 0.9:
+                    break
+                if path == keep:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)     # Arrays memory mapped by running jobs stay readable until closed
+                total -= size
+    
+    def remove_dataset(self, dataset_id, keep_version=None):  # Removes all entries of a dataset, except those of keep_version
+        dataset_path = os.path.join(self.directory, str(dataset_id))
+        if not os.path.isdir(dataset_path):
+            return
+        if not keep_version:
+            shutil.rmtree(dataset_path, ignore_errors=True)
+            return
+        
+        for name in os.listdir(dataset_path):
+            if name.startswith(".") or name.startswith(keep_version + "-"):
+                continue
+            shutil.rmtree(os.path.join(dataset_path, name), ignore_errors=True)
+            
+            
+def dataset_content_version(elements):     # Hash of everything preprocessed entries depend on
+    """elements are (id, file name, label id) of the labelled elements."""
+    digest = hashlib.sha256()
+    for element in sorted(elements):
+        digest.update(repr(element).encode())
+    return digest.hexdigest()[:16]
+
+
+preprocessed_image_cache = PreprocessedImageCache(settings.PREPROCESSED_DATASET_CACHE_DIR, settings.PREPROCESSED_DATASET_CACHE_MAX_BYTES)
@@ -0,0 +1,622 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
+
+import keras
+import numpy as np
+import tensorflow as tf
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from . import model_store
+from .export import NO_LABEL_FOLDER, area_annotations
+from .file_cache import FileCache
+from .jobs import claim_next_job, run_export_tfrecord_job
+from .label_encoder import LabelEncoder
+from .layers import LAYER_TYPES, infer_shapes
+from .model_cache import ModelCache
+from .models import *
+from .search import search_queryset, sqlite_search_table_exists
+from .views import reorder_indices
+
+
+def image_file(name, size=(40, 30)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (255, 0, 0)).save(buffer, "JPEG")
+    return SimpleUploadedFile(name, buffer.getvalue(), "image/jpeg")
+
+
+class MediaTestCase(TestCase):  # Stores files in a temporary directory instead of S3
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(DEFAULT_FILE_STORAGE="django.core.files.storage.FileSystemStorage", MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+        self.user = User.objects.create(username="owner")
+        self.other_user = User.objects.create(username="other")
+        self.dataset = Dataset.objects.create(name="Animals", owner=self.user.profile)
+        self.cat = Label.objects.create(dataset=self.dataset, owner=self.user.profile, name="cat", index=0)
+        self.dog = Label.objects.create(dataset=self.dataset, owner=self.user.profile, name="dog", index=1)
+
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def create_element(self, name, label=None, index=0):
+        return Element.objects.create(dataset=self.dataset, owner=self.user.profile, file=image_file(name), label=label, index=index)
+
+
+class CreateElementsTests(MediaTestCase):
+    def test_creates_elements_and_reports_failed_files(self):
+        response = self.client.post("/api/create-elements/", {
+            "dataset": self.dataset.id, "index": 5,
+            "files": [image_file("a.jpg"), image_file("b.jpg"), SimpleUploadedFile("c.exe", b"zz")],
+        }, format="multipart")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["ids"]), 2)
+        self.assertEqual([failed["name"] for failed in response.data["failed"]], ["c.exe"])
+        elements = Element.objects.filter(id__in=response.data["ids"]).order_by("index")
+        self.assertEqual([(element.name, element.index, element.label) for element in elements], [("a.jpg", 5, None), ("b.jpg", 6, None)])
+
+    def test_requires_own_dataset_and_files(self):
+        self.assertEqual(self.client.post("/api/create-elements/", {"dataset": self.dataset.id}, format="multipart").status_code, 400)
+
+        self.client.force_authenticate(self.other_user)
+        response = self.client.post("/api/create-elements/", {"dataset": self.dataset.id, "files": [image_file("a.jpg")]}, format="multipart")
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Element.objects.exists())
+
+
+class ModelStoreTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tf_model = keras.Sequential([keras.Input((4,)), keras.layers.Dense(3, activation="softmax")])
+        self.model_instance = Model.objects.create(name="classifier", owner=self.user.profile)
+
+    def assertSameWeights(self, tf_model):
+        for loaded, saved in zip(tf_model.get_weights(), self.tf_model.get_weights()):
+            np.testing.assert_array_equal(loaded, saved)
+
+    def test_round_trip_through_storage(self):
+        model_store.save_model(self.model_instance, self.tf_model)
+        self.model_instance.refresh_from_db()
+
+        self.assertTrue(self.model_instance.model_file.name.endswith(".keras"))
+        self.assertSameWeights(model_store.load_model(self.model_instance))
+
+    def test_round_trip_through_file_objects_that_are_not_io_base(self):  # As SpooledTemporaryFile before Python 3.11
+        class Wrapper:
+            def __init__(self, fileobj):
+                self.fileobj = fileobj
+
+            def __getattr__(self, name):
+                return getattr(self.fileobj, name)
+
+        buffer = Wrapper(io.BytesIO())
+        model_store.write_keras_file(self.tf_model, buffer)
+        buffer.seek(0)
+        self.assertSameWeights(model_store.read_keras_file(buffer))
+
+
+class PredictModelBatchTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.element = self.create_element("a.jpg", self.cat)
+        self.model_instance = Model.objects.create(name="classifier", owner=self.user.profile,
+                                                   label_mapping=LabelEncoder.from_dataset(self.dataset).to_mapping())
+        RescalingLayer.objects.create(model=self.model_instance, index=0, layer_type="rescaling", scale="1", offset=0, input_x=8, input_y=8, input_z=3)
+        tf_model = keras.Sequential([keras.Input((8, 8, 3)), keras.layers.Flatten(), keras.layers.Dense(2, activation="softmax")])
+        model_store.save_model(self.model_instance, tf_model)
+
+    def post(self, data, format="json"):
+        return self.client.post("/api/predict-model-batch/", {"model": self.model_instance.id, **data}, format=format)
+
+    def test_predicts_elements_and_uploads(self):
+        for elements in [[str(self.element.id)], [self.element.id]]:
+            response = self.post({"elements": elements})
+            self.assertEqual(response.status_code, 200, elements)
+            self.assertEqual(response.data["predictions"][0]["element"], self.element.id)
+            self.assertEqual(len(response.data["predictions"][0]["probabilities"]), 2)
+
+        response = self.post({"elements": str(self.element.id) + ",", "images": [image_file("b.jpg"), SimpleUploadedFile("c.jpg", b"zz")]}, format="multipart")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([prediction["name"] for prediction in response.data["predictions"]], ["b.jpg", "c.jpg", "a.jpg"])
+        self.assertIn("error", response.data["predictions"][1])
+
+    def test_rejects_invalid_ids(self):
+        self.assertEqual(self.post({"elements": "1,x"}, format="multipart").status_code, 400)
+        for elements in [["1.5"], [True], [[1]], {"id": 1}]:
+            self.assertEqual(self.post({"elements": elements}).status_code, 400, elements)
+        self.assertEqual(self.post({"elements": [self.element.id + 1]}).status_code, 404)
+
+
+class EditElementLabelsTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = self.create_element("a.jpg", self.cat, 0)
+        self.second = self.create_element("b.jpg", None, 1)
+
+    def test_sets_and_clears_labels(self):
+        response = self.client.post("/api/edit-element-labels/", {"labels": [[self.first.id, None], [self.second.id, self.dog.id]]}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["changed"], [[self.first.id, self.cat.id, None], [self.second.id, None, self.dog.id]])
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.label_id, self.second.label_id), (None, self.dog.id))
+
+    def test_rejects_invalid_requests(self):
+        other_dataset = Dataset.objects.create(name="Other", owner=self.user.profile)
+        other_label = Label.objects.create(dataset=other_dataset, owner=self.user.profile, name="x", index=0)
+
+        for labels, status_code in [([["a", 1]], 400), (7, 400), ([[9999, None]], 404), ([[self.first.id, other_label.id]], 400)]:
+            response = self.client.post("/api/edit-element-labels/", {"labels": labels}, format="json")
+            self.assertEqual(response.status_code, status_code, labels)
+        self.assertEqual(self.client.post("/api/edit-element-labels/", {}, format="json").status_code, 400)
+
+        self.client.force_authenticate(self.other_user)
+        response = self.client.post("/api/edit-element-labels/", {"labels": [[self.first.id, None]]}, format="json")
+        self.assertEqual(response.status_code, 401)
+
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.label_id, self.cat.id)
+
+
+class ReorderIndicesTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bird = Label.objects.create(dataset=self.dataset, owner=self.user.profile, name="bird", index=2)
+
+    def indices(self):
+        return list(self.dataset.labels.order_by("index").values_list("name", flat=True))
+
+    def test_order(self):
+        changed = reorder_indices(self.dataset.labels.all(), order={str(self.bird.id): 0, self.cat.id: 1, self.dog.id: 2})
+        self.assertEqual(changed, 3)
+        self.assertEqual(self.indices(), ["bird", "cat", "dog"])
+
+    def test_moves_only_update_changed_rows(self):
+        changed = reorder_indices(self.dataset.labels.all(), moves=[{"id": self.dog.id, "before": None}])
+        self.assertEqual(self.indices(), ["cat", "bird", "dog"])
+        self.assertEqual(changed, 2)
+
+        reorder_indices(self.dataset.labels.all(), moves=[{"id": self.dog.id, "before": self.cat.id}, {"id": self.bird.id, "before": self.dog.id}])
+        self.assertEqual(self.indices(), ["bird", "dog", "cat"])
+
+    def test_unknown_ids_raise_without_changes(self):
+        other = Dataset.objects.create(name="Other", owner=self.user.profile)
+        other_label = Label.objects.create(dataset=other, owner=self.user.profile, name="x", index=0)
+
+        with self.assertRaises(ValueError):
+            reorder_indices(self.dataset.labels.all(), order={self.cat.id: 2, other_label.id: 0})
+        with self.assertRaises(ValueError):
+            reorder_indices(self.dataset.labels.all(), moves=[{"id": self.cat.id, "before": other_label.id}])
+        self.assertEqual(self.indices(), ["cat", "dog", "bird"])
+
+    def test_malformed_input_raises(self):
+        for order, moves in [([1, 2], None), ({self.cat.id: "1"}, None), ({self.cat.id: True}, None), ({"x": 1}, None),
+                             (None, {"id": self.cat.id}), (None, [self.cat.id]), (None, [{"before": None}])]:
+            with self.assertRaises(ValueError, msg=(order, moves)):
+                reorder_indices(self.dataset.labels.all(), order=order, moves=moves)
+
+    def test_endpoint_rejects_malformed_order(self):
+        for data in [{"order": [1, 2]}, {"order": {self.cat.id: "first"}}, {"moves": {"id": self.cat.id}}]:
+            response = self.client.post("/api/reorder-dataset-labels/", {"id": self.dataset.id, **data}, format="json")
+            self.assertEqual(response.status_code, 400, data)
+        self.assertEqual(self.indices(), ["cat", "dog", "bird"])
+
+
+
+class TrainModelTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.model_instance = Model.objects.create(name="classifier", owner=self.user.profile)
+
+    def post(self, **data):
+        return self.client.post("/api/train-model/", {"model": self.model_instance.id, "dataset": self.dataset.id, "epochs": 2,
+                                                      "validation_split": 0.2, "tensorflow_dataset": "", "background": "true", **data}, format="json")
+
+    def test_parses_flags_given_as_strings(self):
+        response = self.post(resume="false", restore_best="true", early_stopping_patience="3")
+
+        self.assertEqual(response.status_code, 202)
+        params = Job.objects.get(id=response.data["id"]).params
+        self.assertEqual((params["dataset"], params["resume"], params["restore_best"], params["early_stopping_patience"]), (self.dataset.id, False, True, 3))
+
+    def test_rejects_invalid_numbers(self):
+        self.assertEqual(self.post(dataset="first").status_code, 400)
+        self.assertEqual(self.post(early_stopping_patience="soon").status_code, 400)
+        self.assertFalse(Job.objects.exists())
+
+
+def read_storage_file(element):     # Replaces reading element files from S3 in exports
+    with default_storage.open(element["file"], "rb") as f:
+        return f.read()
+
+
+@mock.patch("api.views.get_element_fetcher", lambda elements: read_storage_file)
+class ExportDatasetTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dataset.datatype = "area"
+        self.dataset.save()
+        self.first = self.create_element("a.jpg", self.cat, 0)
+        self.second = self.create_element("b.jpg", None, 1)
+        Area.objects.create(element=self.first, label=self.dog, area_points=[[1, 2], [3, 4]])
+        Area.objects.create(element=self.first, label=None, area_points=[[5, 6], [7, 8]])
+
+    def get(self, **params):
+        return self.client.get("/api/datasets/" + str(self.dataset.id) + "/export", params)
+
+    def test_area_annotations_leave_out_unlabelled_areas(self):
+        areas = {1: [{"label": self.cat.id, "points": [[0, 0]]}, {"label": None, "points": [[1, 1]]}]}
+        annotations = json.loads(area_annotations([{"id": 1}], ["a.jpg"], {self.cat.id: "cat", self.dog.id: "dog"}, areas))
+        self.assertEqual(annotations, {"a.jpg": {"cat": [[0, 0]], "dog": []}})
+
+    def test_streams_zip_archive(self):
+        response = self.get(layout="folders")
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(sorted(archive.namelist()), sorted(["Animals.json", "cat/a.jpg", NO_LABEL_FOLDER + "/b.jpg"]))
+            self.assertEqual(archive.read("cat/a.jpg"), read_storage_file({"file": self.first.file.name}))
+
+        response = self.get()   # Area layout by default
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(json.loads(archive.read("Animals.json")), {"a.jpg": {"cat": [], "dog": [[1, 2], [3, 4]]}, "b.jpg": {"cat": [], "dog": []}})
+
+    def test_builds_tfrecords_in_a_job(self):
+        response = self.get(type="tfrecord", shards=2)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.get(type="tfrecord", shards=2).data["id"], response.data["id"])  # Queued job is reused
+
+        job = Job.objects.get(id=response.data["id"])
+        self.assertTrue(run_export_tfrecord_job(job)["file"].endswith(".zip"))
+
+        response = self.get(type="tfrecord", shards=2)
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(json.loads(archive.read("labels.json")), ["cat", "dog"])
+            examples = []
+            for shard in ["data-00000-of-00002.tfrecord", "data-00001-of-00002.tfrecord"]:
+                examples += [tf.train.Example.FromString(record.numpy()) for record in tf.data.TFRecordDataset(self.write_temp(archive.read(shard)))]
+
+        features = {example.features.feature["element/filename"].bytes_list.value[0]: example.features.feature for example in examples}
+        self.assertEqual(features[b"a.jpg"]["label/index"].int64_list.value, [0])
+        self.assertEqual(list(features[b"a.jpg"]["area/label_index"].int64_list.value), [1, -1])
+        self.assertEqual(features[b"b.jpg"]["label/index"].int64_list.value, [-1])
+
+    def write_temp(self, data):     # TFRecordDataset only reads paths
+        with tempfile.NamedTemporaryFile(dir=self.media_root, delete=False) as f:
+            f.write(data)
+        return f.name
+
+
+class ImportModelTests(MediaTestCase):
+    def post(self, tf_model):
+        buffer = io.BytesIO()
+        model_store.write_keras_file(tf_model, buffer)
+        return self.client.post("/api/create-model/", {"name": "imported", "model_type": "image", "visibility": "private",
+                                                       "image": image_file("cover.jpg"), "model": SimpleUploadedFile("imported.keras", buffer.getvalue())}, format="multipart")
+
+    def test_imports_layers_with_input_shape(self):
+        tf_model = keras.Sequential([keras.Input((16, 16, 3)), keras.layers.Conv2D(4, 3, activation="relu"), keras.layers.Flatten(), keras.layers.Dense(2)])
+        tf_model.compile(optimizer="adam", loss="categorical_crossentropy")
+
+        self.assertEqual(self.post(tf_model).status_code, 200)
+        model_instance = Model.objects.get()
+        model_layers = list(model_instance.layers.all())
+        self.assertEqual([layer.layer_type for layer in model_layers], ["conv2d", "flatten", "dense"])
+        self.assertEqual((model_layers[0].input_x, model_layers[0].input_y, model_layers[0].input_z), (16, 16, 3))
+        self.assertEqual(infer_shapes(model_layers)["parameters"], tf_model.count_params())
+
+    def test_rejects_models_it_cannot_store_without_creating_anything(self):
+        for tf_model in [keras.Sequential([keras.Input((8, 2)), keras.layers.LSTM(4), keras.layers.Dense(2)]),   # Unsupported layer type
+                         keras.Sequential([keras.Input((8, 8, 3)), keras.layers.MaxPool2D(2), keras.layers.Flatten()]),     # No input dimensions
+                         keras.Sequential([keras.Input((28, 28, 1)), keras.layers.Flatten()])]:   # Only 2 input dimensions
+            response = self.post(tf_model)
+            self.assertEqual(response.status_code, 400)
+            self.assertTrue(response.data["Bad Request"])
+
+        self.assertFalse(Model.objects.exists())
+        self.assertFalse(Layer.objects.exists())
+
+
+@override_settings(JOB_MAX_ATTEMPTS=2)
+class ClaimNextJobTests(TestCase):
+    def setUp(self):
+        self.profile = User.objects.create(username="owner").profile
+
+    def create_job(self, **fields):
+        return Job.objects.create(owner=self.profile, job_type="evaluate", **fields)
+
+    def test_claims_oldest_queued_job_once(self):
+        first = self.create_job()
+        second = self.create_job()
+        self.create_job(status="done")
+
+        job = claim_next_job("worker-1")
+        self.assertEqual(job.id, first.id)
+        self.assertEqual((job.status, job.worker, job.attempts), ("running", "worker-1", 1))
+        self.assertGreater(job.lease_expires_at, timezone.now())
+
+        self.assertEqual(claim_next_job("worker-2").id, second.id)
+        self.assertIsNone(claim_next_job("worker-3"))
+
+    def test_reclaims_running_jobs_with_expired_lease(self):
+        alive = self.create_job(status="running", attempts=1, lease_expires_at=timezone.now() + timedelta(minutes=1))
+        stopped = self.create_job(status="running", attempts=1, lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        job = claim_next_job("worker-2")
+        self.assertEqual(job.id, stopped.id)
+        self.assertEqual((job.worker, job.attempts), ("worker-2", 2))
+        self.assertIsNone(claim_next_job("worker-3"))
+
+        alive.refresh_from_db()
+        self.assertEqual(alive.attempts, 1)
+
+    def test_fails_jobs_after_max_attempts(self):
+        job = self.create_job(status="running", attempts=2, lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertIsNone(claim_next_job("worker-2"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertIsNotNone(job.finished_at)
+
+
+class ModelCacheTests(SimpleTestCase):
+    def test_loads_once_and_counts_hits(self):
+        cache = ModelCache(2)
+        loads = []
+        load = lambda: loads.append(1) or "model"
+
+        self.assertEqual(cache.get((1, "a.keras"), load), "model")
+        self.assertEqual(cache.get((1, "a.keras"), load), "model")
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = ModelCache(2)
+        cache.put((1, "a.keras"), "a")
+        cache.put((2, "b.keras"), "b")
+        cache.get((1, "a.keras"), lambda: self.fail("Should be cached"))
+        cache.put((3, "c.keras"), "c")
+
+        self.assertEqual(set(cache.models), {(1, "a.keras"), (3, "c.keras")})
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_new_file_replaces_old_versions(self):
+        cache = ModelCache(4)
+        cache.put((1, "a.keras"), "old")
+        cache.put((1, "a_2.keras"), "new")
+        self.assertEqual(list(cache.models), [(1, "a_2.keras")])
+
+        cache.invalidate(1)
+        self.assertEqual(cache.stats()["size"], 0)
+
+
+class FileCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_entries_are_keyed_by_etag(self):
+        cache = FileCache(self.directory, 1024)
+        cache.put("media/a.png", '"etag1"', b"first")
+
+        self.assertEqual(cache.get("media/a.png", "etag1"), b"first")   # Quotes are ignored
+        self.assertIsNone(cache.get("media/a.png", '"etag2"'))
+        self.assertIsNone(cache.get("media/b.png", '"etag1"'))
+
+    def test_evicts_least_recently_used_above_max_bytes(self):
+        cache = FileCache(self.directory, 250)
+        for t, key in enumerate(["a", "b", "c"]):
+            cache.put(key, "e", b"x" * 100)
+            os.utime(cache.path(key, "e"), (t, t))    # Modification times one second apart, "a" oldest
+
+        self.assertIsNone(cache.get("a", "e"))
+        self.assertEqual(cache.get("b", "e"), b"x" * 100)
+        self.assertEqual(cache.get("c", "e"), b"x" * 100)
+        self.assertLessEqual(cache.size, 250)
+
+
+class LabelEncoderTests(SimpleTestCase):
+    def setUp(self):
+        self.encoder = LabelEncoder([(7, "cat", "#fff"), (3, "dog", "#000"), (12, "bird", "#f00")])
+
+    def test_encodes_in_label_order(self):
+        self.assertEqual(self.encoder.encode([3, 12, 7, 3]).tolist(), [1, 2, 0, 1])
+        self.assertEqual(self.encoder.encode([]).tolist(), [])
+
+    def test_unknown_ids_raise(self):
+        with self.assertRaisesMessage(ValueError, "Unknown label ids: 5"):
+            self.encoder.encode([7, 5])
+        with self.assertRaises(ValueError):
+            LabelEncoder([]).encode([1])
+
+    def test_one_hot_and_decode(self):
+        np.testing.assert_array_equal(self.encoder.one_hot([12, 7]), [[0, 0, 1], [1, 0, 0]])
+        self.assertEqual(self.encoder.decode(np.int64(1))["name"], "dog")
+
+    def test_mapping_round_trip(self):
+        decoded = LabelEncoder.from_mapping(self.encoder.to_mapping())
+        self.assertEqual(decoded.labels, self.encoder.labels)
+        self.assertEqual(decoded.encode([12]).tolist(), [2])
+
+
+class KeysetPaginationTests(MediaTestCase):
+    def pages(self, url, **params):     # Ids of every page, following next links
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([row["id"] for row in response.data["results"]])
+            if not response.data["next"]:
+                return pages, response
+            response = self.client.get(response.data["next"])
+
+    def test_pages_through_tied_values_without_repeating_rows(self):
+        for t in range(30):
+            Dataset.objects.create(name="Same name", owner=self.user.profile, visibility="public")
+        ids = list(Dataset.objects.filter(visibility="public").order_by("-id").values_list("id", flat=True))
+
+        for sort, expected in [("downloads", ids), ("alphabetical", ids[::-1])]:
+            pages, last = self.pages("/api/datasets/", sort=sort, page_size=7)
+            self.assertEqual([len(page) for page in pages], [7, 7, 7, 7, 2])
+            self.assertEqual(sum(pages, []), expected)
+
+            previous = []
+            response = last
+            while response.data["previous"]:
+                response = self.client.get(response.data["previous"])
+                previous = [row["id"] for row in response.data["results"]] + previous
+            self.assertEqual(previous, expected[:28])
+
+    def test_pages_elements_in_index_order(self):
+        elements = [self.create_element(str(t) + ".jpg", index=t // 3) for t in range(10)]    # Three elements share every index
+
+        pages, _ = self.pages("/api/datasets/" + str(self.dataset.id) + "/elements", page_size=4)
+        self.assertEqual(sum(pages, []), [element.id for element in sorted(elements, key=lambda element: (element.index, element.id))])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get("/api/datasets/", {"cursor": "not a cursor"}).status_code, 404)
+
+
+class SearchTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.named = Dataset.objects.create(name="Cats and dogs", owner=self.user.profile, visibility="public")
+        self.keyword = Dataset.objects.create(name="Pets", keywords=["cat"], owner=self.user.profile, visibility="public")
+        self.described = Dataset.objects.create(name="Animals 2", description="Mostly cats", owner=self.user.profile, visibility="public")
+        Dataset.objects.create(name="Cars", description="No animals", owner=self.user.profile, visibility="public")
+
+    def search(self, text):
+        return list(search_queryset(Dataset.objects.all(), text).order_by("-search_rank", "-id").values_list("id", flat=True))
+
+    def test_ranks_matches_by_field_weight(self):
+        self.assertTrue(sqlite_search_table_exists())
+        self.assertEqual(self.search("cat"), [self.named.id, self.keyword.id, self.described.id])
+        self.assertEqual(self.search("  DOG "), [self.named.id])
+        self.assertEqual(self.search("zebra"), [])
+        self.assertEqual(len(self.search("")), Dataset.objects.count())
+
+    def test_index_follows_changes(self):
+        self.named.name = "Horses"
+        self.named.save()
+        self.keyword.delete()
+
+        self.assertEqual(self.search("cat"), [self.described.id])
+        self.assertEqual(self.search("horse"), [self.named.id])
+
+    def test_dataset_list_sorts_searches_by_relevance(self):
+        response = self.client.get("/api/datasets/", {"search": "cat"})
+        self.assertEqual([row["id"] for row in response.data["results"]], [self.named.id, self.keyword.id, self.described.id])
+
+
+class EditAreasTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.element = self.create_element("a.jpg")
+        self.area = Area.objects.create(element=self.element, label=self.cat, area_points=[[0, 0], [10, 20]])
+        self.removed = Area.objects.create(element=self.element, label=self.cat, area_points=[[5, 5], [6, 6]])
+
+    def post(self, data):
+        return self.client.post("/api/edit-areas/", data, format="json")
+
+    def test_creates_updates_and_deletes(self):
+        response = self.post({
+            "create": [{"element": self.element.id, "label": self.dog.id, "area_points": [[30, 40], [50, 45]]}],
+            "update": [{"id": self.area.id, "area_points": [[1, 2], [3, 4]], "label": self.dog.id}, {"id": self.removed.id, "area_points": []}],
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["updated"], [self.area.id])
+        self.assertEqual(response.data["deleted"], [self.removed.id])
+        created = Area.objects.get(id=response.data["created"][0]["id"])
+        self.assertEqual((created.label_id, created.min_x, created.max_y), (self.dog.id, 30, 45))
+        self.area.refresh_from_db()
+        self.assertEqual((self.area.label_id, self.area.max_x), (self.dog.id, 3))
+        self.assertFalse(Area.objects.filter(id=self.removed.id).exists())
+
+    def test_rejects_malformed_input(self):
+        for data in [{"create": [{"element": "x", "label": self.cat.id, "area_points": []}]},
+                     {"update": [{"area_points": []}]},
+                     {"update": [{"id": self.area.id}]},
+                     {"delete": ["a"]},
+                     {"create": [{"element": self.element.id, "area_points": [[1, 1]]}]},
+                     {"create": [{"element": self.element.id, "label": self.cat.id, "area_points": [[1]]}]}]:
+            self.assertEqual(self.post(data).status_code, 400, data)
+        self.assertEqual(self.post({"delete": [9999]}).status_code, 404)
+        self.assertEqual(Area.objects.count(), 2)
+
+    def test_checks_ownership(self):
+        self.client.force_authenticate(self.other_user)
+        self.assertEqual(self.post({"delete": [self.area.id]}).status_code, 401)
+
+        orphan = Area.objects.create(element=None, label=None, area_points=[[0, 0], [1, 1]])
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.post({"delete": [orphan.id]}).status_code, 401)
+        self.assertEqual(Area.objects.count(), 3)
+
+
+class InferShapesTests(SimpleTestCase):
+    def assertMatchesKeras(self, model_layers):
+        shapes = infer_shapes(model_layers)
+        self.assertTrue(shapes["valid"], shapes["error"])
+
+        first = model_layers[0]
+        input_shape = tuple(getattr(first, field) for field in LAYER_TYPES[first.layer_type].input_fields)
+        tf_model = keras.Sequential([keras.Input(input_shape)] + [LAYER_TYPES[layer.layer_type].build(layer) for layer in model_layers])
+
+        self.assertEqual(shapes["parameters"], tf_model.count_params())
+        self.assertEqual(shapes["output_shape"], tuple(tf_model.output_shape[1:]))
+        for result, tf_layer in zip(shapes["layers"], tf_model.layers):
+            self.assertEqual(result["parameters"], tf_layer.count_params())
+            self.assertEqual(result["output_shape"], tuple(tf_layer.output.shape[1:]))
+
+    def test_image_model_matches_keras(self):
+        self.assertMatchesKeras([
+            RescalingLayer(layer_type="rescaling", scale="1/255", offset=0, input_x=32, input_y=32, input_z=3),
+            Conv2DLayer(layer_type="conv2d", filters=8, kernel_size=3, activation_function="relu"),
+            BatchNormalizationLayer(layer_type="batchnormalization"),
+            SeparableConv2DLayer(layer_type="separableconv2d", filters=16, kernel_size=3),
+            MaxPool2DLayer(layer_type="maxpool2d", pool_size=2),
+            DropoutLayer(layer_type="dropout", rate=0.2),
+            ResizingLayer(layer_type="resizing", output_x=10, output_y=12),
+            GlobalAveragePooling2DLayer(layer_type="globalaveragepooling2d"),
+            DenseLayer(layer_type="dense", nodes_count=5, activation_function="softmax"),
+        ])
+
+    def test_flatten_and_dense_match_keras(self):
+        self.assertMatchesKeras([
+            FlattenLayer(layer_type="flatten", input_x=28, input_y=28),
+            DenseLayer(layer_type="dense", nodes_count=64, activation_function="relu"),
+            DenseLayer(layer_type="dense", nodes_count=10),
+        ])
+
+    def test_errors_stop_inference(self):
+        shapes = infer_shapes([
+            Conv2DLayer(layer_type="conv2d", filters=4, kernel_size=5, input_x=4, input_y=4, input_z=1),
+            DenseLayer(layer_type="dense", nodes_count=2),
+        ])
+        self.assertFalse(shapes["valid"])
+        self.assertTrue(shapes["error"].startswith("Layer 1:"))
+        self.assertIsNone(shapes["layers"][1]["output_shape"])
+
+        self.assertFalse(infer_shapes([DenseLayer(layer_type="dense", nodes_count=2)])["valid"])   # No input dimensions
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from django.conf import settings
+
+
+# Shared by all requests so the number of concurrent storage writes stays bounded per process
+UPLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=settings.ELEMENT_UPLOAD_WORKERS, thread_name_prefix="element-upload")
+upload_thread = threading.local()  # upload_thread.in_pool is set in the pool's threads
+
+
+def run_in_upload_pool(func, items, progress=None):    # Returns a list of (item, result, error) in the order of items
+    """
+    Runs func(item) for every item in the shared upload pool. At most twice as many items as there
+    are workers are in flight at once. progress(done, total) is called after each finished item.
+    Functions run here must not query the database, as worker threads don't share the request's connection.
+    When called from a function running in the pool, items are run inline, as waiting for free slots
+    while holding a worker could deadlock.
+    """
+    items = list(items)
+    total = len(items)
+    results = [None] * total
+    
+    if getattr(upload_thread, "in_pool", False):
+        for idx, item in enumerate(items):
+            try:
+                results[idx] = (item, func(item), None)
+            except Exception as e:
+                results[idx] = (item, None, e)
+            if progress:
+                progress(idx + 1, total)
+        return results
+    
+    slots = threading.BoundedSemaphore(settings.ELEMENT_UPLOAD_WORKERS * 2)
+    lock = threading.Lock()
+    done = 0
+    finished = threading.Event()
+    if total == 0:
+        finished.set()
+    
+    def run(idx, item):
+        nonlocal done
+        upload_thread.in_pool = True
+        try:
+            results[idx] = (item, func(item), None)
+        except Exception as e:
+            results[idx] = (item, None, e)
+        finally:
+            slots.release()
+            with lock:
+                done += 1
+                current = done
+            if progress:
+                progress(current, total)
+            if current == total:
+                finished.set()
+    
+    for idx, item in enumerate(items):
+        slots.acquire()
+        UPLOAD_EXECUTOR.submit(run, idx, item)
+        
+    finished.wait()
+    return results
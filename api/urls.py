@@ -8,11 +8,14 @@ urlpatterns = [
     # DATASET HANDLING
     path("datasets/", DatasetListPublic.as_view(), name="datasets"),
     path("my-datasets/", DatasetListProfile.as_view(), name="my-datasets"),
+    path("my-saved-datasets/", SavedDatasetList.as_view(), name="my-saved-datasets"),
     path("datasets/<int:id>", GetDataset.as_view(), name="get-dataset"),
     path("datasets/public/<int:id>", GetDatasetPublic.as_view(), name="get-dataset-public"),
+    path("datasets/<int:id>/elements", DatasetElementList.as_view(), name="dataset-elements"),
     path("create-dataset/", CreateDataset.as_view(), name="create-dataset"),
     path("edit-dataset/", EditDataset.as_view(), name="edit-dataset"),
     path("download-dataset/", DownloadDataset.as_view(), name="download-dataset"),
+    path("datasets/<int:id>/export", ExportDataset.as_view(), name="export-dataset"),
     path("save-dataset/", SaveDataset.as_view(), name="save-dataset"),
     path("unsave-dataset/", UnsaveDataset.as_view(), name="unsave-dataset"),
     path("delete-dataset/", DeleteDataset.as_view(), name="delete-dataset"),
@@ -21,9 +24,11 @@ urlpatterns = [
 
     # ELEMENT HANDLING
     path("create-element/", CreateElement.as_view(), name="create-element"),
+    path("create-elements/", CreateElements.as_view(), name="create-elements"),
     path("edit-element-label/", EditElementLabel.as_view(), name="edit-element-label"),
     path("edit-element/", EditElement.as_view(), name="edit-element"),
     path("remove-element-label/", RemoveElementLabel.as_view(), name="remove-element-label"),
+    path("edit-element-labels/", EditElementLabels.as_view(), name="edit-element-labels"),
     path("delete-element/", DeleteElement.as_view(), name="delete-element"),
     path("resize-element-image/", ResizeElementImage.as_view(), name="resize-element-image"),
     
@@ -37,12 +42,15 @@ urlpatterns = [
     path("create-area/", CreateArea.as_view(), name="create-area"),
     path("edit-area/", EditArea.as_view(), name="edit-area"),
     path("delete-area/", DeleteArea.as_view(), name="delete-area"),
+    path("edit-areas/", EditAreas.as_view(), name="edit-areas"),
+    path("elements/<int:id>/areas", GetElementAreas.as_view(), name="element-areas"),
     
     # MODEL HANDLING
     path("models/", ModelListPublic.as_view(), name="models"),
     path("my-models/", ModelListProfile.as_view(), name="my-models"),
     path("models/<int:id>", GetModel.as_view(), name="get-model"),
     path("models/public/<int:id>", GetModelPublic.as_view(), name="get-model-public"),
+    path("models/<int:id>/shapes", ModelShapes.as_view(), name="model-shapes"),
     path("create-model/", CreateModel.as_view(), name="create-model"),
     path("delete-model/", DeleteModel.as_view(), name="delete-model"),
     path("edit-model/", EditModel.as_view(), name="edit-model"),
@@ -52,9 +60,17 @@ urlpatterns = [
     path("train-model/", TrainModel.as_view(), name="train-model"),
     path("evaluate-model/", EvaluateModel.as_view(), name="evaluate-model"),
     path("predict-model/", PredictModel.as_view(), name="predict-model"),
+    path("predict-model-batch/", PredictModelBatch.as_view(), name="predict-model-batch"),
+    path("model-cache-stats/", ModelCacheStats.as_view(), name="model-cache-stats"),
     
     # LAYER HANDLING
     path("create-layer/", CreateLayer.as_view(), name="create-layer"),
     path("delete-layer/", DeleteLayer.as_view(), name="delete-layer"),
-    path("edit-layer/", EditLayer.as_view(), name="edit-layer")
+    path("edit-layer/", EditLayer.as_view(), name="edit-layer"),
+    
+    # JOB HANDLING
+    path("my-jobs/", JobListProfile.as_view(), name="my-jobs"),
+    path("jobs/<int:id>", GetJob.as_view(), name="get-job"),
+    path("jobs/<int:id>/events", JobEvents.as_view(), name="job-events"),
+    path("cancel-job/", CancelJob.as_view(), name="cancel-job")
 ]
\ No newline at end of file
@@ -3,20 +3,29 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.models import User
 from rest_framework import generics, status
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from django.contrib.auth import authenticate, login
 from django.contrib import messages
 from rest_framework.response import Response
-from django.db.models import Q, Count
+from django.db import transaction, close_old_connections
+from django.core.handlers.asgi import ASGIRequest
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django.db.models import Q, Count, OuterRef, Subquery, IntegerField, Case, When, Value, Prefetch
+from django.db.models.functions import Coalesce
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.urls import resolve
+from django.http import StreamingHttpResponse, JsonResponse
+from django.views import View
+from asgiref.sync import sync_to_async
+import asyncio
 import json
-from rest_framework.test import APIRequestFactory
 import math
 import numpy as np
 
-import tempfile
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import tensorflow as tf
 from tensorflow.keras import layers
 
@@ -31,22 +40,44 @@ from django.core.files import File
 
 from .serializers import *
 from .models import *
+from .uploads import run_in_upload_pool
+from .model_cache import ModelCache
+from .layers import LAYER_TYPES, keras_layer_type, model_input_shape, infer_shapes
+from . import model_store
+from . import checkpoints
+from .file_cache import FileCache
+from .tensor_cache import preprocessed_image_cache, dataset_content_version
+from .label_encoder import LabelEncoder
+from .pagination import DatasetCursorPagination, ElementCursorPagination
+from .search import search_queryset
+from .export import EXPORT_LAYOUTS, archive_names, area_annotations, stream_zip, export_version, tfrecord_export_cache
 
 
 # CONSTANTS
 
 ALLOWED_IMAGE_FILE_EXTENSIONS = set(["png", "jpg", "jpeg", "webp", "avif"])
+MAX_PREDICTION_BATCH_SIZE = 512
+MAX_LABEL_BATCH_SIZE = 5000    # Elements per request to EditElementLabels
+REORDER_BATCH_SIZE = 500    # Rows per CASE WHEN update when reordering, keeps statements below SQLite's parameter limit
 
 
 # HELPER FUNCTIONS
 
-def get_s3_client():
-    s3_client = boto3.client(
-        's3',
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-        region_name=settings.AWS_S3_REGION_NAME
-    )
+s3_client = None
+s3_client_lock = threading.Lock()
+def get_s3_client():    # boto3 clients are thread safe, so one client and its connection pool is shared
+    global s3_client
+    
+    if s3_client is None:
+        with s3_client_lock:
+            if s3_client is None:
+                s3_client = boto3.client(
+                    's3',
+                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                    region_name=settings.AWS_S3_REGION_NAME,
+                    config=settings.AWS_S3_CLIENT_CONFIG
+                )
     return s3_client
 
 
@@ -109,6 +140,26 @@ def parse_dimensions(data): # Empty values given as blank strings, must be set t
         data["input_z"] = int(data["input_z"])
 
 
+def parse_bool(value):  # Flags like background are JSON booleans, or "true"/"false" strings in multipart requests
+    if isinstance(value, str):
+        return value.lower() == "true"
+    return bool(value)
+
+
+def parse_ids(value):   # Ids are a JSON list, or comma separated in multipart requests. Raises ValueError unless every id is a whole number
+    if isinstance(value, str):
+        value = [id for id in value.split(",") if id.strip()]
+    if not isinstance(value, (list, tuple)):
+        raise ValueError("Ids must be given as a list.")
+    
+    ids = []
+    for id in value:
+        if isinstance(id, bool) or not isinstance(id, (int, str)) or not str(id).strip().isdigit():
+            raise ValueError("Invalid id " + repr(id) + ".")
+        ids.append(int(id))
+    return ids
+
+
 import random
 
 def random_light_color():   # Slightly biased towards lighter shades
@@ -117,278 +168,263 @@ def random_light_color():   # Slightly biased towards lighter shades
     b = random.randint(150, 255)
     return "#{:02x}{:02x}{:02x}".format(r, g, b)
 
-def download_s3_file(bucket_name, file_key):
+element_file_cache = FileCache(settings.ELEMENT_FILE_CACHE_DIR, settings.ELEMENT_FILE_CACHE_MAX_BYTES)
+
+# Decodes images for PredictModelBatch, shared by all requests so the number of decoding threads stays bounded per process
+PREDICTION_EXECUTOR = ThreadPoolExecutor(max_workers=settings.PREDICTION_WORKERS, thread_name_prefix="prediction-decode")
+
+
+def download_s3_file(bucket_name, file_key, etag=None):    # Served from element_file_cache when the ETag is known
+    if etag:
+        data = element_file_cache.get(file_key, etag)
+        if data is not None:
+            return data
+    
     s3_client = get_s3_client()
     response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-    return response['Body'].read()  # Returns the raw bytes
+    data = response['Body'].read()  # The raw bytes
+    
+    element_file_cache.put(file_key, response['ETag'], data)
+    return data
 
 
-# Function to load and preprocess the images
-def load_and_preprocess_image(file_path,input_dims,file_key):
+def get_s3_etags(bucket_name, file_keys):  # Maps file keys to ETags, listing each directory once instead of a request per file
+    s3_client = get_s3_client()
+    paginator = s3_client.get_paginator("list_objects_v2")
+    
+    etags = {}
+    for prefix in set(os.path.dirname(file_key) + "/" for file_key in file_keys):
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                etags[obj["Key"]] = obj["ETag"]
+    return etags
+
+
+def fetch_element_bytes(file_key, etags):   # Called from tf.data through tf.py_function, file_key is a string tensor
+    file_key = file_key.numpy().decode()
+    return download_s3_file(settings.AWS_STORAGE_BUCKET_NAME, file_key, etags.get(file_key))
+
+
+# Function to decode and resize the images, without normalizing (traced by tf.data, so file_key is a string tensor)
+def decode_and_resize_image(file_key, input_dims, etags):
     
-    bucket_name = settings.AWS_STORAGE_BUCKET_NAME
-    image_bytes = download_s3_file(bucket_name, file_key)
+    image_bytes = tf.py_function(lambda key: fetch_element_bytes(key, etags), [file_key], tf.string)
 
-    # Decode the image
-    image = tf.image.decode_jpeg(image_bytes, channels=input_dims[-1])  # Assuming JPEG images
+    # Decode the image (JPEG, PNG, BMP or GIF)
+    image = tf.io.decode_image(image_bytes, channels=input_dims[-1], expand_animations=False)
     
     image = tf.image.resize(image, [input_dims[0], input_dims[1]])  # Input dimensions of model
     
-    # Normalize the image to [0, 1]
-    image = tf.cast(image, tf.float32) / 255.0
-    return image
+    # Rounded to uint8, the form stored in preprocessed_image_cache
+    image = tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8)
+    return tf.ensure_shape(image, input_dims)
 
 
-# Function to load and preprocess the text
-def load_and_preprocess_text(file_path, file_key):
-    
-    bucket_name = settings.AWS_STORAGE_BUCKET_NAME
-    text_bytes = download_s3_file(bucket_name, file_key)
-    
-    # Decode the text bytes into a string
-    text = tf.io.decode_utf8(text_bytes)  # Assuming UTF-8 encoded text
+# Function to load and preprocess the images
+def load_and_preprocess_image(file_key, input_dims, etags):
+    image = decode_and_resize_image(file_key, input_dims, etags)
     
-    return text
+    # Normalize the image to [0, 1]
+    return tf.cast(image, tf.float32) / 255.0
 
 
-# Convert labels to numeric form (for classification, example with 2 labels)
-label_map = {}  # Adjust based on your labels
-currentLabel = 0
-def map_labels(label):
+# Function to load and preprocess the text (traced by tf.data, so file_key is a string tensor)
+def load_and_preprocess_text(file_key, etags):
     
-    global label_map
-    global currentLabel
+    # The raw UTF-8 bytes, as a scalar string tensor
+    text = tf.py_function(lambda key: fetch_element_bytes(key, etags), [file_key], tf.string)
     
-    if label not in label_map.keys(): return None
-    return label_map[label]
+    return tf.ensure_shape(text, [])
 
 
-# Function to apply one-hot encoding
-def one_hot_encode(label, nbr_labels):
-    # Convert to one-hot encoded format
-    return tf.keras.utils.to_categorical(label, num_classes=nbr_labels)
+def get_preprocessed_images(dataset_instance, input_dims, elements=None, build=True):   # Returns (images, label ids, element ids) or None
+    """
+    Gets the labelled elements of an image dataset decoded and resized to input_dims from preprocessed_image_cache.
+    On a miss the entry is built with build=True, through the same lazy pipeline used for training.
+    elements can be given if already loaded (labelled elements ordered by id).
+    """
+    if elements is None:
+        elements = list(dataset_instance.elements.filter(label__isnull=False).order_by("id"))
+    version = dataset_content_version([(element.id, str(element.file), element.label_id) for element in elements])
+    cached = preprocessed_image_cache.load(dataset_instance.id, version, input_dims)
+    if cached is not None or not build:
+        return cached
+    
+    file_keys = ["media/" + str(element.file) for element in elements]
+    etags = get_s3_etags(settings.AWS_STORAGE_BUCKET_NAME, file_keys)
+    
+    images = tf.data.Dataset.from_tensor_slices(file_keys)
+    images = images.map(lambda file_key: decode_and_resize_image(file_key, input_dims, etags), num_parallel_calls=tf.data.AUTOTUNE)
+    images = images.batch(256).prefetch(tf.data.AUTOTUNE)
+    
+    return preprocessed_image_cache.build(dataset_instance.id, version, input_dims, (batch.numpy() for batch in images),
+                                          [element.label_id for element in elements], [element.id for element in elements])
 
 
-def create_tensorflow_dataset(dataset_instance, model_instance):    # Returns tensorflow dataset, number of elements in the dataset
-    global label_map
-    global currentLabel
-    
+def create_tensorflow_dataset(dataset_instance, model_instance, label_encoder, validation_split=0.0, batch_size=32, seed=None):    # Returns (dataset, validation dataset or None, number of elements)
+    """
+    Builds a lazy tf.data pipeline over the labelled elements of dataset_instance. Files are only fetched
+    (from the local element file cache or S3) and decoded in parallel inside Dataset.map while training,
+    so memory stays bounded by a few prefetched batches. Image datasets are read from
+    preprocessed_image_cache instead, which is built on the first run for a dataset and input shape.
+    The elements are shuffled once before splitting off the last validation_split of them as validation
+    data (with seed, the same split is made every time, e.g. when resuming training). The training data is
+    reshuffled every epoch. Labels are one-hot encoded by label_encoder.
+    """
     if not dataset_instance:
         return None
     
-    # Initiate label_map
-    label_map = {}
-    num_labels = dataset_instance.labels.count()
-    for t, label in enumerate(dataset_instance.labels.all()):
-        label_map[label.name] = t
-    
+    num_labels = len(label_encoder)
     first_layer = model_instance.layers.all().first()
-    input_dims = (512,512,3)    # Just placeholder
-
-    currentLabel = 0
-
-    elements = dataset_instance.elements.all()
-
-    file_paths = ["media/" + str(element.file) for element in elements]
-    labels = []
-
-    for t, element in enumerate(elements):
-        if element.label:
-            labels.append(element.label.name)
-        else:
-            file_paths.pop(t)   # Don't include elements without labels
-
-
-    elementIdx = 0
-    def imageMapFunc(file_path):
-        nonlocal elementIdx
-        
-        element = load_and_preprocess_image(file_path,input_dims,file_path)
-        elementIdx += 1
-        return element
-        
-    def textMapFunc(file_path):
-        nonlocal elementIdx
-        
-        element = load_and_preprocess_text(file_path,file_paths[elementIdx])
-        elementIdx += 1
-        return element
-
 
+    elements = list(dataset_instance.elements.filter(label__isnull=False).order_by("id"))   # Don't include elements without labels
+    
     if dataset_instance.dataset_type == "image":
         input_dims = (first_layer.input_x, first_layer.input_y, first_layer.input_z)
         
-        file_paths = list(map(imageMapFunc, file_paths))
+        preprocessed = get_preprocessed_images(dataset_instance, input_dims, elements)
         
     elif dataset_instance.dataset_type == "text":
-        file_paths = list(map(textMapFunc, file_paths))
+        preprocessed = None
+        
     else:
         print("Invalid dataset type.")
         return None
     
-    labels = list(map(lambda label: one_hot_encode(map_labels(label), num_labels), labels))
-
-    # Create TensorFlow Dataset
-    dataset = tf.data.Dataset.from_tensor_slices((file_paths, labels))
+    if preprocessed is not None:
+        images, label_ids, _ = preprocessed
+        one_hot_labels = label_encoder.one_hot(label_ids)
+        
+        def gather(rows):   # Reads a batch of rows from the memory mapped images
+            rows = np.sort(rows)
+            return images[rows].astype(np.float32) / 255.0, one_hot_labels[rows]
+        
+        def load_batch(rows):
+            batch_images, batch_labels = tf.numpy_function(gather, [rows], (tf.float32, tf.float32))
+            return tf.ensure_shape(batch_images, (None,) + input_dims), tf.ensure_shape(batch_labels, (None, num_labels))
+            
+        def to_batches(dataset, shuffle=False):
+            if shuffle:
+                dataset = dataset.shuffle(len(elements), reshuffle_each_iteration=True)
+            dataset = dataset.batch(batch_size).map(load_batch, num_parallel_calls=tf.data.AUTOTUNE)
+            return dataset.prefetch(tf.data.AUTOTUNE)
+        
+        rows = np.random.default_rng(seed).permutation(len(elements))
+        dataset = tf.data.Dataset.from_tensor_slices(rows)
+        
+    else:
+        random.Random(seed).shuffle(elements)
+        
+        file_keys = ["media/" + str(element.file) for element in elements]
+        labels = label_encoder.one_hot([element.label_id for element in elements])
 
-    dataset = dataset.batch(32)
+        # Lets unchanged files be read from the local element file cache
+        etags = get_s3_etags(settings.AWS_STORAGE_BUCKET_NAME, file_keys)
+        
+        if dataset_instance.dataset_type == "image":  # Only if the preprocessed images could not be stored
+            def load(file_key, label):
+                return load_and_preprocess_image(file_key, input_dims, etags), label
+        else:
+            def load(file_key, label):
+                return load_and_preprocess_text(file_key, etags), label
+        
+        def to_batches(dataset, shuffle=False):
+            if shuffle:     # Only file keys are shuffled, before anything is loaded
+                dataset = dataset.shuffle(len(file_keys), reshuffle_each_iteration=True)
+            dataset = dataset.map(load, num_parallel_calls=tf.data.AUTOTUNE)
+            return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
 
-    # Prefetch for performance (optional)
-    # dataset = dataset.prefetch(tf.data.experimental.AUTOTUNE)
+        # Create TensorFlow Dataset of file keys, files are loaded when iterated
+        dataset = tf.data.Dataset.from_tensor_slices((file_keys, labels))
+    
+    validation_size = int(len(elements) * validation_split)
+    if validation_size >= 1:    # Some dataset are too small for validation
+        train_size = len(elements) - validation_size
+        return to_batches(dataset.take(train_size), shuffle=True), to_batches(dataset.skip(train_size)), len(elements)
     
-    return dataset, len(file_paths)
+    return to_batches(dataset, shuffle=validation_split > 0), None, len(elements)
 
 
 
-def get_tf_layer(layer):    # From a Layer instance
-    layer_type = layer.layer_type
-    activation = layer.activation_function or None
-    
-    if layer_type == "dense":
-        if layer.input_x:
-            return layers.Dense(layer.nodes_count, activation=activation, input_shape=(layer.input_x,))
-        else:
-            return layers.Dense(layer.nodes_count, activation=activation)
-    elif layer_type == "conv2d":
-        if layer.input_x or layer.input_y or layer.input_z:   # Dimensions specified
-            return layers.Conv2D(layer.filters, layer.kernel_size, activation=activation, input_shape=(layer.input_x, layer.input_y, layer.input_z))
-        else:
-            return layers.Conv2D(layer.filters, layer.kernel_size, activation=activation)
-    elif layer_type == "maxpool2d":
-        return layers.MaxPool2D(pool_size=layer.pool_size)
-    elif layer_type == "flatten":
-        if layer.input_x or layer.input_y:   # Dimensions specified
-            return layers.Flatten(input_shape=(layer.input_x, layer.input_y))
-        else:
-            return layers.Flatten()
-    elif layer_type == "dropout":
-        return layers.Dropout(rate=layer.rate)
-    elif layer_type == "rescaling":
-        if layer.input_x or layer.input_y or layer.input_z:   # Dimensions specified
-            return layers.Rescaling(scale=layer.get_scale_value(), offset=layer.offset, input_shape=(layer.input_x, layer.input_y, layer.input_z))
-        else:
-            return layers.Rescaling(scale=layer.get_scale_value(), offset=layer.offset)
-    elif layer_type == "randomflip":
-        if layer.input_x or layer.input_y or layer.input_z:   # Dimensions specified
-            return layers.RandomFlip(mode=layer.mode, input_shape=(layer.input_x, layer.input_y, layer.input_z))
-        else:
-            return layers.RandomFlip(mode=layer.mode)
-    elif layer_type == "resizing":
-        if layer.input_x or layer.input_y or layer.input_z:   # Dimensions specified
-            return layers.Resizing(layer.output_y, layer.output_x, input_shape=(layer.input_x, layer.input_y, layer.input_z))
-        else:
-            return layers.Resizing(layer.output_y, layer.output_x)
-    else:
-        print("UNKNOWN LAYER OF TYPE: ", layer_type)
-        raise Exception("Invalid layer: " + layer_type)
-
-
-def layer_model_from_tf_layer(tf_layer, model_id, request, idx):    # Takes a TensorFlow layer and creates a Layer instance for the given model (if the layer is valid).
-    config = tf_layer.get_config()
-    
-    data = {}
-    
-    input_shape = False
-    if "batch_input_shape" in config.keys():
-        input_shape = config["batch_input_shape"]
-    
-    if isinstance(tf_layer, layers.Dense):
-        data["type"] = "dense"
-        data["nodes_count"] = config["units"]
-        if input_shape:
-            data["input_x"] = input_shape[-1]
-    elif isinstance(tf_layer, layers.Conv2D):
-        data["type"] = "conv2d"
-        data["filters"] = config["filters"]
-        data["kernel_size"] = config["kernel_size"][0]
-        if input_shape:
-            data["input_x"] = input_shape[1]    # First one is None
-            data["input_y"] = input_shape[2]
-            data["input_z"] = input_shape[3]
-    elif isinstance(tf_layer, layers.MaxPool2D):
-        data["type"] = "maxpool2d"
-        data["pool_size"] = config["pool_size"][0]
-    elif isinstance(tf_layer, layers.Flatten):
-        data["type"] = "flatten"
-        if input_shape:
-            data["input_x"] = input_shape[1]
-            data["input_y"] = input_shape[2]
-    elif isinstance(tf_layer, layers.Dropout):
-        data["type"] = "dropout"
-        data["rate"] = config["rate"]
-    elif isinstance(tf_layer, layers.Rescaling):
-        data["type"] = "rescaling"
-        data["scale"] = config["scale"]
-        data["offset"] = config["offset"]
-        if input_shape:
-            data["input_x"] = input_shape[1]
-            data["input_y"] = input_shape[2]
-            data["input_z"] = input_shape[3]
-    elif isinstance(tf_layer, layers.RandomFlip):
-        data["type"] = "randomflip"
-        data["mode"] = config["mode"]
-        if input_shape:
-            data["input_x"] = input_shape[1]
-            data["input_y"] = input_shape[2]
-            data["input_z"] = input_shape[3]
-    elif isinstance(tf_layer, layers.Resizing):
-        data["type"] = "resizing"
-        data["output_x"] = config["width"]
-        data["output_y"] = config["height"]
-        if input_shape:
-            data["input_x"] = input_shape[1]
-            data["input_y"] = input_shape[2]
-            data["input_z"] = input_shape[3]
-    else:
-        print("UNKNOWN LAYER OF TYPE: ", layer_type)
-        return # Continue instantiating model
-    
-    factory = APIRequestFactory()
-    
-    data["model"] = model_id
-    data["index"] = idx
-    data["activation_function"] = ""
-    if "activation" in config.keys():
-        data["activation_function"] = config["activation"]
-    
-    create_layer = CreateLayer.as_view()
+def get_tf_layer(layer):    # From a Layer instance, see LAYER_TYPES in api/layers.py
+    layer_type = LAYER_TYPES.get(layer.layer_type)
+    if layer_type is None:
+        print("UNKNOWN LAYER OF TYPE: ", layer.layer_type)
+        raise Exception("Invalid layer: " + layer.layer_type)
+    return layer_type.build(layer)
+
+
+def layers_from_tf_model(tf_model):    # Returns (unsaved Layer instances without a model, errors) for the layers of an imported Keras model
+    """
+    Layers are validated with the create serializers of their types and given consecutive indices. errors
+    describes every layer of an unknown type or with invalid values, the model can only be imported without any.
+    The model's input shape is stored in the input dimensions of its first layer, so that layer must take as many dimensions.
+    """
+    layer_instances = []
+    errors = []
+    input_shape = model_input_shape(tf_model)
+    for tf_layer in tf_model.layers:
+        if isinstance(tf_layer, layers.InputLayer):     # Its shape is given to the first layer
+            continue
+        layer_type = keras_layer_type(tf_layer)
+        if layer_type is None:
+            errors.append("Layer " + tf_layer.name + " has an unsupported type (" + type(tf_layer).__name__ + ").")
+            continue
+        
+        first = not layer_instances and not errors
+        if first and input_shape is not None and len(input_shape) - 1 != len(layer_type.input_fields):     # Without the batch dimension
+            errors.append("The input shape " + str(tuple(input_shape[1:])) + " of the model can't be stored, as its first layer " + tf_layer.name
+                          + " (" + type(tf_layer).__name__ + ") takes " + str(len(layer_type.input_fields)) + " input dimensions.")
+            continue
+        
+        fields = layer_type.from_keras(tf_layer, input_shape if first else None)
+        serializer = layer_type.create_serializer(data=fields)
+        if not serializer.is_valid():
+            for field, messages in serializer.errors.items():
+                errors.append("Layer " + tf_layer.name + ", " + field + ": " + " ".join(map(str, messages)))
+            continue
+        
+        layer_instances.append(layer_type.model(index=len(layer_instances), layer_type=layer_type.name,
+                                                activation_function=fields["activation_function"], **serializer.validated_data))
+    return layer_instances, errors
     
-    layer_request = factory.post('/create-layer/', data=json.dumps(data), content_type='application/json')
-    layer_request.user = request.user
     
-    layer_response = create_layer(layer_request)
-    if layer_response.status_code != 200:
-        return Response(
-            {'Bad Request': f'Error creating layer {idx}'},
-            status=layer_response.status_code
-        )
+tf_model_cache = ModelCache(settings.TF_MODEL_CACHE_SIZE)
+
+
+def load_tf_model(model_instance):    # Loads the model file of a built Model instance from storage
+    return model_store.load_model(model_instance)
     
     
-def get_tf_model(model_instance):     # Gets a Tensorflow model from a built Model instance
-    # Define the S3 bucket and file path
-    bucket_name = settings.AWS_STORAGE_BUCKET_NAME
-    model_file_path = "media/" + model_instance.model_file.name
+def get_tf_model(model_instance, cached=False):     # Gets a Tensorflow model from a built Model instance
+    """
+    With cached=True the model is shared with other requests through tf_model_cache, so it must not be
+    modified (compiled, trained). Models that are modified are loaded from storage and can be cached
+    with cache_tf_model once their new model file has been saved.
+    """
+    if not cached:
+        return load_tf_model(model_instance)
     
-    s3_client = get_s3_client()
-    
-    extension = model_file_path.split(".")[-1]
+    return tf_model_cache.get((model_instance.id, model_instance.model_file.name), lambda: load_tf_model(model_instance))
+
 
-    # Download the model file from S3 to a local temporary file
-    with open('temp_model' + str(model_instance.id) + '.' + extension, 'wb') as f:
-        s3_client.download_fileobj(bucket_name, model_file_path, f)
+def cache_tf_model(model_instance, model):  # Caches a model that was just saved to model_instance.model_file
+    tf_model_cache.put((model_instance.id, model_instance.model_file.name), model)
 
-    # Load the TensorFlow model from the temporary file
-    model = tf.keras.models.load_model('temp_model' + str(model_instance.id) + '.' + extension)
-    return model
+
+def save_tf_model(model_instance, model):   # Stores model as the new version of model_instance.model_file and caches it
+    model_store.save_model(model_instance, model)
+    cache_tf_model(model_instance, model)
     
     
-def remove_temp_tf_model(model_instance):
-    extension = str(model_instance.model_file).split(".")[-1]
-    os.remove('temp_model' + str(model_instance.id) + '.' + extension) 
+def get_model_label_encoder(model_instance):    # Decodes the outputs of a trained model
+    if model_instance.label_mapping is not None:
+        return LabelEncoder.from_mapping(model_instance.label_mapping)
+    return LabelEncoder.from_dataset(model_instance.trained_on)     # Trained before label mappings were stored
     
     
-def preprocess_uploaded_image(uploaded_file, target_size=(256,256,3)):   # Convert uploaded files to tensors for TensorFlow processing
-    image = Image.open(uploaded_file)
+def preprocess_image_array(file, target_size=(256,256,3)):   # Decodes an image file into a normalized float32 array of shape target_size
+    image = Image.open(file)
     
     # Convert to RGB (to handle grayscale images)
     if target_size[-1] == 3:
@@ -401,11 +437,17 @@ def preprocess_uploaded_image(uploaded_file, target_size=(256,256,3)):   # Conve
     # Resize the image to fit model requirements
     image = image.resize((target_size[0], target_size[1]))
     
-    # Convert image to NumPy array
-    image_array = np.array(image)
+    # Convert image to NumPy array, normalizing pixel values to [0,1]
+    image_array = np.asarray(image, dtype=np.float32) / 255.0
     
-    # Normalize pixel values to [0,1]
-    image_array = image_array / 255.0
+    if image_array.ndim == 2:   # Grayscale images have no channel dimension
+        image_array = np.expand_dims(image_array, axis=-1)
+    
+    return image_array
+
+
+def preprocess_uploaded_image(uploaded_file, target_size=(256,256,3)):   # Convert uploaded files to tensors for TensorFlow processing
+    image_array = preprocess_image_array(uploaded_file, target_size)
     
     # Expand dimensions to match TensorFlow model input
     image_array = np.expand_dims(image_array, axis=0)  # Shape: (1, height, width, channels)
@@ -418,45 +460,70 @@ def preprocess_uploaded_image(uploaded_file, target_size=(256,256,3)):   # Conve
 
 # PROFILE HANDLING
 
-class GetCurrentProfile(APIView):
-    serializer_class = ProfileSerializer
+def count_subquery(model, field, outer="pk"):  # Number of rows of model referencing the outer row (or the row outer refers to) through field
+    counts = model.objects.filter(**{field: OuterRef(outer)}).order_by().values(field).annotate(count=Count("*")).values("count")
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def annotate_dataset_counts(datasets):    # Adds the counts of DatasetSummarySerializer, without joining the counted tables
+    return datasets.select_related("owner").annotate(
+        element_count=count_subquery(Element, "dataset"),
+        label_count=count_subquery(Label, "dataset"),
+        download_count=count_subquery(Dataset.downloaders.through, "dataset"),
+        saved_count=count_subquery(Dataset.saved_by.through, "dataset"),
+    )
+
+
+class GetCurrentProfile(APIView):    # Saved datasets are summarized, see SavedDatasetList for all of them in pages
+    serializer_class = CurrentProfileSerializer
 
     def get(self, request, format=None):
         if request.user.id == None:
             return Response('', status=status.HTTP_200_OK)
-        profile = request.user.profile
-        profileSerialized = ProfileSerializer(profile)
-        data = profileSerialized.data
-        data["datasetsCount"] = profile.datasets.count()
-        data["modelsCount"] = profile.models.count()
         
-        return Response(data, status=status.HTTP_200_OK)
+        profile = (Profile.objects
+                   .annotate(datasetsCount=count_subquery(Dataset, "owner"), modelsCount=count_subquery(Model, "owner"))
+                   .prefetch_related(Prefetch("saved_datasets", queryset=annotate_dataset_counts(Dataset.objects.all())))
+                   .get(user=request.user))
+        
+        return Response(self.serializer_class(profile).data, status=status.HTTP_200_OK)
+    
+    
+class SavedDatasetList(generics.ListAPIView):   # Datasets saved by the user, in pages
+    serializer_class = DatasetSummarySerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = DatasetCursorPagination
+    
+    def get_queryset(self):
+        search = self.request.GET.get("search")
+        if search == None: search = ""
+        datasets = search_queryset(self.request.user.profile.saved_datasets.all(), search)
+        return annotate_dataset_counts(datasets)
 
 
 # DATASET HANDLING
 
 
 class DatasetListPublic(generics.ListAPIView):
-    serializer_class = DatasetSerializer
+    serializer_class = DatasetSummarySerializer
     permission_classes = [AllowAny]
+    pagination_class = DatasetCursorPagination
     
     def get_queryset(self):
         search = self.request.GET.get("search")
         if search == None: search = ""
-        datasets = Dataset.objects.filter(Q(visibility="public") & (
-            # Search handling
-            Q(name__icontains=search) | (
-                Q(
-                    keywords__icontains=search
-                )
-            )
-        ))
-        return datasets
+        datasets = search_queryset(Dataset.objects.filter(visibility="public"), search)
+        return annotate_dataset_counts(datasets)
 
 
 class DatasetListProfile(generics.ListCreateAPIView):
-    serializer_class = DatasetSerializer
     permission_classes  = [IsAuthenticated]
+    pagination_class = DatasetCursorPagination
+    
+    def get_serializer_class(self):
+        if self.request.method == "GET":
+            return DatasetSummarySerializer
+        return DatasetSerializer
 
     def get_queryset(self):
         user = self.request.user
@@ -464,18 +531,25 @@ class DatasetListProfile(generics.ListCreateAPIView):
         datasets = profile.datasets
         
         search = self.request.GET.get("search")
-        if (search):
-            datasets = datasets.filter(Q(name__contains=search) | (
-                Q(
-                    keywords__icontains=search
-                )
-            ))
+        if search == None: search = ""
+        datasets = search_queryset(datasets.all(), search)
 
-        return datasets
+        return annotate_dataset_counts(datasets)
 
 
-class GetDataset(APIView):
-    serializer_class = DatasetSerializer
+def get_dataset_header(query):     # Returns the serialized metadata of the dataset matching query, raises Dataset.DoesNotExist
+    dataset = (Dataset.objects.select_related("owner")
+               .prefetch_related("labels", "downloaders", "saved_by")
+               .annotate(element_count=count_subquery(Element, "dataset"))
+               .get(query))
+    
+    data = DatasetHeaderSerializer(dataset).data
+    data["trained_with"] = [list(model) for model in dataset.trained_with.values_list("id", "name")]
+    return data
+
+
+class GetDataset(APIView):  # Elements are loaded separately, see DatasetElementList
+    serializer_class = DatasetHeaderSerializer
     lookup_url_kwarg = 'id'
     
     def get(self, request, *args, **kwargs):
@@ -485,16 +559,7 @@ class GetDataset(APIView):
                 
             if dataset_id != None:
                 try:
-                    dataset = Dataset.objects.get(Q(id=dataset_id) & Q(Q(visibility = "public") | Q(owner=user.profile)))
-                    
-                    datasetSerialized = self.serializer_class(dataset)
-                    data = datasetSerialized.data
-                    data["ownername"] = dataset.owner.name
-                    
-                    trained_with = []
-                    for model in dataset.trained_with.all():
-                        trained_with.append([model.id, model.name])
-                    data["trained_with"] = trained_with
+                    data = get_dataset_header(Q(id=dataset_id) & Q(Q(visibility = "public") | Q(owner=user.profile)))
                     
                     return Response(data, status=status.HTTP_200_OK)
                     
@@ -508,8 +573,8 @@ class GetDataset(APIView):
             return Response({'Unauthorized': 'Must be logged in to get datasets.'}, status=status.HTTP_401_UNAUTHORIZED)
         
         
-class GetDatasetPublic(APIView):
-    serializer_class = DatasetSerializer
+class GetDatasetPublic(APIView):    # Elements are loaded separately, see DatasetElementList
+    serializer_class = DatasetHeaderSerializer
     lookup_url_kwarg = 'id' 
     
     def get(self, request, *args, **kwargs):
@@ -518,16 +583,7 @@ class GetDatasetPublic(APIView):
             
         if dataset_id != None:
             try:
-                dataset = Dataset.objects.get(Q(id=dataset_id) & Q(Q(visibility = "public")))
-                
-                datasetSerialized = self.serializer_class(dataset)
-                data = datasetSerialized.data
-                data["ownername"] = dataset.owner.name
-                
-                trained_with = []
-                for model in dataset.trained_with.all():
-                    trained_with.append([model.id, model.name])
-                data["trained_with"] = trained_with
+                data = get_dataset_header(Q(id=dataset_id) & Q(Q(visibility = "public")))
                 
                 return Response(data, status=status.HTTP_200_OK)
                 
@@ -538,6 +594,46 @@ class GetDatasetPublic(APIView):
             return Response({'Bad Request': 'Id parameter not found in call to GetDataset.'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+class DatasetElementList(generics.ListAPIView):     # Elements of a public dataset or a dataset belonging to the user, in pages
+    """
+    Optional filters: label (label id), unlabelled (true to only get elements without labels),
+    index_from and index_to (inclusive element index range).
+    """
+    serializer_class = ElementSerializer
+    permission_classes = [AllowAny]
+    pagination_class = ElementCursorPagination
+    lookup_url_kwarg = 'id'
+    
+    def list(self, request, *args, **kwargs):
+        user = self.request.user
+        dataset_id = kwargs[self.lookup_url_kwarg]
+        
+        visible = Q(visibility="public")
+        if user.is_authenticated:
+            visible |= Q(owner=user.profile)
+        if not Dataset.objects.filter(Q(id=dataset_id) & visible).exists():
+            return Response({'Not found': 'No public dataset or dataset belonging to you was found with the id ' + str(dataset_id) + '.'}, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            self.filters = {"dataset_id": dataset_id}
+            params = request.query_params
+            if params.get("label"):
+                self.filters["label_id"] = int(params["label"])
+            if params.get("unlabelled") == "true":
+                self.filters["label__isnull"] = True
+            if params.get("index_from"):
+                self.filters["index__gte"] = int(params["index_from"])
+            if params.get("index_to"):
+                self.filters["index__lte"] = int(params["index_to"])
+        except ValueError:
+            return Response({'Bad Request': 'label, index_from and index_to must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return super().list(request, *args, **kwargs)
+    
+    def get_queryset(self):
+        return Element.objects.filter(**self.filters).prefetch_related("areas")
+
+
 class CreateDataset(APIView):
     serializer_class = CreateDatasetSerializer
     parser_classes = [MultiPartParser, FormParser]
@@ -556,63 +652,18 @@ class CreateDataset(APIView):
                 
                 createSmallImage(dataset_instance, 230, 190)    # Create a smaller image for displaying dataset elements
                 
+                data = serializer.data
+                data["failed"] = []
+                
                 if "labels" in data_dict.keys():
-                    labels = data_dict["labels"]
-                    create_element = CreateElement.as_view()
-                    create_label = CreateLabel.as_view()
-                    edit_element_label = EditElementLabel.as_view()
+                    files_by_label = {}
+                    for label in data_dict["labels"]:
+                        files_by_label[label] = data_dict.get(label, [])
                     
-                    factory = APIRequestFactory()
-
-                    for label in labels:
-                        elements = data_dict[label]
-                        
-                        label_request = factory.post('/create-label/', data=json.dumps({"name": label,
-                                                                                            "dataset": dataset_instance.id, 
-                                                                                            "color": random_light_color(),
-                                                                                            "keybind": ""}), content_type='application/json')
-                        label_request.user = request.user
-                        
-                        label_response = create_label(label_request)
-                        if label_response.status_code != 200:
-                            return Response(
-                                {'Bad Request': f'Error creating label {label}'},
-                                status=label_response.status_code
-                            )
+                    elements, failed = ingest_dataset_elements(dataset_instance, request.user.profile, files_by_label)
+                    data["failed"] = failed
                         
-                        label_id = label_response.data["id"]
-                        for element in elements:
-                            element_request = factory.post("/create-element/", data={
-                                "file": element,
-                                "dataset": dataset_instance.id,
-                            }, format="multipart")
-                            element_request.user = request.user
-                            
-                            element_response = create_element(element_request)
-                            if element_response.status_code != 200:
-                                return Response(
-                                    {'Bad Request': 'Error creating element'},
-                                    status=element_response.status_code
-                                )
-                            
-                            element_id = element_response.data["id"]
-                            
-                            label_element_request = factory.post("/edit-element-label/", data=json.dumps({
-                                "label": label_id,
-                                "id": element_id
-                                }), content_type='application/json')
-                            label_element_request.user = request.user
-                            
-                            label_element_response = edit_element_label(label_element_request)
-                            if label_element_response.status_code != 200:
-                                return Response(
-                                    {'Bad Request': 'Error labelling element'},
-                                    status=label_element_response.status_code
-                                )
-                                
-                    return Response(serializer.data, status=status.HTTP_200_OK)
-                else:            
-                    return Response(serializer.data, status=status.HTTP_200_OK)
+                return Response(data, status=status.HTTP_200_OK)
             else:
                 return Response({'Bad Request': 'An error occurred while creating dataset'}, status=status.HTTP_400_BAD_REQUEST)
         else:
@@ -658,14 +709,21 @@ class EditDataset(APIView):
                         dataset.imageHeight = int(imageHeight)
                     else: dataset.imageHeight = None
                         
+                    job = None
                     if imageWidth and imageHeight:
-                        for element in dataset.elements.all():
-                            resize_element_image(element, int(imageHeight), int(imageWidth))
+                        if parse_bool(request.data.get("background", False)):
+                            job = Job.objects.create(owner=user.profile, job_type="resize_dataset", dataset=dataset, params={
+                                "width": int(imageWidth), "height": int(imageHeight)
+                            })
+                        else:
+                            resize_dataset_elements(dataset, int(imageWidth), int(imageHeight))
                         
                     else: dataset.imageHeight = None
                         
                     dataset.save()
-                
+                    
+                    if job:
+                        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
                     return Response(None, status=status.HTTP_200_OK)
                 
                 else:
@@ -697,6 +755,151 @@ class DownloadDataset(APIView):
             return Response({"Unauthorized": "Did not increase download count as user is not signed in."}, status=status.HTTP_401_UNAUTHORIZED)
         
         
+FILE_CHUNK_SIZE = 1024 ** 2
+
+
+def streaming_content(request, iterable):   # Content for a StreamingHttpResponse of iterable, without buffering it under ASGI
+    """
+    Under ASGI (see Procfile), Django reads sync iterators into a list before sending anything, so large
+    downloads would be held in memory. They are given an async iterator instead, which advances iterable in a
+    thread of the default executor rather than the one shared by sync views. Under WSGI iterable is used as is.
+    """
+    if not isinstance(getattr(request, "_request", request), ASGIRequest):
+        return iterable
+    
+    iterator = iter(iterable)
+    end = object()
+    async def chunks():
+        try:
+            while True:
+                chunk = await sync_to_async(next, thread_sensitive=False)(iterator, end)
+                if chunk is end:
+                    return
+                yield chunk
+        finally:    # Also when the client disconnects
+            if hasattr(iterator, "close"):
+                await sync_to_async(iterator.close, thread_sensitive=False)()
+    return chunks()
+
+
+def file_chunks(name):  # Yields the contents of a stored file
+    with default_storage.open(name, "rb") as f:
+        while chunk := f.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+
+def get_export_contents(dataset):     # Returns (elements, label names by id, areas by element id or None) as exported
+    elements = list(dataset.elements.values("id", "name", "file", "label"))
+    labels = dict(dataset.labels.values_list("id", "name"))
+    areas = None
+    if dataset.datatype == "area":
+        areas = {}
+        for area in Area.objects.filter(element__dataset=dataset).only("element_id", "label_id", "area_points"):
+            areas.setdefault(area.element_id, []).append({"label": area.label_id, "points": area.get_points()})
+    return elements, labels, areas
+
+
+def get_element_fetcher(elements):   # Returns a function reading the file of an element, run in the export pool without database access
+    file_keys = ["media/" + element["file"] for element in elements]
+    etags = get_s3_etags(settings.AWS_STORAGE_BUCKET_NAME, file_keys) if file_keys else {}
+    def fetch(element):
+        file_key = "media/" + element["file"]
+        return download_s3_file(settings.AWS_STORAGE_BUCKET_NAME, file_key, etags.get(file_key))
+    return fetch
+
+
+def export_dataset_tfrecord(dataset, shards, progress=None):    # Builds and stores the TFRecord export of a dataset unless it is stored, returns its file name
+    elements, labels, areas = get_export_contents(dataset)
+    version = export_version(elements, labels.items(), areas or {}, shards)
+    name = tfrecord_export_cache.get(dataset.id, version)
+    if name is not None:
+        return name
+    
+    label_encoder = LabelEncoder.from_dataset(dataset)
+    label_names = [label["name"] for label in label_encoder.labels]
+    label_indices = {label["id"]: index for index, label in enumerate(label_encoder.labels)}
+    return tfrecord_export_cache.build(dataset.id, version, elements, get_element_fetcher(elements), label_names, label_indices, shards, areas,
+                                       progress=progress)
+
+
+class ExportDataset(APIView):   # Streams a public dataset or a dataset belonging to the user as a ZIP archive, or as sharded TFRecords
+    """
+    Query parameters: type (zip or tfrecord, default zip, as format is used by Django REST framework), layout (for ZIP archives, folders, files or area,
+    defaults to area for area datasets and folders otherwise) and shards (for TFRecords, defaults to one per
+    DATASET_EXPORT_SHARD_SIZE elements). ZIP archives are written while element files are read, TFRecord
+    exports are stored (see api/export.py) and reused until the dataset's elements, labels or areas change.
+    TFRecord exports that aren't stored yet are built by an export_tfrecord job: the job is returned with
+    status 202 (logged in users only), and requesting the export again returns it once the job is done.
+    The last failed job for the same version is returned with status 502, retry=true queues a new one.
+    """
+    permission_classes = [AllowAny]
+    lookup_url_kwarg = 'id'
+    
+    def get(self, request, *args, **kwargs):
+        user = self.request.user
+        dataset_id = kwargs[self.lookup_url_kwarg]
+        
+        visible = Q(visibility="public")
+        if user.is_authenticated:
+            visible |= Q(owner=user.profile)
+        try:
+            dataset = Dataset.objects.get(Q(id=dataset_id) & visible)
+        except Dataset.DoesNotExist:
+            return Response({'Not found': 'No public dataset or dataset belonging to you was found with the id ' + str(dataset_id) + '.'}, status=status.HTTP_404_NOT_FOUND)
+        
+        export_format = request.query_params.get("type", "zip")
+        layout = request.query_params.get("layout", "area" if dataset.datatype == "area" else "folders")
+        if export_format not in ("zip", "tfrecord"):
+            return Response({'Bad Request': 'type must be zip or tfrecord.'}, status=status.HTTP_400_BAD_REQUEST)
+        if layout not in EXPORT_LAYOUTS:
+            return Response({'Bad Request': 'layout must be one of ' + ", ".join(EXPORT_LAYOUTS) + '.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        elements, labels, areas = get_export_contents(dataset)
+        filename = dataset.name.replace(" ", "_")
+        
+        if export_format == "zip":
+            if user.is_authenticated:
+                dataset.downloaders.add(user.profile)
+            names = archive_names(elements, labels, layout)
+            extra_files = []
+            if areas is not None:
+                extra_files.append((dataset.name + ".json", area_annotations(elements, names, labels, areas)))
+            
+            response = StreamingHttpResponse(streaming_content(request, stream_zip(elements, get_element_fetcher(elements), names, extra_files)), content_type="application/zip")
+            response["Content-Disposition"] = 'attachment; filename="' + filename + '.zip"'
+            return response
+        
+        try:
+            default_shards = max(1, math.ceil(len(elements) / settings.DATASET_EXPORT_SHARD_SIZE))
+            shards = int(request.query_params.get("shards", default_shards))
+            if shards < 1 or shards > max(len(elements), 1):
+                raise ValueError()
+        except ValueError:
+            return Response({'Bad Request': 'shards must be an integer between 1 and the number of elements.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        version = export_version(elements, labels.items(), areas or {}, shards)
+        name = tfrecord_export_cache.get(dataset.id, version)
+        if name is None:    # Built by a job, as reading every element takes longer than a request may
+            if not user.is_authenticated:
+                return Response({'Unauthorized': 'Must be logged in to export datasets as TFRecords that have not been exported yet.'}, status=status.HTTP_401_UNAUTHORIZED)
+            
+            job = Job.objects.filter(job_type="export_tfrecord", dataset=dataset, params__version=version).order_by("-created_at").first()
+            if job is not None and job.status == "failed" and not parse_bool(request.query_params.get("retry", False)):
+                return Response({'Bad Gateway': 'Exporting the dataset failed: ' + job.error}, status=status.HTTP_502_BAD_GATEWAY)
+            if job is None or job.status not in ("queued", "running"):
+                job = Job.objects.create(owner=user.profile, job_type="export_tfrecord", dataset=dataset, params={
+                    "shards": shards, "version": version
+                })
+            return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        
+        if user.is_authenticated:
+            dataset.downloaders.add(user.profile)
+        response = StreamingHttpResponse(streaming_content(request, file_chunks(name)), content_type="application/zip")
+        response["Content-Disposition"] = 'attachment; filename="' + filename + '_tfrecord.zip"'
+        response["Content-Length"] = default_storage.size(name)
+        return response
+        
+        
 class SaveDataset(APIView):
     parser_classes = [JSONParser]
     
@@ -766,24 +969,77 @@ class DeleteDataset(APIView):
             return Response({'Unauthorized': 'Must be logged in to delete datasets.'}, status=status.HTTP_401_UNAUTHORIZED)
         
         
+def reorder_indices(queryset, order=None, moves=None):     # Updates the index field of rows in queryset, returns the number of rows changed
+    """
+    order maps ids to new indices ({id: index}), as sent by the reorder endpoints.
+    moves are sparse changes ([{"id": X, "before": Y}], Y being None to move X last), applied in order to
+    the current ordering, after which only rows whose index changed are updated.
+    Indices are set with CASE WHEN updates (one per REORDER_BATCH_SIZE rows) in a single transaction,
+    so no rows are loaded as instances and no save signals are sent. Raises ValueError for unknown ids and malformed input.
+    """
+    if moves:
+        if not isinstance(moves, list) or not all(isinstance(move, dict) and "id" in move for move in moves):
+            raise ValueError("moves must be a list of {\"id\": X, \"before\": Y}.")
+    else:
+        if not isinstance(order, dict):
+            raise ValueError("order must map ids to indices.")
+        if not all(isinstance(index, int) and not isinstance(index, bool) for index in order.values()):
+            raise ValueError("Indices must be integers.")
+    
+    with transaction.atomic():
+        if moves:
+            current = dict(queryset.values_list("id", "index"))
+            ids = list(queryset.order_by("index", "id").values_list("id", flat=True))
+            
+            for move in moves:
+                moved_id = int(move["id"])
+                before = move.get("before")
+                if moved_id not in current or (before is not None and int(before) not in current):
+                    raise ValueError("Unknown id in move: " + str(move))
+                
+                ids.remove(moved_id)
+                ids.insert(ids.index(int(before)) if before is not None else len(ids), moved_id)
+                
+            order = {id: t for t, id in enumerate(ids) if current[id] != t}
+        else:
+            order = {int(id): int(index) for id, index in order.items()}
+            unknown = set(order) - set(queryset.filter(id__in=order.keys()).values_list("id", flat=True))
+            if unknown:
+                raise ValueError("Unknown ids: " + ", ".join(map(str, sorted(unknown))))
+        
+        ids = list(order)
+        for start in range(0, len(ids), REORDER_BATCH_SIZE):
+            batch = ids[start:start + REORDER_BATCH_SIZE]
+            queryset.filter(id__in=batch).update(index=Case(
+                *[When(id=id, then=Value(order[id])) for id in batch], output_field=IntegerField()
+            ))
+            
+    return len(order)
+    
+    
 class ReorderDatasetElements(APIView):
     serializer_class = DatasetSerializer
     parser_classes = [JSONParser]
     
     def post(self, request, format=None):
-        idToIdx = request.data["order"]
+        idToIdx = request.data.get("order")   # {id: index} for every row, or
+        moves = request.data.get("moves")   # [{"id": X, "before": Y}], see reorder_indices
         dataset_id = request.data["id"]
         
         user = self.request.user
         
+        if idToIdx is None and not moves:
+            return Response({"Bad Request": "Either order or moves must be given."}, status=status.HTTP_400_BAD_REQUEST)
+        
         if user.is_authenticated:
             try:
                 dataset = Dataset.objects.get(id=dataset_id)
                 
                 if dataset.owner == user.profile:
-                    for element in dataset.elements.all():
-                        element.index = int(idToIdx[str(element.id)])
-                        element.save()
+                    try:
+                        reorder_indices(dataset.elements.all(), order=idToIdx, moves=moves)
+                    except (ValueError, KeyError, TypeError) as e:
+                        return Response({"Bad Request": "Invalid order: " + str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
                     return Response(None, status=status.HTTP_200_OK)
                 
@@ -800,19 +1056,24 @@ class ReorderDatasetLabels(APIView):
     parser_classes = [JSONParser]
     
     def post(self, request, format=None):
-        idToIdx = request.data["order"]
+        idToIdx = request.data.get("order")   # {id: index} for every row, or
+        moves = request.data.get("moves")   # [{"id": X, "before": Y}], see reorder_indices
         dataset_id = request.data["id"]
         
         user = self.request.user
         
+        if idToIdx is None and not moves:
+            return Response({"Bad Request": "Either order or moves must be given."}, status=status.HTTP_400_BAD_REQUEST)
+        
         if user.is_authenticated:
             try:
                 dataset = Dataset.objects.get(id=dataset_id)
                 
                 if dataset.owner == user.profile:
-                    for label in dataset.labels.all():
-                        label.index = int(idToIdx[str(label.id)])
-                        label.save()
+                    try:
+                        reorder_indices(dataset.labels.all(), order=idToIdx, moves=moves)
+                    except (ValueError, KeyError, TypeError) as e:
+                        return Response({"Bad Request": "Invalid order: " + str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
                     return Response(None, status=status.HTTP_200_OK)
                 
@@ -827,7 +1088,7 @@ class ReorderDatasetLabels(APIView):
 # ELEMENT HANDLING
 
 
-def resize_element_image(instance, newWidth, newHeight):
+def resize_element_image(instance, newWidth, newHeight, save=True):
     new_name = instance.file.name.split("/")[-1]     # Otherwise includes files
     new_name, extension = new_name.split(".")     
     new_name = new_name.split("-")[0]   # Remove previous resize information      
@@ -835,28 +1096,84 @@ def resize_element_image(instance, newWidth, newHeight):
     new_name += ("-" + str(newWidth) + "x" + str(newHeight) + "." + extension) 
     
     try:
-        
-        img = Image.open(instance.file)
-        img = img.resize([newWidth, newHeight], Image.LANCZOS)
+        buffer = resize_image(instance.file, (newWidth, newHeight), extension)
         
         if default_storage.exists(instance.file.name):
             default_storage.delete(instance.file.name)
-        
-        # Save to BytesIO buffer
-        buffer = BytesIO()
-        img_format = img.format if img.format else "JPEG"  # Default to JPEG
-        img.save(buffer, format=img_format, quality=90)
-        buffer.seek(0)
                             
-        instance.file.save(new_name, ContentFile(buffer.read()), save=False)
+        instance.file.save(new_name, File(buffer), save=False)
         instance.imageWidth = newWidth
         instance.imageHeight = newHeight
-        instance.save()
+        if save:
+            instance.save()
         
     except IOError:
         print("Element ignored: not an image.")
 
 
+def resize_dataset_elements(dataset, newWidth, newHeight, progress=None, should_stop=None, batch_size=100):  # Returns the number of resized elements
+    elements = list(dataset.elements.all())
+    
+    for start in range(0, len(elements), batch_size):
+        if should_stop and should_stop():
+            return start
+        
+        batch = elements[start:start + batch_size]
+        run_in_upload_pool(lambda element: resize_element_image(element, newWidth, newHeight, save=False), batch)
+        Element.objects.bulk_update(batch, ["file", "imageWidth", "imageHeight"])
+        
+        if progress:
+            progress(start + len(batch), len(elements))
+            
+    return len(elements)
+
+
+def prepare_element_file(element):    # Processes and uploads the file of an unsaved element, without touching the database
+    Element._meta.get_field("file").run_validators(element.file)
+    
+    element.process_file()  # Resizes images to the dataset's dimensions if specified
+    Element._meta.get_field("file").pre_save(element, True) # Uploads the file
+    
+    return element
+
+
+def ingest_dataset_elements(dataset, profile, files_by_label, start_index=0, progress=None):    # Bulk creates labels and elements, returns (elements, failed)
+    """
+    files_by_label maps a label name (or None for unlabelled files) to a list of uploaded files.
+    Files are processed and uploaded in parallel, after which all labels and elements are inserted
+    in one transaction. Files that fail are reported in failed instead of aborting the upload.
+    """
+    labels = {}
+    for t, label_name in enumerate(filter(lambda name: name is not None, files_by_label.keys())):
+        labels[label_name] = Label(dataset=dataset, owner=profile, name=label_name, color=random_light_color(), keybind="", index=t)
+    
+    elements = []
+    for label_name, files in files_by_label.items():
+        for file in files:
+            elements.append(Element(dataset=dataset, owner=profile, file=file, label=labels.get(label_name), index=start_index + len(elements)))
+    
+    prepared = []
+    failed = []
+    for element, _, error in run_in_upload_pool(prepare_element_file, elements, progress=progress):
+        if error is None:
+            prepared.append(element)
+        else:
+            failed.append({"name": os.path.basename(element.file.name),
+                           "label": element.label.name if element.label else None,
+                           "error": " ".join(error.messages) if isinstance(error, ValidationError) else str(error)})
+    
+    try:
+        with transaction.atomic():
+            Label.objects.bulk_create(labels.values())
+            created = Element.objects.bulk_create(prepared)
+    except Exception:
+        for element in prepared:    # Don't leave uploaded files without elements behind
+            element.file.delete(save=False)
+        raise
+    
+    return created, failed
+
+
 class CreateElement(APIView):
     serializer_class = CreateElementSerializer
     parser_classes = [MultiPartParser, FormParser]
@@ -877,12 +1194,7 @@ class CreateElement(APIView):
                 if user.is_authenticated:
                     
                     if user.profile == dataset.owner:
-                        instance = serializer.save(owner=request.user.profile)
-                        
-                        fileExtension = instance.file.name.split("/")[-1].split(".")[-1]
-                        # Resize images if dataset has specified dimensions
-                        if dataset.imageHeight and dataset.imageWidth and fileExtension in ALLOWED_IMAGE_FILE_EXTENSIONS:
-                            resize_element_image(instance, dataset.imageWidth, dataset.imageHeight)
+                        instance = serializer.save(owner=request.user.profile)   # Resizes images if dataset has specified dimensions
                             
                         return Response({"data": serializer.data, "id": instance.id}, status=status.HTTP_200_OK)
                     
@@ -897,6 +1209,36 @@ class CreateElement(APIView):
             return Response({"Bad Request": "An error occured while creating element"}, status=status.HTTP_400_BAD_REQUEST)
         
         
+class CreateElements(APIView):  # Bulk version of CreateElement, used for uploading many files at once
+    parser_classes = [MultiPartParser, FormParser]
+    
+    def post(self, request, format=None):
+        dataset_id = request.data.get("dataset", None)
+        files = request.data.getlist("files")
+        start_index = int(request.data.get("index", 0) or 0)
+        
+        user = self.request.user
+        
+        if user.is_authenticated:
+            try:
+                dataset = Dataset.objects.get(id=dataset_id)
+                
+                if user.profile == dataset.owner:
+                    if not files:
+                        return Response({"Bad Request": "No files were uploaded."}, status=status.HTTP_400_BAD_REQUEST)
+                    
+                    elements, failed = ingest_dataset_elements(dataset, user.profile, {None: files}, start_index=start_index)
+                    
+                    return Response({"ids": [element.id for element in elements], "failed": failed}, status=status.HTTP_200_OK)
+                
+                else:
+                    return Response({'Unauthorized': 'You can only add elements to your own datasets.'}, status=status.HTTP_401_UNAUTHORIZED)
+            except Dataset.DoesNotExist:
+                return Response({'Not found': 'Could not find dataset with the id ' + str(dataset_id) + '.'}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            return Response({'Unauthorized': 'Must be logged in to create elements.'}, status=status.HTTP_401_UNAUTHORIZED)
+        
+        
 class EditElementLabel(APIView):   # Currently only used for labelling
     serializer_class = EditElementSerializer
     parser_classes = [JSONParser]
@@ -916,7 +1258,7 @@ class EditElementLabel(APIView):   # Currently only used for labelling
                 label = Label.objects.get(id=label_id)
                 if element.owner == user.profile:
                     element.label = label
-                    element.save()
+                    element.save(update_fields=["label"])
                 
                     return Response(ElementSerializer(element).data, status=status.HTTP_200_OK)
                 
@@ -973,7 +1315,7 @@ class RemoveElementLabel(APIView):
 
                 if element.owner == user.profile:
                     element.label = None
-                    element.save()
+                    element.save(update_fields=["label"])
                 
                     return Response(None, status=status.HTTP_200_OK)
                 
@@ -985,6 +1327,57 @@ class RemoveElementLabel(APIView):
             return Response({'Unauthorized': 'Must be logged in to edit elements.'}, status=status.HTTP_401_UNAUTHORIZED)
         
         
+class EditElementLabels(APIView):  # Sets or clears the labels of many elements at once
+    parser_classes = [JSONParser]
+
+    def post(self, request, format=None):
+        """
+        labels is a list of [element id, label id or null]. All elements must belong to the user, and labels
+        to the same dataset as their elements. Returns the changes as [element id, previous label, label].
+        """
+        changes = request.data.get("labels")
+        
+        user = self.request.user
+        
+        if changes is None:
+            return Response({'Bad Request': 'labels must be given.'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if user.is_authenticated:
+            try:
+                changes = {int(element_id): (int(label_id) if label_id is not None else None) for element_id, label_id in changes}
+            except (ValueError, TypeError):
+                return Response({'Bad Request': 'labels must be a list of [element id, label id or null].'}, status=status.HTTP_400_BAD_REQUEST)
+            if len(changes) > MAX_LABEL_BATCH_SIZE:
+                return Response({'Bad Request': 'At most ' + str(MAX_LABEL_BATCH_SIZE) + ' elements can be labelled at once.'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            elements = {element.id: element for element in Element.objects.filter(id__in=changes.keys()).only("id", "owner_id", "dataset_id", "label_id")}
+            missing = [element_id for element_id in changes if element_id not in elements]
+            if missing:
+                return Response({'Not found': 'Could not find elements with the ids ' + ", ".join(map(str, missing)) + '.'}, status=status.HTTP_404_NOT_FOUND)
+            if any(element.owner_id != user.profile.pk for element in elements.values()):
+                return Response({'Unauthorized': 'You can only edit your own elements.'}, status=status.HTTP_401_UNAUTHORIZED)
+            
+            label_datasets = dict(Label.objects.filter(id__in={label_id for label_id in changes.values() if label_id is not None}).values_list("id", "dataset_id"))
+            for element_id, label_id in changes.items():
+                if label_id is not None and label_datasets.get(label_id) != elements[element_id].dataset_id:
+                    return Response({'Bad Request': 'Could not find label with the id ' + str(label_id) + ' in the dataset of element ' + str(element_id) + '.'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            changed = []
+            diff = []
+            for element_id, label_id in changes.items():
+                element = elements[element_id]
+                if element.label_id != label_id:
+                    diff.append([element_id, element.label_id, label_id])
+                    element.label_id = label_id
+                    changed.append(element)
+                    
+            Element.objects.bulk_update(changed, ["label"], batch_size=REORDER_BATCH_SIZE)
+            
+            return Response({"changed": diff, "unchanged": len(changes) - len(changed)}, status=status.HTTP_200_OK)
+        else:
+            return Response({'Unauthorized': 'Must be logged in to edit elements.'}, status=status.HTTP_401_UNAUTHORIZED)
+        
+        
 class DeleteElement(APIView):
     serializer_class = ElementSerializer
     
@@ -1034,19 +1427,12 @@ class ResizeElementImage(APIView):
                     
                     try:
                         
-                        img = Image.open(file)
-                        img = img.resize([newWidth, newHeight], Image.LANCZOS)
+                        buffer = resize_image(file, (newWidth, newHeight), extension)
                         
                         if default_storage.exists(file.name):
                             default_storage.delete(file.name)
-                        
-                        # Save to BytesIO buffer
-                        buffer = BytesIO()
-                        img_format = img.format if img.format else "JPEG"  # Default to JPEG
-                        img.save(buffer, format=img_format, quality=90)
-                        buffer.seek(0)
                                             
-                        element.file.save(new_name, ContentFile(buffer.read()), save=False)
+                        element.file.save(new_name, File(buffer), save=False)
                         element.imageWidth = newWidth
                         element.imageHeight = newHeight
                         element.save()
@@ -1287,40 +1673,179 @@ class DeleteArea(APIView):
             return Response({'Unauthorized': 'Must be logged in to delete areas.'}, status=status.HTTP_401_UNAUTHORIZED)
         
         
+class EditAreas(APIView):  # Creates, updates and deletes many areas at once
+    parser_classes = [JSONParser]
+    
+    def post(self, request, format=None):
+        """
+        create is a list of {"element", "label", "area_points"}, update a list of {"id", "area_points"} with an
+        optional "label" (areas updated with no points are deleted, as in EditArea) and delete a list of area ids.
+        All elements and labels must belong to the user, and labels to the datasets of their elements.
+        """
+        to_create = request.data.get("create", [])
+        to_update = request.data.get("update", [])
+        to_delete = request.data.get("delete", [])
+        
+        user = self.request.user
+        
+        if user.is_authenticated:
+            try:
+                to_create = [{"element": int(area["element"]), "label": int(area["label"]) if area.get("label") is not None else None,
+                              "area_points": area["area_points"]} for area in to_create]
+                to_update = {int(area["id"]): {"label": int(area["label"]) if area.get("label") is not None else None,
+                                               "area_points": area["area_points"]} for area in to_update}
+                to_delete = set(map(int, to_delete))
+            except (ValueError, TypeError, KeyError, AttributeError):
+                return Response({"Bad Request": "create must be a list of {element, label, area_points}, update a list of {id, area_points, label} and delete a list of ids."}, status=status.HTTP_400_BAD_REQUEST)
+            
+            if len(to_create) + len(to_update) + len(to_delete) > MAX_LABEL_BATCH_SIZE:
+                return Response({"Bad Request": "At most " + str(MAX_LABEL_BATCH_SIZE) + " areas can be edited at once."}, status=status.HTTP_400_BAD_REQUEST)
+            
+            areas = {area.id: area for area in Area.objects.filter(id__in=to_update.keys() | to_delete).select_related("element", "label")}
+            missing = [area_id for area_id in to_update.keys() | to_delete if area_id not in areas]
+            if missing:
+                return Response({"Not found": "Could not find areas with the ids " + ", ".join(map(str, sorted(missing))) + "."}, status=status.HTTP_404_NOT_FOUND)
+            
+            elements = {element.id: element for element in Element.objects.filter(id__in={area["element"] for area in to_create}).only("id", "owner_id", "dataset_id")}
+            elements.update({area.element.id: area.element for area in areas.values() if area.element is not None})
+            labels = {label.id: label for label in Label.objects.filter(id__in={area["label"] for area in to_create + list(to_update.values()) if area["label"] is not None}).only("id", "owner_id", "dataset_id")}
+            
+            for area in to_create:
+                if area["label"] is None:
+                    return Response({"Bad Request": "Created areas must have a label."}, status=status.HTTP_400_BAD_REQUEST)
+                if area["element"] not in elements:
+                    return Response({"Not found": "Could not find element with the id " + str(area["element"]) + "."}, status=status.HTTP_404_NOT_FOUND)
+            for area in to_create + list(to_update.values()):
+                if area["label"] is not None and area["label"] not in labels:
+                    return Response({"Not found": "Could not find label with the id " + str(area["label"]) + "."}, status=status.HTTP_404_NOT_FOUND)
+            
+            # Areas without an element belong to the owner of their label, and to nobody without either
+            area_owners = [area.element.owner_id if area.element is not None else area.label.owner_id if area.label is not None else None for area in areas.values()]
+            if (any(element.owner_id != user.profile.pk for element in elements.values()) or any(label.owner_id != user.profile.pk for label in labels.values())
+                    or any(owner != user.profile.pk for owner in area_owners)):
+                return Response({"Unauthorized": "You can only edit areas of your own elements and labels."}, status=status.HTTP_401_UNAUTHORIZED)
+            
+            created = []
+            for data in to_create:
+                area = Area(element=elements[data["element"]], label=labels[data["label"]], area_points=data["area_points"])
+                created.append(area)
+            
+            updated = []
+            for area_id, data in to_update.items():
+                area = areas[area_id]
+                area.area_points = data["area_points"]
+                if data["label"] is not None:
+                    area.label = labels[data["label"]]
+                if area.get_points():
+                    updated.append(area)
+                else:
+                    to_delete.add(area_id)
+            
+            for area in created + updated:
+                if area.label is not None and area.element is not None and area.label.dataset_id != area.element.dataset_id:
+                    return Response({"Bad Request": "Labels must belong to the datasets of their elements."}, status=status.HTTP_400_BAD_REQUEST)
+                try:
+                    area.update_bounds()    # bulk_create and bulk_update don't call save
+                except (ValueError, TypeError, IndexError):
+                    return Response({"Bad Request": "area_points must be a list of [x, y] points."}, status=status.HTTP_400_BAD_REQUEST)
+            
+            with transaction.atomic():
+                Area.objects.bulk_create(created, batch_size=REORDER_BATCH_SIZE)
+                Area.objects.bulk_update(updated, ["area_points", "label", "min_x", "min_y", "max_x", "max_y"], batch_size=REORDER_BATCH_SIZE)
+                Area.objects.filter(id__in=to_delete).delete()
+            
+            return Response({"created": AreaSerializer(created, many=True).data,
+                             "updated": [area.id for area in updated],
+                             "deleted": sorted(to_delete)}, status=status.HTTP_200_OK)
+        else:
+            return Response({"Unauthorized": "Must be logged in to edit areas."}, status=status.HTTP_401_UNAUTHORIZED)
+        
+        
+class GetElementAreas(generics.ListAPIView):    # Areas of an element, optionally only those intersecting a rectangle
+    """
+    x0, y0, x1 and y1 give the rectangle, in the same (percentage) coordinates as area_points.
+    Uses the bounding boxes of the areas and the area_element_bounds index.
+    """
+    serializer_class = AreaSerializer
+    permission_classes = [AllowAny]
+    lookup_url_kwarg = 'id'
+    
+    def list(self, request, *args, **kwargs):
+        user = self.request.user
+        element_id = kwargs[self.lookup_url_kwarg]
+        
+        visible = Q(dataset__visibility="public")
+        if user.is_authenticated:
+            visible |= Q(owner=user.profile)
+        if not Element.objects.filter(Q(id=element_id) & visible).exists():
+            return Response({"Not found": "Could not find element with the id " + str(element_id) + "."}, status=status.HTTP_404_NOT_FOUND)
+        
+        self.filters = Q(element_id=element_id)
+        params = request.query_params
+        if any(params.get(key) is not None for key in ("x0", "y0", "x1", "y1")):
+            try:
+                x0, y0, x1, y1 = (float(params[key]) for key in ("x0", "y0", "x1", "y1"))
+            except (KeyError, ValueError):
+                return Response({"Bad Request": "x0, y0, x1 and y1 must all be numbers."}, status=status.HTTP_400_BAD_REQUEST)
+            self.filters &= Q(min_x__lte=max(x0, x1), max_x__gte=min(x0, x1), min_y__lte=max(y0, y1), max_y__gte=min(y0, y1))
+        
+        return super().list(request, *args, **kwargs)
+    
+    def get_queryset(self):
+        return Area.objects.filter(self.filters)
+        
+        
 # MODEL FUNCTIONALITY
 
+def annotate_model_counts(models):  # Adds the counts of ModelSummarySerializer, without joining the counted tables
+    return models.select_related("owner", "trained_on", "evaluated_on").annotate(
+        layer_count=count_subquery(Layer, "model"),
+        download_count=count_subquery(Model.downloaders.through, "model"),
+        trained_on_element_count=count_subquery(Element, "dataset", outer="trained_on"),
+        evaluated_on_element_count=count_subquery(Element, "dataset", outer="evaluated_on"),
+    )
+
+
 class ModelListPublic(generics.ListAPIView):
-    serializer_class = ModelSerializer
+    serializer_class = ModelSummarySerializer
     permission_classes = [AllowAny]
     
     def get_queryset(self):
         search = self.request.GET.get("search")
         if search == None: search = ""
-        models = Model.objects.filter(Q(visibility="public") & (
-            # Search handling
-            Q(name__icontains=search)
-        ))
-        return models
+        models = Model.objects.filter(visibility="public")
+        if search:
+            models = search_queryset(models, search).order_by("-search_rank", "-id")
+        return annotate_model_counts(models)
 
 
 class ModelListProfile(generics.ListCreateAPIView):
-    serializer_class = ModelSerializer
     permission_classes  = [IsAuthenticated]
+    
+    def get_serializer_class(self):
+        if self.request.method == "GET":
+            return ModelSummarySerializer
+        return ModelDetailSerializer
 
     def get_queryset(self):
         user = self.request.user
         profile = user.profile
-        models = profile.models
+        models = profile.models.all()
         
         search = self.request.GET.get("search")
         if (search):
-            models = models.filter(Q(name__contains=search))
+            models = search_queryset(models, search).order_by("-search_rank", "-id")
+
+        return annotate_model_counts(models)
 
-        return models
+
+def get_model_detail(query):    # Returns the serialized model matching query with its layers, raises Model.DoesNotExist
+    model = annotate_model_counts(Model.objects.all()).prefetch_related("downloaders", "layers").get(query)
+    return ModelDetailSerializer(model).data
     
     
 class GetModel(APIView):
-    serializer_class = ModelSerializer
+    serializer_class = ModelDetailSerializer
     lookup_url_kwarg = 'id'
     
     def get(self, request, *args, **kwargs):
@@ -1330,11 +1855,7 @@ class GetModel(APIView):
                 
             if model_id != None:
                 try:
-                    model = Model.objects.get(Q(id=model_id) & Q(Q(visibility = "public") | Q(owner=user.profile)))
-                    
-                    modelSerialized = self.serializer_class(model)
-                    data = modelSerialized.data
-                    data["ownername"] = model.owner.name
+                    data = get_model_detail(Q(id=model_id) & Q(Q(visibility = "public") | Q(owner=user.profile)))
                     
                     return Response(data, status=status.HTTP_200_OK)
                     
@@ -1349,7 +1870,7 @@ class GetModel(APIView):
     
     
 class GetModelPublic(APIView):
-    serializer_class = ModelSerializer
+    serializer_class = ModelDetailSerializer
     lookup_url_kwarg = 'id' 
     
     def get(self, request, *args, **kwargs):
@@ -1358,11 +1879,7 @@ class GetModelPublic(APIView):
             
         if model_id != None:
             try:
-                model = Model.objects.get(Q(id=model_id) & Q(Q(visibility = "public")))
-                
-                modelSerialized = self.serializer_class(model)
-                data = modelSerialized.data
-                data["ownername"] = model.owner.name
+                data = get_model_detail(Q(id=model_id) & Q(Q(visibility = "public")))
                 
                 return Response(data, status=status.HTTP_200_OK)
                 
@@ -1373,6 +1890,26 @@ class GetModelPublic(APIView):
             return Response({'Bad Request': 'Id parameter not found in call to GetModelPublic.'}, status=status.HTTP_400_BAD_REQUEST)
     
 
+class ModelShapes(APIView):     # Output shape, parameters, FLOPs and activation memory of every layer, without building the model
+    lookup_url_kwarg = 'id'
+    
+    def get(self, request, *args, **kwargs):
+        model_id = kwargs[self.lookup_url_kwarg]
+        
+        user = self.request.user
+        visible = Q(visibility = "public")
+        if user.is_authenticated:
+            visible |= Q(owner=user.profile)
+        
+        try:
+            model = Model.objects.get(Q(id=model_id) & visible)
+            
+            return Response(infer_shapes(model.layers.all()), status=status.HTTP_200_OK)
+            
+        except Model.DoesNotExist:
+            return Response({'Not found': 'No public model or model belonging to you was found with the id ' + str(model_id) + '.'}, status=status.HTTP_404_NOT_FOUND)
+    
+
 class CreateModel(APIView):
     serializer_class = CreateModelSerializer
     parser_classes = [MultiPartParser, FormParser]
@@ -1387,40 +1924,36 @@ class CreateModel(APIView):
 
             if serializer.is_valid():
                 
-                model_instance = serializer.save(owner=request.user.profile)
-                
-                createSmallImage(model_instance, 230, 190)    # Create a smaller image for displaying model elements
-                
-                if "model" in request.data.keys() and request.data["model"]:   # Uploaded model
+                model = None
+                if "model" in request.data.keys() and request.data["model"]:   # Uploaded model, read and checked before anything is created
                     model_file = request.data["model"]
-                    extension = model_file.name.split(".")[-1]
-                    temp_path = "temp_models/" + model_file.name
-                    file_path = default_storage.save(temp_path, model_file.file)
-                    
-                    bucket_name = settings.AWS_STORAGE_BUCKET_NAME
-                    temp_model_file_path = "media/" + file_path
-                    print(f"Model file saved at: {temp_model_file_path}")
-                            
-                    s3_client = get_s3_client()
-                    
-                    # Download the model file from S3 to a local temporary file
-                    with open('temp_model.' + str(model_instance.id) + extension, 'wb') as f:
-                        s3_client.download_fileobj(bucket_name, temp_model_file_path, f)
-
-                    model = tf.keras.models.load_model('temp_model.' + extension)
+                    try:
+                        model = model_store.read_model(model_file, model_file.name.split(".")[-1])
+                    except Exception as e:
+                        return Response({'Bad Request': 'Could not read the model file: ' + str(e)}, status=status.HTTP_400_BAD_REQUEST)
+                    model_file.seek(0)
                     
-                    default_storage.delete(file_path)
+                    layer_instances, errors = layers_from_tf_model(model)
+                    if errors:
+                        return Response({'Bad Request': errors}, status=status.HTTP_400_BAD_REQUEST)
+                
+                with transaction.atomic():
+                    model_instance = serializer.save(owner=request.user.profile)
                     
-                    os.remove('temp_model' + str(model_instance.id) + '.' + extension)
+                    createSmallImage(model_instance, 230, 190)    # Create a smaller image for displaying model elements
                     
-                    for t, layer in enumerate(model.layers):
-                        layer_model_from_tf_layer(layer, model_instance.id, request, t)
+                    if model is not None:
+                        for layer in layer_instances:
+                            layer.model = model_instance
+                            layer.save()    # Multi-table (polymorphic) rows can't be bulk created
                         
-                    model_instance.model_file = model_file
-                    model_instance.optimizer = model.optimizer.__class__.__name__.lower()
-                    model_instance.loss_function = model.loss
-                    
-                    model_instance.save()
+                        model_instance.model_file = model_file
+                        model_instance.optimizer = model.optimizer.__class__.__name__.lower()
+                        model_instance.loss_function = model.loss
+                        model_instance.save()
+                
+                if model is not None:
+                    cache_tf_model(model_instance, model)     # So the model isn't loaded from storage again when first used
                        
                 return Response(serializer.data, status=status.HTTP_200_OK)
             else:
@@ -1430,7 +1963,7 @@ class CreateModel(APIView):
         
         
 class DeleteModel(APIView):
-    serializer_class = ModelSerializer
+    serializer_class = ModelDetailSerializer
     
     def post(self, request, format=None):
         model_id = request.data["model"]
@@ -1501,19 +2034,24 @@ class ReorderModelLayers(APIView):
     parser_classes = [JSONParser]
     
     def post(self, request, format=None):
-        idToIdx = request.data["order"]
+        idToIdx = request.data.get("order")   # {id: index} for every row, or
+        moves = request.data.get("moves")   # [{"id": X, "before": Y}], see reorder_indices
         model_id = request.data["id"]
         
         user = self.request.user
         
+        if idToIdx is None and not moves:
+            return Response({"Bad Request": "Either order or moves must be given."}, status=status.HTTP_400_BAD_REQUEST)
+        
         if user.is_authenticated:
             try:
                 model = Model.objects.get(id=model_id)
                 
                 if model.owner == user.profile:
-                    for layer in model.layers.all():
-                        layer.index = int(idToIdx[str(layer.id)])
-                        layer.save()
+                    try:
+                        reorder_indices(model.layers.all(), order=idToIdx, moves=moves)
+                    except (ValueError, KeyError, TypeError) as e:
+                        return Response({"Bad Request": "Invalid order: " + str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
                     return Response(None, status=status.HTTP_200_OK)
                 
@@ -1543,27 +2081,12 @@ class BuildModel(APIView):
                     try:
                         model = tf.keras.Sequential()
                         
-                        if instance.model_file:
-                            instance.model_file.delete(save=False)
-                        
                         for layer in instance.layers.all():
                             model.add(get_tf_layer(layer))
 
                         model.compile(optimizer=optimizer, loss=loss_function, metrics=['accuracy'])
                         
-                        # Create a temporary file
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=".keras") as temp_file:
-                            temp_path = temp_file.name  # Get temp file path
-
-                        # Save the model to the temp file
-                        model.save(temp_path)
-                        
-                        # Open the file and save it to Django's FileField
-                        with open(temp_path, 'rb') as model_file:
-                            instance.model_file.save(instance.name + ".keras", File(model_file))
-
-                        # Delete the temporary file after saving
-                        os.remove(temp_path)
+                        save_tf_model(instance, model)
                         
                         instance.optimizer = optimizer
                         instance.loss_function = loss_function
@@ -1571,6 +2094,7 @@ class BuildModel(APIView):
                         instance.trained_on = None
                         instance.trained_on_tensorflow = None
                         instance.trained_accuracy = None
+                        instance.label_mapping = None
                         
                         instance.evaluated_on = None
                         instance.evaluated_on_tensorflow = None
@@ -1612,21 +2136,7 @@ class RecompileModel(APIView):
 
                         model.compile(optimizer=optimizer, loss=loss_function, metrics=['accuracy'])
                         
-                        # UPDATING MODEL_FILE
-                        # Create a temporary file
-                        with tempfile.NamedTemporaryFile(delete=False, suffix="."+extension) as temp_file:
-                            temp_path = temp_file.name  # Get temp file path
-
-                        # Save the model to the temp file
-                        model.save(temp_path)
-                        
-                        model_instance.model_file.delete(save=False)
-                        # Open the file and save it to Django's FileField
-                        with open(temp_path, 'rb') as model_file:
-                            model_instance.model_file.save(model_instance.name + "." + extension, File(model_file))
-
-                        # Delete the temporary file after saving
-                        remove_temp_tf_model(model_instance)
+                        save_tf_model(model_instance, model)
                         
                         model_instance.optimizer = optimizer
                         model_instance.loss_function = loss_function
@@ -1646,7 +2156,12 @@ class RecompileModel(APIView):
             return Response({"Unauthorized": "Must be logged in to recompile models."}, status=status.HTTP_401_UNAUTHORIZED)
         
         
-def trainModelDatasetInstance(model_id, dataset_id, epochs, validation_split, user):
+def trainModelDatasetInstance(model_id, dataset_id, epochs, validation_split, user, callbacks=None, resume=True, restore_best=False, early_stopping_patience=None):
+    """
+    Weights are checkpointed while training (see api/checkpoints.py). With resume, training that was interrupted
+    continues from its last checkpoint. With restore_best, the model keeps the weights of the epoch with the highest
+    val_accuracy, and with early_stopping_patience, training stops after that many epochs without improvement.
+    """
     try:
         model_instance = Model.objects.get(id=model_id)
         
@@ -1655,60 +2170,47 @@ def trainModelDatasetInstance(model_id, dataset_id, epochs, validation_split, us
         if model_instance.owner == user.profile:
             if model_instance.model_file:
                 try:
-                    extension = str(model_instance.model_file).split(".")[-1]
                     model = get_tf_model(model_instance)
                     
-                    dataset, dataset_length = create_tensorflow_dataset(dataset_instance, model_instance)
-                    validation_size = int(dataset_length * validation_split)
-                    train_size = dataset_length - validation_size
+                    label_encoder = LabelEncoder.from_dataset(dataset_instance)
+                    checkpoint = checkpoints.start_training(model_instance, label_encoder.to_mapping(), validation_split, dataset=dataset_instance, resume=resume)
+                    train_dataset, validation_dataset, dataset_length = create_tensorflow_dataset(dataset_instance, model_instance, label_encoder, validation_split, seed=checkpoint.seed)
+                    
+                    initial_epoch = checkpoints.resume_training(model, checkpoint)
+                    callbacks = list(callbacks or []) + [checkpoints.CheckpointCallback(checkpoint)]
                     
                     model.summary()
 
-                    if validation_size >= 1: # Some dataset are too small for validation
-                        train_dataset, validation_dataset = tf.keras.utils.split_dataset(dataset, train_size, validation_size, shuffle=True)
-                        
-                        train_dataset = train_dataset.prefetch(tf.data.experimental.AUTOTUNE)
-                        validation_dataset = validation_dataset.prefetch(tf.data.experimental.AUTOTUNE)
+                    if initial_epoch < epochs:
+                        if validation_dataset is not None: # Some dataset are too small for validation
+                            if early_stopping_patience:
+                                callbacks.append(tf.keras.callbacks.EarlyStopping(monitor="val_accuracy", patience=early_stopping_patience))
+                            model.fit(train_dataset, epochs=epochs, initial_epoch=initial_epoch, validation_data=validation_dataset, callbacks=callbacks)
+                        else:
+                            model.fit(train_dataset, epochs=epochs, initial_epoch=initial_epoch, callbacks=callbacks)
                     
-                        history = model.fit(train_dataset, epochs=epochs, validation_data=validation_dataset)
-                    else:
-                        history = model.fit(dataset, epochs=epochs)
-                    
-                    # UPDATING MODEL_FILE
-                    # Create a temporary file
-                    with tempfile.NamedTemporaryFile(delete=False, suffix="."+extension) as temp_file:
-                        temp_path = temp_file.name  # Get temp file path
-
-                    # Save the model to the temp file
-                    model.save(temp_path)
+                    history, trained_epochs = checkpoints.finish_training(model, checkpoint, restore_best=restore_best and validation_dataset is not None)
                     
-                    model_instance.model_file.delete(save=False)
-                    # Open the file and save it to Django's FileField
-                    with open(temp_path, 'rb') as model_file:
-                        model_instance.model_file.save(model_instance.name + "." + extension, File(model_file))
-
-                    # Delete the temporary file after saving
-                    remove_temp_tf_model(model_instance)
+                    save_tf_model(model_instance, model)
                     
-                    accuracy = history.history["accuracy"]
-                    loss = history.history["loss"]
-                    val_accuracy = []
-                    val_loss = []
-                    if validation_size >= 1:
-                        val_accuracy = history.history["val_accuracy"]
-                        val_loss = history.history["val_loss"]
+                    accuracy = history.get("accuracy", [])
+                    loss = history.get("loss", [])
+                    val_accuracy = history.get("val_accuracy", [])
+                    val_loss = history.get("val_loss", [])
                     
                     # UPDATING MODEL TRAINED_ON
                     model_instance.trained_on = dataset_instance
-                    model_instance.trained_accuracy = accuracy[-1]
+                    model_instance.trained_accuracy = accuracy[trained_epochs - 1] if accuracy else None
+                    model_instance.label_mapping = label_encoder.to_mapping()
                     model_instance.save()
             
-                    return Response({"accuracy": accuracy, "loss": loss, "val_accuracy": val_accuracy, "val_loss": val_loss}, status=status.HTTP_200_OK)
+                    return Response({"accuracy": accuracy, "loss": loss, "val_accuracy": val_accuracy, "val_loss": val_loss,
+                                     "initial_epoch": initial_epoch, "epoch": trained_epochs}, status=status.HTTP_200_OK)
                 
                 except ValueError as e: # In case of invalid layer combination
                     raise Exception(e)
                     message = str(e)
-                    if len(message) > 50 and len(list(dataset)) * validation_split > 1:
+                    if len(message) > 50 and dataset_length * validation_split > 1:
                         message = message.split("ValueError: ")[-1]    # Skips long traceback for long errors
                     
                     raise ValueError(e)
@@ -1747,7 +2249,7 @@ def getTensorflowPrebuiltDataset(tensorflowDataset):
     else:
         raise Exception("Invalid dataset.")
 
-def trainModelTensorflowDataset(tensorflowDataset, model_id, epochs, validation_split, user):
+def trainModelTensorflowDataset(tensorflowDataset, model_id, epochs, validation_split, user, callbacks=None):
     try:
         model_instance = Model.objects.get(id=model_id)
         
@@ -1756,8 +2258,6 @@ def trainModelTensorflowDataset(tensorflowDataset, model_id, epochs, validation_
         if model_instance.owner == user.profile:
             if model_instance.model_file:
                 try:
-                    extension = str(model_instance.model_file).split(".")[-1]
-                    
                     model = get_tf_model(model_instance)
                     
                     dataset_length = len(dataset)
@@ -1768,25 +2268,11 @@ def trainModelTensorflowDataset(tensorflowDataset, model_id, epochs, validation_
                         train_dataset = dataset[:train_size]
                         validation_dataset = data[train_size:]
                     
-                        history = model.fit(train_dataset, epochs=epochs, validation_data=validation_dataset)
+                        history = model.fit(train_dataset, epochs=epochs, validation_data=validation_dataset, callbacks=callbacks)
                     else:
-                        history = model.fit(dataset, epochs=epochs)
+                        history = model.fit(dataset, epochs=epochs, callbacks=callbacks)
                     
-                    # UPDATING MODEL_FILE
-                    # Create a temporary file
-                    with tempfile.NamedTemporaryFile(delete=False, suffix="."+extension) as temp_file:
-                        temp_path = temp_file.name  # Get temp file path
-
-                    # Save the model to the temp file
-                    model.save(temp_path)
-                    
-                    model_instance.model_file.delete(save=False)
-                    # Open the file and save it to Django's FileField
-                    with open(temp_path, 'rb') as model_file:
-                        model_instance.model_file.save(model_instance.name + "." + extension, File(model_file))
-
-                    # Delete the temporary file after saving
-                    remove_temp_tf_model(model_instance)
+                    save_tf_model(model_instance, model)
                     
                     accuracy = history.history["accuracy"]
                     loss = history.history["loss"]
@@ -1797,6 +2283,7 @@ def trainModelTensorflowDataset(tensorflowDataset, model_id, epochs, validation_
                         val_loss = history.history["val_loss"]
                         
                     model_instance.trained_on_tensorflow = tensorflowDataset
+                    model_instance.label_mapping = None
                     model_instance.trained_accuracy = accuracy[-1]
                     model_instance.save()
             
@@ -1831,17 +2318,80 @@ class TrainModel(APIView):
         validation_split = float(request.data["validation_split"])
         tensorflowDataset = request.data["tensorflow_dataset"]
         
+        background = parse_bool(request.data.get("background", False))
+        resume = parse_bool(request.data.get("resume", True))   # Continue interrupted training from its last checkpoint
+        restore_best = parse_bool(request.data.get("restore_best", False))  # Keep the weights of the epoch with the highest val_accuracy
+        early_stopping_patience = request.data.get("early_stopping_patience")
+        
         user = self.request.user
         
         if user.is_authenticated:
+            try:
+                dataset_id = int(dataset_id)    # -1 when training on a TensorFlow dataset
+                if early_stopping_patience is not None:
+                    early_stopping_patience = int(early_stopping_patience)
+            except (TypeError, ValueError):
+                return Response({"Bad request": "dataset and early_stopping_patience must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+            
+            if background:
+                try:
+                    model_instance = Model.objects.get(id=model_id)
+                    if model_instance.owner != user.profile:
+                        return Response({"Unauthorized": "You can only train your own models."}, status=status.HTTP_401_UNAUTHORIZED)
+                    
+                    job = Job.objects.create(owner=user.profile, job_type="train", model=model_instance, params={
+                        "dataset": dataset_id, "epochs": epochs, "validation_split": validation_split, "tensorflow_dataset": tensorflowDataset,
+                        "resume": resume, "restore_best": restore_best, "early_stopping_patience": early_stopping_patience
+                    })
+                    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+                except Model.DoesNotExist:
+                    return Response({"Not found": "Could not find model with the id " + str(model_id) + "."}, status=status.HTTP_404_NOT_FOUND)
+            
             if dataset_id > 0 and tensorflowDataset == "":
-                return trainModelDatasetInstance(model_id, dataset_id, epochs, validation_split, user)
+                return trainModelDatasetInstance(model_id, dataset_id, epochs, validation_split, user, resume=resume,
+                                                 restore_best=restore_best, early_stopping_patience=early_stopping_patience)
             else:
                 return trainModelTensorflowDataset(tensorflowDataset, model_id, epochs, validation_split, user)
         else:
             return Response({"Unauthorized": "Must be logged in to train models."}, status=status.HTTP_401_UNAUTHORIZED)
   
   
+def evaluateModelDatasetInstance(model_id, dataset_id, user, callbacks=None):
+    try:
+        model_instance = Model.objects.get(id=model_id)
+        dataset_instance = Dataset.objects.get(id=dataset_id)
+        
+        if model_instance.owner == user.profile:
+            if model_instance.model_file:
+                try:
+                    model = get_tf_model(model_instance, cached=True)
+                    
+                    if model_instance.trained_on == dataset_instance and model_instance.label_mapping is not None:
+                        label_encoder = LabelEncoder.from_mapping(model_instance.label_mapping)     # Same order as when trained
+                    else:
+                        label_encoder = LabelEncoder.from_dataset(dataset_instance)
+                    dataset, _, dataset_length = create_tensorflow_dataset(dataset_instance, model_instance, label_encoder)
+                    
+                    res = model.evaluate(dataset, return_dict=True, callbacks=callbacks)
+                    
+                    model_instance.evaluated_on = dataset_instance
+                    model_instance.evaluated_accuracy = res["accuracy"]
+                    model_instance.save()
+                    
+                    return Response(res, status=status.HTTP_200_OK)
+                
+                except Exception as e:
+                    return Response({"Bad request": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            else:
+                return Response({"Bad request": "Model has not been built."}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            return Response({"Unauthorized": "You can only evaluate your own models."}, status=status.HTTP_401_UNAUTHORIZED)
+    except Model.DoesNotExist:
+        return Response({"Not found": "Could not find model with the id " + str(model_id) + "."}, status=status.HTTP_404_NOT_FOUND)
+    except Dataset.DoesNotExist:
+        return Response({"Not found": "Could not find dataset with the id " + str(dataset_id) + "."}, status=status.HTTP_404_NOT_FOUND)
+
+
 class EvaluateModel(APIView):
     parser_classes = [JSONParser]
 
@@ -1849,51 +2399,26 @@ class EvaluateModel(APIView):
     def post(self, request, format=None):
         model_id = request.data["model"]
         dataset_id = request.data["dataset"]
+        background = parse_bool(request.data.get("background", False))
         
         user = self.request.user
         
         if user.is_authenticated:
-            try:
-                model_instance = Model.objects.get(id=model_id)
-                dataset_instance = Dataset.objects.get(id=dataset_id)
+            if background:
+                try:
+                    model_instance = Model.objects.get(id=model_id)
+                    dataset_instance = Dataset.objects.get(id=dataset_id)
+                    if model_instance.owner != user.profile:
+                        return Response({"Unauthorized": "You can only evaluate your own models."}, status=status.HTTP_401_UNAUTHORIZED)
+                    
+                    job = Job.objects.create(owner=user.profile, job_type="evaluate", model=model_instance, dataset=dataset_instance)
+                    return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+                except Model.DoesNotExist:
+                    return Response({"Not found": "Could not find model with the id " + str(model_id) + "."}, status=status.HTTP_404_NOT_FOUND)
+                except Dataset.DoesNotExist:
+                    return Response({"Not found": "Could not find dataset with the id " + str(dataset_id) + "."}, status=status.HTTP_404_NOT_FOUND)
                 
-                if model_instance.owner == user.profile:
-                    if model_instance.model_file:
-                        try:
-                            model = get_tf_model(model_instance)
-                            
-                            dataset, dataset_length = create_tensorflow_dataset(dataset_instance, model_instance) 
-                            
-                            dataset = dataset.prefetch(tf.data.experimental.AUTOTUNE)
-                            
-                            res = model.evaluate(dataset, return_dict=True)
-                            
-                            # Delete the temporary file after saving
-                            remove_temp_tf_model(model_instance)
-                            
-                            model_instance.evaluated_on = dataset_instance
-                            model_instance.evaluated_accuracy = res["accuracy"]
-                            
-                            return Response(res, status=status.HTTP_200_OK)
-                        
-                        except ValueError as e: # In case of invalid layer combination
-                            message = str(e)
-                            if len(message) > 50 and len(list(dataset)) * validation_split > 1:
-                                message = message.split("ValueError: ")[-1]    # Skips long traceback for long errors
-                            
-                            raise ValueError(e)
-
-                            return Response({"Bad request": str(message)}, status=status.HTTP_400_BAD_REQUEST)
-                        except Exception as e:
-                            return Response({"Bad request": str(e)}, status=status.HTTP_400_BAD_REQUEST)
-                    else:
-                        return Response({"Bad request": "Model has not been built."}, status=status.HTTP_400_BAD_REQUEST)
-                else:
-                    return Response({"Unauthorized": "You can only evaluate your own models."}, status=status.HTTP_401_UNAUTHORIZED)
-            except Model.DoesNotExist:
-                return Response({"Not found": "Could not find model with the id " + str(model_id) + "."}, status=status.HTTP_404_NOT_FOUND)
-            except Dataset.DoesNotExist:
-                return Response({"Not found": "Could not find dataset with the id " + str(dataset_id) + "."}, status=status.HTTP_404_NOT_FOUND)
+            return evaluateModelDatasetInstance(model_id, dataset_id, user)
         else:
             return Response({"Unauthorized": "Must be logged in to evaluate models."}, status=status.HTTP_401_UNAUTHORIZED)
            
@@ -1910,7 +2435,7 @@ class PredictModel(APIView):
         try:
             model_instance = Model.objects.get(id=model_id)
             
-            if model_instance.trained_on:
+            if model_instance.label_mapping is not None or model_instance.trained_on:
                 if model_instance.model_type.lower() == "image":
                     first_layer = model_instance.layers.all().first()
                     
@@ -1918,16 +2443,13 @@ class PredictModel(APIView):
                     
                     image_tensor = preprocess_uploaded_image(image, target_size)
                     
-                    model = get_tf_model(model_instance)
+                    model = get_tf_model(model_instance, cached=True)
                     
                     prediction_arr = model.predict(image_tensor)
-                    print(f"prediction_arr: {prediction_arr}")
                     prediction_idx = int(np.argmax(prediction_arr))
-                    predicted_label = model_instance.trained_on.labels.all()[prediction_idx]
-                    
-                    remove_temp_tf_model(model_instance)
+                    predicted_label = get_model_label_encoder(model_instance).decode(prediction_idx)
                     
-                    return Response({"prediction": predicted_label.name, "color": predicted_label.color}, status=status.HTTP_200_OK)
+                    return Response({"prediction": predicted_label["name"], "color": predicted_label["color"]}, status=status.HTTP_200_OK)
                     
                 elif model_instance.model_type.lower() == "text":
                     pass
@@ -1940,6 +2462,108 @@ class PredictModel(APIView):
             return Response({"Not found": "Could not find model with the id " + str(model_id) + "."}, status=status.HTTP_404_NOT_FOUND)
            
            
+class PredictModelBatch(APIView):   # Predicts many uploaded images, or existing elements, with a single forward pass
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+    
+    @tf.autograph.experimental.do_not_convert
+    def post(self, request, format=None):
+        model_id = request.data["model"]
+        images = request.FILES.getlist("images")
+        try:
+            element_ids = parse_ids(request.data.get("elements", []))
+        except ValueError as e:
+            return Response({"Bad request": "Invalid elements: " + str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            
+        if len(images) + len(element_ids) == 0:
+            return Response({"Bad request": "No images or elements to predict."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(images) + len(element_ids) > MAX_PREDICTION_BATCH_SIZE:
+            return Response({"Bad request": "At most " + str(MAX_PREDICTION_BATCH_SIZE) + " images can be predicted at once."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            model_instance = Model.objects.get(id=model_id)
+            
+            if model_instance.label_mapping is None and not model_instance.trained_on:
+                return Response({"Bad request": "Model has not been trained."}, status=status.HTTP_400_BAD_REQUEST)
+            if model_instance.model_type.lower() != "image":
+                return Response({"Bad request": "Batch prediction is only supported for image models."}, status=status.HTTP_400_BAD_REQUEST)
+            
+            # Items are (uploaded file or element, file to read)
+            items = [(image, image) for image in images]
+            if element_ids:
+                elements = Element.objects.filter(id__in=element_ids).select_related("dataset")
+                if request.user.is_authenticated:
+                    elements = elements.filter(Q(dataset__visibility="public") | Q(owner=request.user.profile))
+                else:
+                    elements = elements.filter(dataset__visibility="public")
+                elements = {element.id: element for element in elements}
+                
+                missing = [element_id for element_id in element_ids if element_id not in elements]
+                if missing:
+                    return Response({"Not found": "Could not find elements with the ids " + ", ".join(map(str, missing)) + "."}, status=status.HTTP_404_NOT_FOUND)
+                items += [(elements[element_id], elements[element_id].file) for element_id in element_ids]
+            
+            first_layer = model_instance.layers.all().first()
+            target_size = (first_layer.input_x, first_layer.input_y, first_layer.input_z)
+            
+            # Elements of datasets already preprocessed for this input shape are read from preprocessed_image_cache
+            cached_rows = {}
+            if element_ids:
+                for dataset in {element.dataset for element in elements.values() if element.dataset}:
+                    preprocessed = get_preprocessed_images(dataset, target_size, build=False)
+                    if preprocessed is not None:
+                        dataset_images, _, dataset_element_ids = preprocessed
+                        for row, element_id in enumerate(dataset_element_ids):
+                            cached_rows[int(element_id)] = (dataset_images, row)
+            
+            def preprocess(item):
+                if isinstance(item[0], Element) and item[0].id in cached_rows:
+                    dataset_images, row = cached_rows[item[0].id]
+                    return dataset_images[row].astype(np.float32) / 255.0
+                try:
+                    return preprocess_image_array(item[1], target_size)
+                except Exception as e:
+                    return e
+            
+            # Decoding (and downloading elements) is mostly I/O and C code, so threads overlap well
+            arrays = list(PREDICTION_EXECUTOR.map(preprocess, items))
+                
+            valid = [t for t, array in enumerate(arrays) if not isinstance(array, Exception)]
+            batch_row = {t: row for row, t in enumerate(valid)}
+            probabilities = []
+            if valid:
+                batch = np.stack([arrays[t] for t in valid])
+                model = get_tf_model(model_instance, cached=True)
+                probabilities = model.predict(batch)
+                
+            labels = get_model_label_encoder(model_instance).labels
+            
+            predictions = []
+            for t, (item, file) in enumerate(items):
+                prediction = {"name": item.name if isinstance(item, Element) else os.path.basename(item.name),
+                              "element": item.id if isinstance(item, Element) else None}
+                if isinstance(arrays[t], Exception):
+                    prediction["error"] = "Could not read image: " + str(arrays[t])
+                else:
+                    probability = probabilities[batch_row[t]]
+                    predicted_label = labels[int(np.argmax(probability))]
+                    prediction["prediction"] = predicted_label["name"]
+                    prediction["color"] = predicted_label["color"]
+                    prediction["probabilities"] = [float(p) for p in probability]
+                predictions.append(prediction)
+                
+            return Response({"labels": [label["name"] for label in labels], "predictions": predictions}, status=status.HTTP_200_OK)
+            
+        except Model.DoesNotExist:
+            return Response({"Not found": "Could not find model with the id " + str(model_id) + "."}, status=status.HTTP_404_NOT_FOUND)
+           
+           
+class ModelCacheStats(APIView):     # Hit, miss and eviction counters of this process' model cache
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request, format=None):
+        return Response(tf_model_cache.stats(), status=status.HTTP_200_OK)
+           
+           
 # LAYER FUNCTIONALITY
 
 class CreateLayer(APIView):
@@ -1949,34 +2573,14 @@ class CreateLayer(APIView):
     def post(self, request, format=None):
         data = self.request.data
         
-        layer_type = data["type"]
-        
-        ALLOWED_TYPES = set(["dense", "conv2d", "flatten",
-                             "dropout", "maxpool2d", "rescaling",
-                             "randomflip", "resizing"])
-        if not layer_type in ALLOWED_TYPES:
-            return Response({"Bad Request": "Invalid layer type: " + layer_type}, status=status.HTTP_400_BAD_REQUEST)
+        layer_type = LAYER_TYPES.get(data["type"])
+        if layer_type is None:
+            return Response({"Bad Request": "Invalid layer type: " + data["type"]}, status=status.HTTP_400_BAD_REQUEST)
         
-        serializer = None
         parse_dimensions(request.data)
-        if layer_type == "dense":
-            serializer = CreateDenseLayerSerializer(data=data)
-        elif layer_type == "conv2d":
-            serializer = CreateConv2DLayerSerializer(data=data)
-        elif layer_type == "maxpool2d":
-            serializer = CreateMaxPool2DLayerSerializer(data=data)
-        elif layer_type == "flatten":
-            serializer = CreateFlattenLayerSerializer(data=data)
-        elif layer_type == "dropout":
-            serializer = CreateDropoutLayerSerializer(data=data)
-        elif layer_type == "rescaling":
-            serializer = CreateRescalingLayerSerializer(data=data)
-        elif layer_type == "randomflip":
-            serializer = CreateRandomFlipLayerSerializer(data=data)
-        elif layer_type == "resizing":
-            serializer = CreateResizingLayerSerializer(data=data)
-        
-        if serializer and serializer.is_valid():
+        serializer = layer_type.create_serializer(data=data)
+        
+        if serializer.is_valid():
             
             model_id = data["model"]
             try:
@@ -1987,8 +2591,9 @@ class CreateLayer(APIView):
                 if user.is_authenticated:
                     
                     if user.profile == model.owner:
-                        idx = model.layers.all().last().index + 1
-                        instance = serializer.save(model=model, layer_type=layer_type, index=idx, activation_function=data["activation_function"])
+                        last_layer = model.layers.all().last()
+                        idx = last_layer.index + 1 if last_layer else 0
+                        instance = serializer.save(model=model, layer_type=layer_type.name, index=idx, activation_function=data["activation_function"])
                             
                         return Response({"data": serializer.data, "id": instance.id}, status=status.HTTP_200_OK)
                     
@@ -2041,50 +2646,154 @@ class EditLayer(APIView):
                 layer = Layer.objects.get(id=layer_id)
                 
                 if layer.model.owner == user.profile:
-                    layer_type = request.data["type"]
-
-                    parse_dimensions(request.data)
+                    layer_type = LAYER_TYPES.get(layer.layer_type)
+                    if layer_type is None:
+                        return Response({'Bad Request': 'Layers of type ' + layer.layer_type + ' can not be edited.'}, status=status.HTTP_400_BAD_REQUEST)
                     
-                    if layer_type == "dense":
-                        layer.nodes_count = request.data["nodes_count"]
-                        layer.input_x = request.data["input_x"]
-                    elif layer_type == "conv2d":
-                        layer.filters = request.data["filters"]
-                        layer.kernel_size = request.data["kernel_size"]
-                        layer.input_x = request.data["input_x"]
-                        layer.input_y = request.data["input_y"]
-                        layer.input_z = request.data["input_z"]
-                    elif layer_type == "maxpool2d":
-                        layer.pool_size = request.data["pool_size"]
-                    elif layer_type == "flatten":
-                        layer.input_x = request.data["input_x"]
-                        layer.input_y = request.data["input_y"]
-                    elif layer_type == "dropout":
-                        layer.rate = request.data["rate"]
-                    elif layer_type == "rescaling":
-                        layer.scale = request.data["scale"]
-                        layer.offset = request.data["offset"]
-                        layer.input_x = request.data["input_x"]
-                        layer.input_y = request.data["input_y"]
-                        layer.input_z = request.data["input_z"]
-                    elif layer_type == "randomflip":
-                        layer.mode = request.data["mode"]
-                    elif layer_type == "resizing":
-                        layer.input_x = request.data["input_x"]
-                        layer.input_y = request.data["input_y"]
-                        layer.input_z = request.data["input_z"]
-                        
-                        layer.output_x = request.data["output_x"]
-                        layer.output_y = request.data["output_y"]
-                        
-                    layer.activation_function = request.data["activation_function"]
-                    layer.save()
+                    activation_function = request.data.get("activation_function", layer.activation_function)
+                    if activation_function and activation_function not in dict(Layer.ACTIVATION_CHOICES):
+                        return Response({'Bad Request': 'Invalid activation function: ' + str(activation_function)}, status=status.HTTP_400_BAD_REQUEST)
+                    try:
+                        parse_dimensions(request.data)
+                    except (ValueError, TypeError):
+                        return Response({'Bad Request': 'Input dimensions must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+                    
+                    serializer = layer_type.create_serializer(layer, data=request.data, partial=True)
+                    if not serializer.is_valid():
+                        return Response({'Bad Request': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+                    serializer.save(activation_function=activation_function)
                 
                     return Response(LayerSerializer(layer).data, status=status.HTTP_200_OK)
                 
                 else:
                     return Response({'Unauthorized': 'You can only edit layers belonging to your own models.'}, status=status.HTTP_401_UNAUTHORIZED)
             except Layer.DoesNotExist:
-                return Response({'Not found': 'Could not find model with the id ' + str(model_id) + '.'}, status=status.HTTP_404_NOT_FOUND)
+                return Response({'Not found': 'Could not find layer with the id ' + str(layer_id) + '.'}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            return Response({'Unauthorized': 'Must be logged in to edit layers.'}, status=status.HTTP_401_UNAUTHORIZED)        
+        
+# JOB HANDLING
+
+class JobListProfile(generics.ListAPIView):
+    serializer_class = JobSerializer
+    permission_classes  = [IsAuthenticated]
+
+    def get_queryset(self):
+        jobs = self.request.user.profile.jobs.all()
+        
+        job_status = self.request.GET.get("status")
+        if job_status:
+            jobs = jobs.filter(status=job_status)
+            
+        return jobs
+    
+
+class GetJob(APIView):
+    serializer_class = JobSerializer
+    lookup_url_kwarg = 'id'
+    
+    def get(self, request, *args, **kwargs):
+        user = self.request.user
+        if user.is_authenticated:
+            job_id = kwargs[self.lookup_url_kwarg]
+            try:
+                job = Job.objects.get(id=job_id, owner=user.profile)
+                
+                return Response(self.serializer_class(job).data, status=status.HTTP_200_OK)
+            except Job.DoesNotExist:
+                return Response({'Not found': 'No job belonging to you was found with the id ' + str(job_id) + '.'}, status=status.HTTP_404_NOT_FOUND)
+        else:
+            return Response({'Unauthorized': 'Must be logged in to get jobs.'}, status=status.HTTP_401_UNAUTHORIZED)
+        
+        
+JOB_EVENT_FIELDS = ("id", "job_type", "status", "progress", "progress_info", "result", "error")
+FINISHED_JOB_STATUSES = ("done", "failed", "cancelled")
+
+
+async def run_query(function):  # Runs a sync function using the database from async views
+    """
+    Runs in a thread of the default executor (thread_sensitive=False), so open streams don't wait for sync views,
+    which all share a single thread under ASGI. Such threads keep their own connections, closed once too old.
+    """
+    def query():
+        try:
+            return function()
+        finally:
+            close_old_connections()
+    return await sync_to_async(query, thread_sensitive=False)()
+
+
+def job_event(event, data):    # Formats a Server-Sent Event
+    return "event: " + event + "\ndata: " + json.dumps(data, default=str) + "\n\n"
+
+
+class JobEvents(View):  # Streams the progress of a job as Server-Sent Events, a Django view as Django REST framework views can't be async
+    """
+    A progress event (id, job_type, status, progress, progress_info, result and error) is sent whenever
+    the job changes, and an end event with the same fields when it is done, failed or cancelled. Served by the ASGI
+    application (Dalinar/asgi.py), open streams don't hold a worker thread while waiting for updates.
+    """
+    async def get(self, request, *args, **kwargs):
+        job_id = kwargs["id"]
+        user_id = await run_query(lambda: request.user.id if request.user.is_authenticated else None)
+        if user_id is None:
+            return JsonResponse({'Unauthorized': 'Must be logged in to follow jobs.'}, status=status.HTTP_401_UNAUTHORIZED)
+        
+        jobs = Job.objects.filter(id=job_id, owner_id=user_id).values(*JOB_EVENT_FIELDS)  # Profiles share the id of their user
+        if await run_query(jobs.first) is None:
+            return JsonResponse({'Not found': 'No job belonging to you was found with the id ' + str(job_id) + '.'}, status=status.HTTP_404_NOT_FOUND)
+        
+        async def events():
+            last = None
+            last_sent = asyncio.get_running_loop().time()
+            yield "retry: 2000\n\n"   # Reconnect delay for EventSource
+            while True:
+                job = await run_query(jobs.first)
+                if job is None:
+                    return
+                
+                if job["status"] in FINISHED_JOB_STATUSES:
+                    yield job_event("end", job)
+                    return
+                
+                now = asyncio.get_running_loop().time()
+                if job != last:
+                    yield job_event("progress", job)
+                    last, last_sent = job, now
+                elif now - last_sent >= settings.JOB_EVENTS_HEARTBEAT:
+                    yield ": heartbeat\n\n"
+                    last_sent = now
+                await asyncio.sleep(settings.JOB_EVENTS_POLL_INTERVAL)
+        
+        response = StreamingHttpResponse(events(), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"    # Stops nginx from buffering the stream
+        return response
+        
+        
+class CancelJob(APIView):
+    parser_classes = [JSONParser]
+    
+    def post(self, request, format=None):
+        job_id = request.data["id"]
+        
+        user = self.request.user
+        
+        if user.is_authenticated:
+            try:
+                job = Job.objects.get(id=job_id)
+                
+                if job.owner == user.profile:
+                    # Queued jobs are cancelled directly, running jobs stop at the next epoch or batch of elements
+                    if not Job.objects.filter(id=job.id, status="queued").update(status="cancelled", cancel_requested=True, finished_at=timezone.now()):
+                        Job.objects.filter(id=job.id, status="running").update(cancel_requested=True)
+                    job.refresh_from_db()
+                    
+                    return Response(JobSerializer(job).data, status=status.HTTP_200_OK)
+                
+                else:
+                    return Response({"Unauthorized": "You can only cancel your own jobs."}, status=status.HTTP_401_UNAUTHORIZED)
+            except Job.DoesNotExist:
+                return Response({"Not found": "Could not find job with the id " + str(job_id) + "."}, status=status.HTTP_404_NOT_FOUND)
         else:
-            return Response({'Unauthorized': 'Must be logged in to edit layers.'}, status=status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+            return Response({'Unauthorized': 'Must be logged in to cancel jobs.'}, status=status.HTTP_401_UNAUTHORIZED)
@@ -1,6 +1,19 @@
 import React, {useState, useEffect} from "react"
 import {useNavigate} from "react-router-dom"
 
+// Dataset lists (including saved datasets) are summaries, with counts instead of the related objects
+export function elementCount(dataset) {
+    return dataset.element_count
+}
+
+export function labelCount(dataset) {
+    return dataset.label_count
+}
+
+export function downloadCount(dataset) {
+    return dataset.download_count
+}
+
 function DatasetElement({dataset, BACKEND_URL, isPublic=false, isTraining=false, isDeactivated=false}) {
 
     const [showDescription, setShowDescription] = useState(false)
@@ -64,9 +77,9 @@ function DatasetElement({dataset, BACKEND_URL, isPublic=false, isTraining=false,
             </div>
             
             {!isPublic && <p className="dataset-element-private">{dataset.visibility}</p>}
-            {dataset.downloaders && <p className="dataset-element-date">{dataset.downloaders.length + " download" + (dataset.downloaders.length != 1 ? "s" : "")}</p>}
-            {dataset.elements && <p className="dataset-element-count">{dataset.elements.length + " element" + (dataset.elements.length != 1 ? "s" : "")}</p>}
-            {dataset.labels && <p className="dataset-element-labels">{dataset.labels.length + " label" + (dataset.labels.length != 1 ? "s" : "")}</p>}
+            {downloadCount(dataset) != null && <p className="dataset-element-date">{downloadCount(dataset) + " download" + (downloadCount(dataset) != 1 ? "s" : "")}</p>}
+            {elementCount(dataset) != null && <p className="dataset-element-count">{elementCount(dataset) + " element" + (elementCount(dataset) != 1 ? "s" : "")}</p>}
+            {labelCount(dataset) != null && <p className="dataset-element-labels">{labelCount(dataset) + " label" + (labelCount(dataset) != 1 ? "s" : "")}</p>}
             {dataset && dataset.imageWidth && dataset.imageHeight && <p className="dataset-element-shape">
                 {dataset.imageWidth}x{dataset.imageHeight}
             </p>}
@@ -6,13 +6,13 @@ function LayerElement({layer, hoveredLayer, deleteLayer,
                         BACKEND_URL, setLayers, layers, notification, 
                         prevLayer, setWarnings, provided, 
                         updateWarnings, idx, onMouseEnter, 
-                        onMouseLeave, warnings=false, isPublic=false}) {
+                        onMouseLeave, shape=null, warnings=false, isPublic=false}) {
 
     const [type, setType] = useState(null)  // Workaround to stop warning when reordering layers.
 
     const [nodes, setNodes] = useState(layer.nodes_count)   // Used by ["dense"]
-    const [filters, setFilters] = useState(layer.filters)   // Used by ["conv2d"]
-    const [kernelSize, setKernelSize] = useState(layer.kernel_size) // USed by ["conv2d"]
+    const [filters, setFilters] = useState(layer.filters)   // Used by ["conv2d", "separableconv2d"]
+    const [kernelSize, setKernelSize] = useState(layer.kernel_size) // USed by ["conv2d", "separableconv2d"]
     const [inputX, setInputX] = useState(layer.input_x || "") // Used by ["dense", "conv2d", "flatten", "rescaling", "resizing"]
     const [inputY, setInputY] = useState(layer.input_y || "") // Used by ["conv2d", "flatten", "rescaling", "resizing"]
     const [inputZ, setInputZ] = useState(layer.input_z || "") // Used by ["conv2d", "resizing"]
@@ -23,6 +23,8 @@ function LayerElement({layer, hoveredLayer, deleteLayer,
     const [mode, setMode] = useState(layer.mode)    // Used by ["randomflip"]
     const [outputX, setOutputX] = useState(layer.output_x)  // Used by ["resizing"]
     const [outputY, setOutputY] = useState(layer.output_y)  // Used by ["resizing"]
+    const [momentum, setMomentum] = useState(layer.momentum)    // Used by ["batchnormalization"]
+    const [epsilon, setEpsilon] = useState(layer.epsilon)   // Used by ["batchnormalization"]
 
     const [activation, setActivation] = useState(layer.activation_function) // Used by ["dense", "conv2d"]
 
@@ -49,6 +51,8 @@ function LayerElement({layer, hoveredLayer, deleteLayer,
         setMode(layer.mode)
         setOutputX(layer.output_x)
         setOutputY(layer.output_y)
+        setMomentum(layer.momentum)
+        setEpsilon(layer.epsilon)
 
         setActivation(layer.activation_function)
 
@@ -58,7 +62,7 @@ function LayerElement({layer, hoveredLayer, deleteLayer,
 
     useEffect(() => {
         getErrorMessage()
-    }, [updateWarnings])
+    }, [updateWarnings, shape])
 
     function dimensions_updated(include_z) {
         if (inputX != (layer.input_x || "")) {
@@ -82,7 +86,7 @@ function LayerElement({layer, hoveredLayer, deleteLayer,
                 setUpdated(true)
             }
         } 
-        else if (type == "conv2d") {
+        else if (type == "conv2d" || type == "separableconv2d") {
             if (filters != layer.filters) {
                 setUpdated(true)
             } else if (kernelSize != layer.kernel_size) {
@@ -129,15 +133,22 @@ function LayerElement({layer, hoveredLayer, deleteLayer,
                 setUpdated(true)
             }
         }
+        else if (type == "batchnormalization") {
+            if (momentum != layer.momentum) {
+                setUpdated(true)
+            } else if (epsilon != layer.epsilon) {
+                setUpdated(true)
+            }
+        }
 
-        const NO_ACTIVATION = new Set(["flatten", "dropout", "randomflip", "maxpool2d", "resizing"])
+        const NO_ACTIVATION = new Set(["flatten", "dropout", "randomflip", "maxpool2d", "resizing", "batchnormalization", "globalaveragepooling2d"])
         if (!NO_ACTIVATION.has(type)) { // Do not have activation functions
             if (activation != layer.activation_function) {  
                 setUpdated(true)
             }
         }
 
-    }, [nodes, filters, kernelSize, activation, inputX, inputY, inputZ, poolSize, rate, scale, offset, mode, outputX, outputY])   // All layer states
+    }, [nodes, filters, kernelSize, activation, inputX, inputY, inputZ, poolSize, rate, scale, offset, mode, outputX, outputY, momentum, epsilon])   // All layer states
 
 
     function checkInputDimensions(include_z) {  // Adds dimensions, returns true if valid else false
@@ -175,9 +186,15 @@ function LayerElement({layer, hoveredLayer, deleteLayer,
         if (type == "flatten") {
             return checkInputDimensions(false)
         }
-        if (type == "conv2d") {
+        if (type == "conv2d" || type == "separableconv2d") {
             return checkInputDimensions(true)
         }
+        if (type == "batchnormalization") {
+            if (momentum < 0 || momentum > 1 || epsilon < 0) {
+                notification("Momentum must be between 0 and 1, and epsilon positive.", "failure")
+                return false
+            }
+        }
         if (type == "rescaling") {
             let dimensionsValid = checkInputDimensions(true)
             if (!dimensionsValid) {
@@ -225,6 +242,8 @@ function LayerElement({layer, hoveredLayer, deleteLayer,
             "mode": mode,
             "output_x": outputX,
             "output_y": outputY,
+            "momentum": momentum,
+            "epsilon": epsilon,
 
             "activation_function": activation
         }
@@ -262,14 +281,17 @@ function LayerElement({layer, hoveredLayer, deleteLayer,
     }
 
     const VALID_PREV_LAYERS = { // null means that it can be the first layer
-        "dense": [null, "dense", "flatten", "dropout"],
-        "conv2d": [null, "conv2d", "maxpool2d", "rescaling", "randomflip", "resizing"],
-        "maxpool2d": ["conv2d", "maxpool2d", "rescaling", "resizing"],
-        "dropout": ["dense", "dropout", "flatten"],
-        "flatten": [null, "dense", "dropout", "flatten", "conv2d", "maxpool2d", "rescaling", "resizing"],
+        "dense": [null, "dense", "flatten", "dropout", "batchnormalization", "globalaveragepooling2d"],
+        "conv2d": [null, "conv2d", "maxpool2d", "rescaling", "randomflip", "resizing", "separableconv2d", "batchnormalization"],
+        "maxpool2d": ["conv2d", "maxpool2d", "rescaling", "resizing", "separableconv2d", "batchnormalization"],
+        "dropout": ["dense", "dropout", "flatten", "batchnormalization", "globalaveragepooling2d"],
+        "flatten": [null, "dense", "dropout", "flatten", "conv2d", "maxpool2d", "rescaling", "resizing", "separableconv2d", "batchnormalization", "globalaveragepooling2d"],
         "rescaling": [null, "randomflip", "resizing"],
         "randomflip": [null, "rescaling", "resizing"],
-        "resizing": [null]
+        "resizing": [null],
+        "batchnormalization": ["dense", "conv2d", "separableconv2d", "maxpool2d"],
+        "globalaveragepooling2d": ["conv2d", "separableconv2d", "maxpool2d", "batchnormalization"],
+        "separableconv2d": [null, "conv2d", "separableconv2d", "maxpool2d", "batchnormalization", "rescaling", "randomflip", "resizing"]
     }
 
     const WARNING_MESSAGES = {
@@ -280,7 +302,10 @@ function LayerElement({layer, hoveredLayer, deleteLayer,
         "flatten": "Invalid previous layer.",
         "rescaling": "Must be the first layer or follow another preprocessing layer.",
         "randomflip": "Must be the first layer or follow another preprocessing layer.",
-        "resizing": "Must be the first layer."
+        "resizing": "Must be the first layer.",
+        "batchnormalization": "A BatchNormalization layer must follow one of the following layers: [" + VALID_PREV_LAYERS["batchnormalization"].join(", ") + "].",
+        "globalaveragepooling2d": "A GlobalAveragePooling2D layer must follow one of the following layers: [" + VALID_PREV_LAYERS["globalaveragepooling2d"].join(", ") + "].",
+        "separableconv2d": "A SeparableConv2D layer must be the first one, else follow one of the following layers: [" + VALID_PREV_LAYERS["separableconv2d"].slice(1).join(", ") + "]."
     }
 
     function getErrorMessage() {
@@ -300,6 +325,11 @@ function LayerElement({layer, hoveredLayer, deleteLayer,
             setErrorMessage("Input dimensions must be specified on the first layer.")
         }
 
+        if (shape && shape.error) { // Found by shape inference, e.g. too small input for the kernel size
+            setWarnings(true)
+            setErrorMessage(shape.error)
+        }
+
     }
 
     function dimensionsX(isFlatten=false) {
@@ -418,10 +448,10 @@ function LayerElement({layer, hoveredLayer, deleteLayer,
                         </div>
                     </form>}
     
-                    {type == "conv2d" && <form className="layer-element-inner">
+                    {(type == "conv2d" || type == "separableconv2d") && <form className="layer-element-inner">
                         <h1 className="layer-element-title">
                             <img className="layer-element-title-icon" src={BACKEND_URL + "/static/images/image.png"} />
-                            <span className="layer-element-title-text">Conv2D</span>
+                            <span className="layer-element-title-text">{type == "conv2d" ? "Conv2D" : "SeparableConv2D"}</span>
                             {!isPublic && <img className="layer-element-drag" title="Reorder layer" src={BACKEND_URL + "/static/images/drag.svg"} {...provided.dragHandleProps} />}
                             {!isPublic && <img className="layer-element-delete" title="Delete layer" src={BACKEND_URL + "/static/images/cross.svg"} onClick={() => {
                                 deleteLayer(layer.id)
@@ -622,6 +652,58 @@ function LayerElement({layer, hoveredLayer, deleteLayer,
                         {dimensionsZ()}
                     </form>}
     
+                    {type == "batchnormalization" && <form className="layer-element-inner">
+                        <h1 className="layer-element-title">
+                            <img className="layer-element-title-icon" src={BACKEND_URL + "/static/images/dropout.svg"} />
+                            <span className="layer-element-title-text">BatchNormalization</span>
+                            {!isPublic && <img className="layer-element-drag" title="Reorder layer" src={BACKEND_URL + "/static/images/drag.svg"} {...provided.dragHandleProps} />}
+                            {!isPublic && <img className="layer-element-delete" title="Delete layer" src={BACKEND_URL + "/static/images/cross.svg"} onClick={() => {
+                                deleteLayer(layer.id)
+                            }}/>}
+                        </h1>
+
+                        <div className="layer-element-stat">
+                            <span className="layer-element-stat-color layer-element-stat-orange"></span>
+                            <label className="layer-element-label" htmlFor={"momentum" + layer.id}>Momentum</label>
+                            {!isPublic && <input type="number" step="0.01" className="layer-element-input" id={"momentum" + layer.id} value={momentum} onChange={(e) => {
+                                setMomentum(Math.max(0, Math.min(1, e.target.value)))
+                            }}></input>}
+                            {isPublic && <div className="layer-element-input">{momentum}</div>}
+                        </div>
+
+                        <div className="layer-element-stat">
+                            <span className="layer-element-stat-color layer-element-stat-orange"></span>
+                            <label className="layer-element-label" htmlFor={"epsilon" + layer.id}>Epsilon</label>
+                            {!isPublic && <input type="number" step="0.001" className="layer-element-input" id={"epsilon" + layer.id} value={epsilon} onChange={(e) => {
+                                setEpsilon(e.target.value)
+                            }}></input>}
+                            {isPublic && <div className="layer-element-input">{epsilon}</div>}
+                        </div>
+                    </form>}
+
+                    {type == "globalaveragepooling2d" && <form className="layer-element-inner">
+                        <h1 className="layer-element-title">
+                            <img className="layer-element-title-icon" src={BACKEND_URL + "/static/images/image.png"} />
+                            <span className="layer-element-title-text">GlobalAveragePooling2D</span>
+                            {!isPublic && <img className="layer-element-drag" title="Reorder layer" src={BACKEND_URL + "/static/images/drag.svg"} {...provided.dragHandleProps} />}
+                            {!isPublic && <img className="layer-element-delete" title="Delete layer" src={BACKEND_URL + "/static/images/cross.svg"} onClick={() => {
+                                deleteLayer(layer.id)
+                            }}/>}
+                        </h1>
+                    </form>}
+
+                    {shape && shape.output_shape && <div className="layer-element-stat" title={shape.flops.toLocaleString() + " FLOPs, " + shape.activation_memory.toLocaleString() + " bytes of activations per sample"}>
+                        <span className="layer-element-stat-color layer-element-stat-gray2"></span>
+                        <label className="layer-element-label">Output shape</label>
+                        <div className="layer-element-input">{"(" + shape.output_shape.join(", ") + ")"}</div>
+                    </div>}
+
+                    {shape && shape.output_shape && <div className="layer-element-stat">
+                        <span className="layer-element-stat-color layer-element-stat-gray2"></span>
+                        <label className="layer-element-label">Parameters</label>
+                        <div className="layer-element-input">{shape.parameters.toLocaleString()}</div>
+                    </div>}
+    
                     {!isPublic && <button type="button" 
                         className={"layer-element-save " + (!updated ? "layer-element-save-disabled" : "")}
                         title={(updated ? "Save changes" : "No changes")}
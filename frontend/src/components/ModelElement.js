@@ -1,6 +1,17 @@
 import React, {useState, useEffect} from "react"
 import {useNavigate} from "react-router-dom"
 
+// Model lists only include counts, while full models include the layers and downloaders
+export function layerCount(model) {
+    if (model.layer_count !== undefined) return model.layer_count
+    return model.layers ? model.layers.length : null
+}
+
+export function modelDownloadCount(model) {
+    if (model.download_count !== undefined) return model.download_count
+    return model.downloaders ? model.downloaders.length : null
+}
+
 function DatasetElement({model, BACKEND_URL, isPublic=false}) {
 
     const [showDescription, setShowDescription] = useState(false)
@@ -41,8 +52,8 @@ function DatasetElement({model, BACKEND_URL, isPublic=false}) {
             </div>
             
             {!isPublic && <p className="dataset-element-private">{model.visibility}</p>}
-            {model.downloaders && <p className="dataset-element-date">{model.downloaders.length + " download" + (model.downloaders.length != 1 ? "s" : "")}</p>}
-            {model.layers && <p className="dataset-element-count">{model.layers.length + " layer" + (model.layers.length != 1 ? "s" : "")}</p>}
+            {modelDownloadCount(model) !== null && <p className="dataset-element-date">{modelDownloadCount(model) + " download" + (modelDownloadCount(model) != 1 ? "s" : "")}</p>}
+            {layerCount(model) !== null && <p className="dataset-element-count">{layerCount(model) + " layer" + (layerCount(model) != 1 ? "s" : "")}</p>}
 
         </div>
     )
@@ -2,9 +2,8 @@ import React, {useEffect, useState, useRef} from "react"
 import { useParams, useNavigate } from "react-router-dom";
 import DownloadPopup from "../popups/DownloadPopup"
 import axios from "axios"
+import { getPage, LoadMore } from "../pagination"
 
-import JSZip from "jszip";
-import { saveAs } from "file-saver";
 import DownloadCode from "../components/DownloadCode";
 
 import { DragDropContext, Droppable, Draggable } from "@hello-pangea/dnd";
@@ -12,6 +11,7 @@ import ProgressBar from "../components/ProgressBar";
 
 
 const TOOLBAR_HEIGHT = 60
+const ELEMENTS_PRELOAD = 20  // The next page of elements is loaded when the selected element is this close to the end of the loaded ones
 
 // The default page. Login not required.
 function Dataset({currentProfile, activateConfirmPopup, notification, BACKEND_URL}) {
@@ -19,6 +19,10 @@ function Dataset({currentProfile, activateConfirmPopup, notification, BACKEND_UR
     const { id } = useParams();
     const [dataset, setDataset] = useState(null)
     const [elements, setElements] = useState([])    // Label points to label id
+    const [nextElements, setNextElements] = useState(null)  // URL of the next page of elements
+    const [loadingMoreElements, setLoadingMoreElements] = useState(false)
+    const elementsRequest = useRef(0)   // Pages loaded before the dataset was reloaded are ignored
+    const requestedElements = useRef(null)   // URL of the last page of elements requested
     const [labels, setLabels] = useState([])
 
     const [idToText, setIdToText] = useState({})
@@ -114,6 +118,7 @@ function Dataset({currentProfile, activateConfirmPopup, notification, BACKEND_UR
 
     // Zoom functionality
     const elementContainerRef = useRef(null)
+    const elementsScrollableRef = useRef(null)
     const [zoom, setZoom] = useState(1);
     const [position, setPosition] = useState({ x: 0, y: 0 });
 
@@ -537,38 +542,6 @@ function Dataset({currentProfile, activateConfirmPopup, notification, BACKEND_UR
     }
 
 
-    // For creating the JSON file that is downloaded for area datasets
-    function createJSON() {
-        let headers = "Filenames"
-        for (let i=0; i < labels.length; i++) {
-            headers += "," + labels[i].name
-        }
-
-        let res = {}
-        let occurences = {}
-        for (let i=0; i < elements.length; i++) {
-            let temp = {}
-            let element = elements[i]
-
-            let name = element.name
-            if (occurences[name]) {
-                name += "_" + (occurences[name] + 1)
-            }
-
-            for (let j=0; j < labels.length; j++) {
-                temp[labels[j].name] = []
-            }
-
-            for (let j=0; j < element.areas.length; j++) {
-                let area = element.areas[j]
-                temp[idToLabel[area.label].name] = JSON.parse(area.area_points)
-            }
-
-            res[name] = temp
-        }
-
-        return JSON.stringify(res); // Combine headers and rows
-    }
 
 
     // END OF DATATYPE AREA FUNCTIONALITY
@@ -658,6 +631,9 @@ function Dataset({currentProfile, activateConfirmPopup, notification, BACKEND_UR
 
     function getDataset() {
         setLoading(true)
+        setNextElements(null)
+        const request = ++elementsRequest.current
+        requestedElements.current = null
         axios({
             method: 'GET',
             url: window.location.origin + '/api/datasets/' + id,
@@ -667,46 +643,24 @@ function Dataset({currentProfile, activateConfirmPopup, notification, BACKEND_UR
 
             setALLOWED_FILE_EXTENSIONS(res.data.dataset_type.toLowerCase() == "image" ? new Set(["png", "jpg", "jpeg", "webp", "avif"]) : new Set(["txt", "doc", "docx"]))
 
-            if (res.data.dataset_type.toLowerCase() == "text") {
-
-                let AJAX_OUTSTANDING = res.data.elements.length
-                let temp = {}
-                for (let i=0; i < res.data.elements.length; i++) {
-                    let element = res.data.elements[i]
-                    fetch(element.file, {
-                        headers: {
-                            'pragma': 'no-cache',
-                            'cache-control': 'no-cache'
-                        }
-                    })
-                    .then(response => {
-                        if (!response.ok) {
-                            throw new Error('Network response was not ok');
-                        }
-                        return response.text()
-                    })
-                    .then(text => {
-                        temp[element.id] = text
-                    })
-                    .catch(error => {
-                        console.error('There was a problem with the fetch operation:', error);
-                    }).finally(() => {
-                        AJAX_OUTSTANDING -= 1
-                        if (AJAX_OUTSTANDING == 0) {
-                            setIdToText(temp)
-                            setUpdatePage(!updatePage)
-                        }
-                    })
-                }
-
-            }
-            setElements(res.data.elements)
-
             setLabels(res.data.labels)
 
             // Update keybinds
             parseLabels(res.data.labels)
 
+            // Elements are loaded a page at a time, see getMoreElements
+            return getPage(window.location.origin + '/api/datasets/' + id + '/elements')
+            .then((page) => [res.data, page])
+        })
+        .then(([datasetData, page]) => {
+            if (request != elementsRequest.current) {return}
+            if (datasetData.dataset_type.toLowerCase() == "text") {
+                getTexts(page.results)
+            }
+            setElements(page.results)
+            setNextElements(page.next)
+            setElementsIndex((elementsIndex) => Math.max(Math.min(elementsIndex, page.results.length - 1), 0))  // Only the first page is loaded again
+
         }).catch((err) => {
             navigate("/")
             notification("An error occured when loading dataset with id " + id + ".", "failure")
@@ -718,6 +672,76 @@ function Dataset({currentProfile, activateConfirmPopup, notification, BACKEND_UR
         })
     }
 
+    function getMoreElements() {
+        if (requestedElements.current == nextElements) {return}    // Both LoadMore and the selected element can ask for the next page
+        requestedElements.current = nextElements
+
+        setLoadingMoreElements(true)
+        const request = elementsRequest.current
+        getPage(nextElements)
+        .then((page) => {
+            if (request != elementsRequest.current) {return}
+            if (dataset.dataset_type.toLowerCase() == "text") {
+                getTexts(page.results)
+            }
+            setElements((elements) => {
+                let loaded = new Set(elements.map((element) => element.id))
+                return elements.concat(page.results.filter((element) => !loaded.has(element.id)))
+            })
+            setNextElements(page.next)
+
+        }).catch((err) => {
+            requestedElements.current = null
+            notification("An error occured while loading more elements.", "failure")
+            console.log(err)
+        }).finally(() => {
+            setLoadingMoreElements(false)
+        })
+    }
+
+    useEffect(() => {
+        if (!loading && nextElements && !loadingMoreElements && elementsIndex >= elements.length - ELEMENTS_PRELOAD) {
+            getMoreElements()
+        }
+    }, [loading, elements, elementsIndex, nextElements, loadingMoreElements])
+
+    function fetchText(element) {
+        return fetch(element.file, {
+            headers: {
+                'pragma': 'no-cache',
+                'cache-control': 'no-cache'
+            }
+        })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Network response was not ok');
+            }
+            return response.text()
+        })
+    }
+
+    // Adds the texts of the given elements to idToText
+    function getTexts(elements) {
+        return Promise.all(elements.map((element) => {
+            return fetchText(element)
+            .then((text) => [element.id, text])
+            .catch(error => {
+                console.error('There was a problem with the fetch operation:', error);
+                return null
+            })
+        }))
+        .then((texts) => {
+            setIdToText((idToText) => {
+                let temp = {...idToText}
+                texts.forEach((text) => {
+                    if (text) {temp[text[0]] = text[1]}
+                })
+                return temp
+            })
+            setUpdatePage((updatePage) => !updatePage)
+        })
+    }
+
     // ELEMENT FUNCTIONALITY
 
     // Element Scroll Functionality (doesn't work for area datasets because of the way points work)
@@ -910,8 +934,8 @@ function Dataset({currentProfile, activateConfirmPopup, notification, BACKEND_UR
 
             formData.append('file', file)
             formData.append('dataset', dataset.id)
-            if (elements.length > 0) {  // So it's added to the bottom of the list
-                formData.append("index", elements.length)
+            if (dataset.element_count > 0) {  // So it's added to the bottom of the list
+                formData.append("index", dataset.element_count)
             }
 
             const URL = window.location.origin + '/api/create-element/'
@@ -1374,175 +1398,38 @@ function Dataset({currentProfile, activateConfirmPopup, notification, BACKEND_UR
         setIsDownloaded(true)
     }
 
-    async function labelFoldersDownload() {
-        if (labels.length == 0) {
-            notification("Cannot download datasets without labels.", "failure")
-            return;
-        }
-        
-        const zip = new JSZip();
-
-        const labelToFolder = {
-            
-        }
-
-        setDownloadingPercentage(0)
-        setIsDownloading(true)
-
-        let NUM_ELEMENTS = elements.length
-        for (let i=0; i < elements.length; i++) {
-
-            let label = idToLabel[elements[i].label]
-            if (label && !labelToFolder[label.id]) {
-                labelToFolder[label.id] = zip.folder(label.name)
-            }
-            if (!label && !labelToFolder["No_Label"]) {
-                labelToFolder["No_Label"] = zip.folder("No_Label")
-            }
-            try {
-                const response = await fetch(elements[i].file, {
-                    headers: {
-                        'pragma': 'no-cache',
-                        'cache-control': 'no-cache'
-                    }
-                });
-                const blob = await response.blob();
-    
-                let extension = elements[i].file.split(".").pop()
-                let filename = elements[i].name
-    
-                if (filename.split(".").pop() != extension) {
-                    filename += "." + extension
-                }
-    
-                labelToFolder[(label ? label.id: "No_Label")].file(filename, blob);
-            } catch (e) {
-                notification("Error: " + e, "failure")
-                
-            }
-            console.log(i)
-            setDownloadingPercentage(Math.round(100 * ((i+1) / NUM_ELEMENTS)))
-            
-        }
-
-        setDownloadingPercentage(100)
-
-        // Generate the ZIP file and trigger download
-        const zipBlob = await zip.generateAsync({ type: "blob" });
-
-        setTimeout(() => {
-            saveAs(zipBlob, dataset.name.replaceAll(" ", "_") + ".zip");
+    // ZIP archives are generated by the server (see ExportDataset), which also increments the download counter
+    function exportDownload(layout) {
+        const a = document.createElement('a');
+        a.href = window.location.origin + '/api/datasets/' + dataset.id + '/export?layout=' + layout
+        a.download = dataset.name.replaceAll(" ", "_") + ".zip"
 
-            setDownloadType("folders")
+        document.body.appendChild(a);
+        a.click();
+        document.body.removeChild(a);
 
-            afterDownload()
-        }, 200)
-        
-        
+        setDownloadType(layout)
+        setIsDownloaded(true)
     }
 
-    async function labelFilenamesDownload() {
+    function labelFoldersDownload() {
         if (labels.length == 0) {
             notification("Cannot download datasets without labels.", "failure")
             return;
         }
-        
-        const zip = new JSZip();
-
-        const labelToNbr = {
-            
-        }
-
-        setDownloadingPercentage(0)
-        setIsDownloading(true)
-        let NUM_ELEMENTS = elements.length
-
-        for (let i=0; i < elements.length; i++) {
-
-            let label = idToLabel[elements[i].label]
-            if (label && !labelToNbr[label.id]) {
-                labelToNbr[label.id] = 0
-            }
-            if (!label && !labelToNbr["No_Label"]) {
-                labelToNbr["No_Label"] = 0
-            }
-
-            try {
-                const response = await fetch(elements[i].file, {
-                    headers: {
-                        'pragma': 'no-cache',
-                        'cache-control': 'no-cache'
-                    }
-                });
-
-                const blob = await response.blob();
-
-                let extension = elements[i].file.split(".").pop()
-                let filename = (label ? label.name + "_" + labelToNbr[label.id] : "no_label_" + labelToNbr["no_label"])
-
-                if (filename.split(".").pop() != extension) {
-                    filename += "." + extension
-                }
-
-                zip.file(filename, blob);
-                labelToNbr[(label ? label.id: "no_label")] += 1
-            } catch (e) {
-                console.log(e)
-                notification("Error: " + e, "failure")
-            }
-            
-            setDownloadingPercentage(Math.round(100 * ((i+1) / NUM_ELEMENTS)))
-        }
-        setDownloadingPercentage(100)
-
-        // Generate the ZIP file and trigger download
-        const zipBlob = await zip.generateAsync({ type: "blob" });
-        
-        setTimeout(() => {
-            saveAs(zipBlob, dataset.name.replaceAll(" ", "_") + ".zip");
-
-            setDownloadType("files")
-            
-            afterDownload()
-        }, 200)
+        exportDownload("folders")
     }
 
-    async function areaDatasetDownload() {
-        const zip = new JSZip();
-
-        setDownloadingPercentage(0)
-        setIsDownloading(true)
-        let NUM_ELEMENTS = elements.length
-        for (let i=0; i < elements.length; i++) {
-            const response = await fetch(elements[i].file, {
-                headers: {
-                    'pragma': 'no-cache',
-                    'cache-control': 'no-cache'
-                }
-            });
-            const blob = await response.blob();
-
-            zip.file(elements[i].name, blob);
-
-            setDownloadingPercentage(Math.round(100 * ((i+1) / NUM_ELEMENTS)))
+    function labelFilenamesDownload() {
+        if (labels.length == 0) {
+            notification("Cannot download datasets without labels.", "failure")
+            return;
         }
-        
-        const jsonContent = createJSON();
-        const blob = new Blob([jsonContent], { type: 'application/json' });
-        zip.file(dataset.name + ".json", blob)
-
-        setDownloadingPercentage(100)
-        
-        // Generate the ZIP file and trigger download
-        const zipBlob = await zip.generateAsync({ type: "blob" });
-
-        setTimeout(() => {
-            saveAs(zipBlob, dataset.name.replaceAll(" ", "_") + ".zip");
-
-            setDownloadType("area")
+        exportDownload("files")
+    }
 
-            afterDownload()
-        }, 200)
+    function areaDatasetDownload() {
+        exportDownload("area")
     }
 
     async function textCsvDownload() {
@@ -1554,12 +1441,26 @@ function Dataset({currentProfile, activateConfirmPopup, notification, BACKEND_UR
         setDownloadingPercentage(0)
         setIsDownloading(true)
 
-        for (let i=0; i < elements.length; i++) {
-            let labelName = (elements[i].label ? idToLabel[elements[i].label].name : "no_label")
-            let parsedText = '"' + idToText[elements[i].id].replaceAll('"', '""') + '"'
+        // Elements and texts that haven't been loaded yet are only fetched for the download
+        let allElements = [...elements]
+        let next = nextElements
+        while (next) {
+            const page = await getPage(next)
+            allElements = allElements.concat(page.results)
+            next = page.next
+        }
+
+        for (let i=0; i < allElements.length; i++) {
+            let text = idToText[allElements[i].id]
+            if (text === undefined) {
+                text = await fetchText(allElements[i])
+            }
+
+            let labelName = (allElements[i].label ? idToLabel[allElements[i].label].name : "no_label")
+            let parsedText = '"' + text.replaceAll('"', '""') + '"'
             csvRows.push(labelName + "," + parsedText)
 
-            setDownloadingPercentage(Math.round(100 * ((i+1) / elements.length)))
+            setDownloadingPercentage(Math.round(100 * ((i+1) / allElements.length)))
         }
 
         let data = csvRows.join("\n")
@@ -1611,18 +1512,18 @@ function Dataset({currentProfile, activateConfirmPopup, notification, BACKEND_UR
         const reorderElements = [...elements];
         const [movedItem] = reorderElements.splice(result.source.index, 1);
         reorderElements.splice(result.destination.index, 0, movedItem);
+
+        // Elements after the loaded pages are unknown, so an element dropped last is moved to the end of the dataset
+        let before = (result.destination.index + 1 < reorderElements.length ? reorderElements[result.destination.index + 1].id : null)
+        if (before === null && nextElements) {
+            reorderElements.pop()
+        }
         
         let currId = elements[elementsIndex].id
         setElements(reorderElements);
 
-        let idToIdx = {}
-
-        for (let i=0; i < reorderElements.length; i++) {
-            idToIdx[reorderElements[i].id] = i
-            if (reorderElements[i].id == currId) {
-                setElementsIndex(i)
-            }
-        }
+        let currIdx = reorderElements.findIndex((element) => element.id == currId)
+        setElementsIndex(currIdx != -1 ? currIdx : Math.max(Math.min(elementsIndex, reorderElements.length - 1), 0))
         
         // For updating the order, so it stays the same after refresh
         const URL = window.location.origin + '/api/reorder-dataset-elements/'
@@ -1630,7 +1531,7 @@ function Dataset({currentProfile, activateConfirmPopup, notification, BACKEND_UR
 
         let data = {
             "id": dataset.id,
-            "order": idToIdx
+            "moves": [{"id": movedItem.id, "before": before}]
         }
 
         axios.defaults.withCredentials = true;
@@ -1879,7 +1780,7 @@ function Dataset({currentProfile, activateConfirmPopup, notification, BACKEND_UR
             
             <div className="dataset-toolbar-left" style={{width: toolbarLeftWidth + "px"}}>
                 <div className="dataset-elements">
-                    <div className="dataset-elements-scrollable">
+                    <div className="dataset-elements-scrollable" ref={elementsScrollableRef}>
                         <p className={"dataset-sidebar-title " + (toolbarLeftWidth < 150 ? "dataset-sidebar-title-small" : "")}>Elements</p>
                         
                         <div className="dataset-sidebar-button-container">
@@ -2041,6 +1942,8 @@ function Dataset({currentProfile, activateConfirmPopup, notification, BACKEND_UR
                             </Droppable>
                         </DragDropContext>
                         
+                        {!loading && <LoadMore next={nextElements} loading={loadingMoreElements} onLoad={getMoreElements} root={elementsScrollableRef}/>}
+                        
                         {elements.length == 0 && !loading && <p className="dataset-no-items">Elements will show here</p>}
                     </div>
                     
@@ -2185,9 +2088,9 @@ function Dataset({currentProfile, activateConfirmPopup, notification, BACKEND_UR
                                     {dataset.downloaders.length + (dataset.downloaders.length == 1 ? " download" : " downloads")}
                                 </div>}
 
-                                {elements && <div className="dataset-description-stats-element">
+                                {dataset.element_count !== undefined && <div className="dataset-description-stats-element">
                                     <img className="dataset-description-stats-icon" src={BACKEND_URL + "/static/images/classification.png"}/>
-                                    {elements.length + (elements.length == 1 ? " element" : " elements")}
+                                    {dataset.element_count + (dataset.element_count == 1 ? " element" : " elements")}
                                 </div>}
 
                                 {labels && <div className="dataset-description-stats-element">
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef } from "react"
 import DatasetElement from "../components/DatasetElement"
-import ModelElement from "../components/ModelElement"
+import { getPage, LoadMore } from "../pagination"
+import ModelElement, { layerCount, modelDownloadCount } from "../components/ModelElement"
 import DatasetElementLoading from "../components/DatasetElementLoading"
 import { useNavigate, useSearchParams } from "react-router-dom"
 import axios from 'axios'
@@ -11,9 +12,12 @@ function Explore({checkLoggedIn, BACKEND_URL, notification}) {
     const startParam = searchParams.get("start"); // Get the 'start' param
 
     const [datasets, setDatasets] = useState([])
+    const [nextDatasets, setNextDatasets] = useState(null)  // URL of the next page of datasets
     const [models, setModels] = useState([])
 
     const [loading, setLoading] = useState(true)
+    const [loadingMoreDatasets, setLoadingMoreDatasets] = useState(false)
+    const datasetsRequest = useRef(0)   // Pages of a previous search or sort are ignored
     const [loadingModels, setLoadingModels] = useState(true)
 
     const [typeShown, setTypeShown] = useState(startParam == "models" ? "models" : "datasets") // Either "datasets" or "models"
@@ -34,18 +38,16 @@ function Explore({checkLoggedIn, BACKEND_URL, notification}) {
         getModels()
     }, [])
 
+    // Datasets are sorted by the server and loaded a page at a time, see LoadMore
     const getDatasets = () => {
         setLoading(true)
-        axios({
-            method: 'GET',
-            url: window.location.origin + '/api/datasets/' + (search ? "?search=" + search : ""),
-        })
-        .then((res) => {
-            if (res.data) {
-                setDatasets(sort_datasets(res.data))
-            } else {
-                setDatasets([])
-            }
+        setNextDatasets(null)
+        const request = ++datasetsRequest.current
+        getPage(window.location.origin + '/api/datasets/?sort=' + sortDatasets + (search ? "&search=" + encodeURIComponent(search) : ""))
+        .then((page) => {
+            if (request != datasetsRequest.current) {return}
+            setDatasets(page.results)
+            setNextDatasets(page.next)
 
         }).catch((err) => {
             alert("An error occured while loading your datasets.")
@@ -56,6 +58,23 @@ function Explore({checkLoggedIn, BACKEND_URL, notification}) {
 
     }
 
+    const getMoreDatasets = () => {
+        setLoadingMoreDatasets(true)
+        const request = datasetsRequest.current
+        getPage(nextDatasets)
+        .then((page) => {
+            if (request != datasetsRequest.current) {return}
+            setDatasets((datasets) => datasets.concat(page.results))
+            setNextDatasets(page.next)
+
+        }).catch((err) => {
+            notification("An error occured while loading more datasets.", "failure")
+            console.log(err)
+        }).finally(() => {
+            setLoadingMoreDatasets(false)
+        })
+    }
+
     const getModels = () => {
         setLoadingModels(true)
         axios({
@@ -84,8 +103,8 @@ function Explore({checkLoggedIn, BACKEND_URL, notification}) {
         
         tempModels.sort((m1, m2) => {
             if (sortModels == "downloads") {
-                if (m1.downloaders.length != m2.downloaders.length) {
-                    return m2.downloaders.length - m1.downloaders.length
+                if (modelDownloadCount(m1) != modelDownloadCount(m2)) {
+                    return modelDownloadCount(m2) - modelDownloadCount(m1)
                 } else {
                     return m1.name.localeCompare(m2.name)
                 }
@@ -94,8 +113,8 @@ function Explore({checkLoggedIn, BACKEND_URL, notification}) {
                 return m1.name.localeCompare(m2.name)
 
             } else if (sortModels == "layers") {
-                if (m1.layers.length != m2.layers.length) {
-                    return m2.layers.length - m1.layers.length
+                if (layerCount(m1) != layerCount(m2)) {
+                    return layerCount(m2) - layerCount(m1)
                 } else {
                     return m1.name.localeCompare(m2.name)
                 }
@@ -105,48 +124,13 @@ function Explore({checkLoggedIn, BACKEND_URL, notification}) {
         return tempModels
     }
 
-    function sort_datasets(ds) {
-
-        let tempDatasets = [...ds]
-
-        
-        tempDatasets.sort((d1, d2) => {
-            if (sortDatasets == "downloads") {
-                if (d1.downloaders.length != d2.downloaders.length) {
-                    return d2.downloaders.length - d1.downloaders.length
-                } else {
-                    return d1.name.localeCompare(d2.name)
-                }
-                
-            } else if (sortDatasets == "alphabetical") {
-                return d1.name.localeCompare(d2.name)
-            } else if (sortDatasets == "date") {
-                return new Date(d2.created_at) - new Date(d1.created_at)
-            } else if (sortDatasets == "elements") {
-                if (d1.elements.length != d2.elements.length) {
-                    return d2.elements.length - d1.elements.length
-                } else {
-                    return d1.name.localeCompare(d2.name)
-                }
-                
-            } else if (sortDatasets == "labels") {
-                if (d1.labels.length != d2.labels.length) {
-                    return d2.labels.length - d1.labels.length
-                } else {
-                    return d1.name.localeCompare(d2.name)
-                }
-                
-            }
-        })
-
-        return tempDatasets
-
-    }
-
+    const firstSort = useRef(true)
     useEffect(() => {
-        if (!loading) {
-            setDatasets(sort_datasets(datasets))
+        if (firstSort.current) {
+            firstSort.current = false
+            return
         }
+        getDatasets()
     }, [sortDatasets])
 
 
@@ -283,6 +267,7 @@ function Explore({checkLoggedIn, BACKEND_URL, notification}) {
                     ))}
                     {!loading && datasets.length == 0 && search.length > 0 && <p className="gray-text">No such datasets found.</p>}
                 </div>
+                {!loading && <LoadMore next={nextDatasets} loading={loadingMoreDatasets} onLoad={getMoreDatasets}/>}
                 
             </div>}
 
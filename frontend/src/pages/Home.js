@@ -1,10 +1,13 @@
 import React, { useState, useEffect, useRef } from "react"
-import DatasetElement from "../components/DatasetElement"
-import ModelElement from "../components/ModelElement"
+import DatasetElement, { elementCount, labelCount, downloadCount } from "../components/DatasetElement"
+import { getPage, LoadMore } from "../pagination"
+import ModelElement, { layerCount, modelDownloadCount } from "../components/ModelElement"
 import DatasetElementLoading from "../components/DatasetElementLoading"
 import { useNavigate, useSearchParams } from "react-router-dom"
 import axios from 'axios'
 
+const DATASETS_PAGE_SIZE = 24  // Page size of dataset lists, see DatasetCursorPagination
+
 // This is the personal view. /home
 function Home({currentProfile, notification, BACKEND_URL}) {
     const navigate = useNavigate()
@@ -12,10 +15,13 @@ function Home({currentProfile, notification, BACKEND_URL}) {
     const startParam = searchParams.get("start"); // Get the 'start' param
 
     const [datasets, setDatasets] = useState([])
+    const [nextDatasets, setNextDatasets] = useState(null)  // URL of the next page of datasets
     const [savedDatasets, setSavedDatasets] = useState([])
     const [models, setModels] = useState([])
 
     const [loading, setLoading] = useState(true)
+    const [loadingMoreDatasets, setLoadingMoreDatasets] = useState(false)
+    const datasetsRequest = useRef(0)   // Pages of a previous search or sort are ignored
     const [loadingModels, setLoadingModels] = useState(true)
     
     const [typeShown, setTypeShown] = useState(startParam ? startParam : "datasets") // Either "datasets" or "models"
@@ -44,18 +50,16 @@ function Home({currentProfile, notification, BACKEND_URL}) {
         }  
     }, [currentProfile])
 
+    // Datasets are sorted by the server and loaded a page at a time, see LoadMore
     const getDatasets = () => {
         setLoading(true)
-        axios({
-            method: 'GET',
-            url: window.location.origin + '/api/my-datasets/' + (search ? "?search=" + search : ""),
-        })
-        .then((res) => {
-            if (res.data) {
-                setDatasets(sort_datasets(res.data))
-            } else {
-                setDatasets([])
-            }
+        setNextDatasets(null)
+        const request = ++datasetsRequest.current
+        getPage(window.location.origin + '/api/my-datasets/?sort=' + sortDatasets + (search ? "&search=" + encodeURIComponent(search) : ""))
+        .then((page) => {
+            if (request != datasetsRequest.current) {return}
+            setDatasets(page.results)
+            setNextDatasets(page.next)
 
         }).catch((err) => {
             notification("An error occured while loading your datasets.", "failure")
@@ -66,6 +70,23 @@ function Home({currentProfile, notification, BACKEND_URL}) {
 
     }
 
+    const getMoreDatasets = () => {
+        setLoadingMoreDatasets(true)
+        const request = datasetsRequest.current
+        getPage(nextDatasets)
+        .then((page) => {
+            if (request != datasetsRequest.current) {return}
+            setDatasets((datasets) => datasets.concat(page.results))
+            setNextDatasets(page.next)
+
+        }).catch((err) => {
+            notification("An error occured while loading more datasets.", "failure")
+            console.log(err)
+        }).finally(() => {
+            setLoadingMoreDatasets(false)
+        })
+    }
+
     const getModels = () => {
         setLoadingModels(true)
         axios({
@@ -93,8 +114,8 @@ function Home({currentProfile, notification, BACKEND_URL}) {
         
         tempModels.sort((m1, m2) => {
             if (sortModels == "downloads") {
-                if (m1.downloaders.length != m2.downloaders.length) {
-                    return m2.downloaders.length - m1.downloaders.length
+                if (modelDownloadCount(m1) != modelDownloadCount(m2)) {
+                    return modelDownloadCount(m2) - modelDownloadCount(m1)
                 } else {
                     return m1.name.localeCompare(m2.name)
                 }
@@ -103,8 +124,8 @@ function Home({currentProfile, notification, BACKEND_URL}) {
                 return m1.name.localeCompare(m2.name)
 
             } else if (sortModels == "layers") {
-                if (m1.layers.length != m2.layers.length) {
-                    return m2.layers.length - m1.layers.length
+                if (layerCount(m1) != layerCount(m2)) {
+                    return layerCount(m2) - layerCount(m1)
                 } else {
                     return m1.name.localeCompare(m2.name)
                 }
@@ -114,48 +135,13 @@ function Home({currentProfile, notification, BACKEND_URL}) {
         return tempModels
     }
 
-    function sort_datasets(ds) {
-        let tempDatasets = [...ds]
-        
-        tempDatasets.sort((d1, d2) => {
-            if (sortDatasets == "downloads") {
-                if (d1.downloaders.length != d2.downloaders.length) {
-                    return d2.downloaders.length - d1.downloaders.length
-                } else {
-                    return d1.name.localeCompare(d2.name)
-                }
-                
-            } else if (sortDatasets == "alphabetical") {
-                return d1.name.localeCompare(d2.name)
-            } else if (sortDatasets == "date") {
-                return new Date(d2.created_at) - new Date(d1.created_at)
-            } else if (sortDatasets == "elements") {
-                if (d1.elements.length != d2.elements.length) {
-                    return d2.elements.length - d1.elements.length
-                } else {
-                    return d1.name.localeCompare(d2.name)
-                }
-                
-            } else if (sortDatasets == "labels") {
-                if (d1.labels.length != d2.labels.length) {
-                    return d2.labels.length - d1.labels.length
-                } else {
-                    return d1.name.localeCompare(d2.name)
-                }
-                
-            }
-        })
-
-        return tempDatasets
-    }
-
     function sort_saved_datasets(ds) {
         let tempDatasets = [...ds]
         
         tempDatasets.sort((d1, d2) => {
             if (sortSavedDatasets == "downloads") {
-                if (d1.downloaders.length != d2.downloaders.length) {
-                    return d2.downloaders.length - d1.downloaders.length
+                if (downloadCount(d1) != downloadCount(d2)) {
+                    return downloadCount(d2) - downloadCount(d1)
                 } else {
                     return d1.name.localeCompare(d2.name)
                 }
@@ -164,14 +150,14 @@ function Home({currentProfile, notification, BACKEND_URL}) {
             } else if (sortSavedDatasets == "date") {
                 return new Date(d2.created_at) - new Date(d1.created_at)
             } else if (sortSavedDatasets == "elements") {
-                if (d1.elements.length != d2.elements.length) {
-                    return d2.elements.length - d1.elements.length
+                if (elementCount(d1) != elementCount(d2)) {
+                    return elementCount(d2) - elementCount(d1)
                 } else {
                     return d1.name.localeCompare(d2.name)
                 }
             } else if (sortSavedDatasets == "labels") {
-                if (d1.labels.length != d2.labels.length) {
-                    return d2.labels.length - d1.labels.length
+                if (labelCount(d1) != labelCount(d2)) {
+                    return labelCount(d2) - labelCount(d1)
                 } else {
                     return d1.name.localeCompare(d2.name)
                 }
@@ -188,10 +174,13 @@ function Home({currentProfile, notification, BACKEND_URL}) {
         }
     }, [sortSavedDatasets])
 
+    const firstSort = useRef(true)
     useEffect(() => {
-        if (!loading) {
-            setDatasets(sort_datasets(datasets))
+        if (firstSort.current) {
+            firstSort.current = false
+            return
         }
+        getDatasets()
     }, [sortDatasets])
 
 
@@ -359,10 +348,11 @@ function Home({currentProfile, notification, BACKEND_URL}) {
                         navigate("/create-dataset")
                     }}>here</span> to create one.</p>}
                     {!loading && datasets.length == 0 && search.length > 0 && <p className="gray-text">No such datasets found.</p>}
-                    {loading && datasets.length == 0 && currentProfile.datasetsCount > 0 && [...Array(currentProfile.datasetsCount)].map((e, i) => (
+                    {loading && datasets.length == 0 && currentProfile.datasetsCount > 0 && [...Array(Math.min(currentProfile.datasetsCount, DATASETS_PAGE_SIZE))].map((e, i) => (
                         <DatasetElementLoading key={i} BACKEND_URL={BACKEND_URL}/>
                     ))}
                 </div>
+                {!loading && <LoadMore next={nextDatasets} loading={loadingMoreDatasets} onLoad={getMoreDatasets}/>}
                 
             </div>}
 
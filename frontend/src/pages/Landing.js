@@ -49,7 +49,10 @@ function Landing({BACKEND_URL}) {
         ["Dropout", "blue"],
         ["Rescaling", "darkblue"],
         ["RandomFlip", "cyan"],
-        ["Resizing", "green"]
+        ["Resizing", "green"],
+        ["BatchNormalization", "orange"],
+        ["GlobalAveragePooling2D", "yellow"],
+        ["SeparableConv2D", "teal"]
     ]
 
     return (
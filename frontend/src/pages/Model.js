@@ -48,6 +48,7 @@ function Model({currentProfile, activateConfirmPopup, notification, BACKEND_URL}
 
     const [warnings, setWarnings] = useState(false)
     const [updateWarnings, setUpdateWarnings] = useState(false)
+    const [layerShapes, setLayerShapes] = useState(null)    // Output shapes, parameters and errors of layers, see getLayerShapes
 
     const [cursor, setCursor] = useState("")
 
@@ -89,7 +90,10 @@ function Model({currentProfile, activateConfirmPopup, notification, BACKEND_URL}
         "dropout": "blue",
         "rescaling": "darkblue",
         "randomflip": "cyan",
-        "resizing": "green"
+        "resizing": "green",
+        "batchnormalization": "orange",
+        "globalaveragepooling2d": "yellow",
+        "separableconv2d": "teal"
     }
 
     useEffect(() => {
@@ -102,6 +106,7 @@ function Model({currentProfile, activateConfirmPopup, notification, BACKEND_URL}
 
     useEffect(() => {
         setUpdateWarnings(!updateWarnings)
+        getLayerShapes()
     }, [layers])
 
     useEffect(() => {
@@ -139,6 +144,19 @@ function Model({currentProfile, activateConfirmPopup, notification, BACKEND_URL}
         })
     }
 
+    function getLayerShapes() {   // Inferred on the server without building the model, so it's done after every change
+        axios({
+            method: 'GET',
+            url: window.location.origin + '/api/models/' + id + '/shapes',
+        })
+        .then((res) => {
+            setLayerShapes(res.data)
+        }).catch((err) => {
+            setLayerShapes(null)
+            console.log(err)
+        })
+    }
+
     function buildModel(optimizer, loss) {
 
         if (processingBuildModel) {return}
@@ -276,6 +294,12 @@ function Model({currentProfile, activateConfirmPopup, notification, BACKEND_URL}
             return "RandomFlip (" + layer.mode + ")"
         } else if (type == "resizing") {
             return "Resizing (" + layer.input_x + ", " + layer.input_y + ")"
+        } else if (type == "batchnormalization") {
+            return "BatchNormalization (" + layer.momentum + ", " + layer.epsilon + ")"
+        } else if (type == "globalaveragepooling2d") {
+            return "GlobalAveragePooling2D"
+        } else if (type == "separableconv2d") {
+            return "SeparableConv2D - (" + layer.filters + ", " + layer.kernel_size + ")"
         }
     }
 
@@ -674,6 +698,11 @@ function Model({currentProfile, activateConfirmPopup, notification, BACKEND_URL}
                                     <img className="dataset-description-stats-icon" src={BACKEND_URL + "/static/images/classification.png"}/>
                                     {layers.length + (layers.length == 1 ? " layer" : " layers")}
                                 </div>}
+
+                                {layerShapes && layerShapes.valid && layers.length > 0 && <div className="model-description-stats-element" title={layerShapes.flops.toLocaleString() + " FLOPs per sample"}>
+                                    <img className="dataset-description-stats-icon" src={BACKEND_URL + "/static/images/build.svg"}/>
+                                    {layerShapes.parameters.toLocaleString() + (layerShapes.parameters == 1 ? " parameter" : " parameters")}
+                                </div>}
                             </div>
 
                             {(model.trained_on || model.trained_on_tensorflow) && <div className="model-description-trained">
@@ -767,6 +796,7 @@ function Model({currentProfile, activateConfirmPopup, notification, BACKEND_URL}
                                         setLayers={setLayers}
                                         notification={notification}
                                         prevLayer={(idx > 0 ? layers[idx - 1] : null)}
+                                        shape={(layerShapes && layerShapes.layers[idx] && layerShapes.layers[idx].id == layer.id ? layerShapes.layers[idx] : null)}
                                         warnings={warnings}
                                         setWarnings={setWarnings}
                                         provided={provided}
@@ -3,15 +3,15 @@ import { useParams, useNavigate } from "react-router-dom";
 import DownloadPopup from "../popups/DownloadPopup"
 import DownloadCode from "../components/DownloadCode"
 import axios from "axios"
+import { getPage, LoadMore } from "../pagination"
 
-import JSZip from "jszip";
-import { saveAs } from "file-saver";
 import ProgressBar from "../components/ProgressBar";
 
 import { DragDropContext, Droppable, Draggable } from "@hello-pangea/dnd";
 
 
 const TOOLBAR_HEIGHT = 60
+const ELEMENTS_PRELOAD = 20  // The next page of elements is loaded when the selected element is this close to the end of the loaded ones
 
 // The default page. Login not required.
 function PublicDataset({currentProfile, BACKEND_URL, notification}) {   // Current profile for whether or not to display the save button
@@ -20,6 +20,9 @@ function PublicDataset({currentProfile, BACKEND_URL, notification}) {   // Curre
     const { id } = useParams();
     const [dataset, setDataset] = useState(null)
     const [elements, setElements] = useState([])    // Label points to label id
+    const [nextElements, setNextElements] = useState(null)  // URL of the next page of elements
+    const [loadingMoreElements, setLoadingMoreElements] = useState(false)
+    const requestedElements = useRef(null)   // URL of the last page of elements requested
     const [labels, setLabels] = useState([])
     
     const [currentText, setCurrentText] = useState("") // Used to display text files
@@ -83,6 +86,7 @@ function PublicDataset({currentProfile, BACKEND_URL, notification}) {   // Curre
 
     // Zoom functionality
     const elementContainerRef = useRef(null)
+    const elementsScrollableRef = useRef(null)
     const [zoom, setZoom] = useState(1);
     const [position, setPosition] = useState({ x: 0, y: 0 });
 
@@ -164,38 +168,6 @@ function PublicDataset({currentProfile, BACKEND_URL, notification}) {   // Curre
     }
 
 
-    // For creating the JSON file that is downloaded for area datasets
-    function createJSON() {
-        let headers = "Filenames"
-        for (let i=0; i < labels.length; i++) {
-            headers += "," + labels[i].name
-        }
-
-        let res = {}
-        let occurences = {}
-        for (let i=0; i < elements.length; i++) {
-            let temp = {}
-            let element = elements[i]
-
-            let name = element.name
-            if (occurences[name]) {
-                name += "_" + (occurences[name] + 1)
-            }
-
-            for (let j=0; j < labels.length; j++) {
-                temp[labels[j].name] = []
-            }
-
-            for (let j=0; j < element.areas.length; j++) {
-                let area = element.areas[j]
-                temp[idToLabel[area.label].name] = JSON.parse(area.area_points)
-            }
-
-            res[name] = temp
-        }
-
-        return JSON.stringify(res); // Combine headers and rows
-    }
 
     function getPoints(area, areaIdx) {
         if (!area) {return}
@@ -286,12 +258,18 @@ function PublicDataset({currentProfile, BACKEND_URL, notification}) {   // Curre
 
             setALLOWED_FILE_EXTENSIONS(res.data.dataset_type.toLowerCase() == "image" ? new Set(["png", "jpg", "jpeg", "webp", "avif"]) : new Set(["txt", "doc", "docx"]))
 
-            setElements(res.data.elements)
             setLabels(res.data.labels)
 
             // Update keybinds
             parseLabels(res.data.labels)
 
+            // Elements are loaded a page at a time, see getMoreElements
+            return getPage(window.location.origin + '/api/datasets/' + id + '/elements')
+        })
+        .then((page) => {
+            setElements(page.results)
+            setNextElements(page.next)
+
             setLoading(false)
         }).catch((err) => {
             navigate("/")
@@ -302,6 +280,31 @@ function PublicDataset({currentProfile, BACKEND_URL, notification}) {   // Curre
         })
     }
 
+    function getMoreElements() {
+        if (requestedElements.current == nextElements) {return}    // Both LoadMore and the selected element can ask for the next page
+        requestedElements.current = nextElements
+
+        setLoadingMoreElements(true)
+        getPage(nextElements)
+        .then((page) => {
+            setElements((elements) => elements.concat(page.results))
+            setNextElements(page.next)
+
+        }).catch((err) => {
+            requestedElements.current = null
+            notification("An error occured while loading more elements.", "failure")
+            console.log(err)
+        }).finally(() => {
+            setLoadingMoreElements(false)
+        })
+    }
+
+    useEffect(() => {
+        if (!loading && nextElements && !loadingMoreElements && elementsIndex >= elements.length - ELEMENTS_PRELOAD) {
+            getMoreElements()
+        }
+    }, [loading, elements, elementsIndex, nextElements, loadingMoreElements])
+
     function saveDataset() {
         if (!currentProfile) {return}
 
@@ -492,206 +495,38 @@ function PublicDataset({currentProfile, BACKEND_URL, notification}) {   // Curre
 
     // DOWNLOAD FUNCTIONALITY
 
-    function downloadAPICall() {
-        const URL = window.location.origin + '/api/download-dataset/'
-        const config = {headers: {'Content-Type': 'application/json'}}
-
-        let data = {
-            "id": dataset.id
-        }
-
-        axios.defaults.withCredentials = true;
-        axios.defaults.xsrfHeaderName = 'X-CSRFTOKEN';
-        axios.defaults.xsrfCookieName = 'csrftoken';    
+    // ZIP archives are generated by the server (see ExportDataset), which also increments the download counter
+    function exportDownload(layout) {
+        const a = document.createElement('a');
+        a.href = window.location.origin + '/api/datasets/' + dataset.id + '/export?layout=' + layout
+        a.download = dataset.name.replaceAll(" ", "_") + ".zip"
 
-        axios.post(URL, data, config)
-        .then((data) => {
+        document.body.appendChild(a);
+        a.click();
+        document.body.removeChild(a);
 
-        }).catch((error) => {
-            if (error.status == 401) {
-                console.log("Did not increment download counter as user is not signed in.")
-            } else {
-                console.log("Error: ", error)
-            }
-            
-        })
+        setDownloadType(layout)
+        setIsDownloaded(true)
     }
 
-    async function labelFoldersDownload() {
+    function labelFoldersDownload() {
         if (labels.length == 0) {
             notification("Cannot download datasets without labels.", "failure")
             return;
         }
-        
-        const zip = new JSZip();
-
-        const labelToFolder = {
-            
-        }
-
-        setDownloadingPercentage(0)
-        setIsDownloading(true)
-
-        let NUM_ELEMENTS = elements.length
-        for (let i=0; i < elements.length; i++) {
-
-            let label = idToLabel[elements[i].label]
-            if (label && !labelToFolder[label.id]) {
-                labelToFolder[label.id] = zip.folder(label.name)
-            }
-            if (!label && !labelToFolder["No_Label"]) {
-                labelToFolder["No_Label"] = zip.folder("No_Label")
-            }
-            try {
-                const response = await fetch(elements[i].file, {
-                    headers: {
-                        'pragma': 'no-cache',
-                        'cache-control': 'no-cache'
-                    }
-                });
-                const blob = await response.blob();
-    
-                let extension = elements[i].file.split(".").pop()
-                let filename = elements[i].name
-    
-                if (filename.split(".").pop() != extension) {
-                    filename += "." + extension
-                }
-    
-                labelToFolder[(label ? label.id: "No_Label")].file(filename, blob);
-            } catch (e) {
-                notification("Error: " + e, "failure")
-                
-            }
-
-            setDownloadingPercentage(Math.round(100 * (i / NUM_ELEMENTS)))
-            
-        }
-
-        setDownloadingPercentage(100)
-
-        // Generate the ZIP file and trigger download
-        const zipBlob = await zip.generateAsync({ type: "blob" });
-
-        setTimeout(() => {
-            saveAs(zipBlob, dataset.name.replaceAll(" ", "_") + ".zip");
-
-            downloadAPICall()
-
-            getDataset()
-
-            setDownloadType("folders")
-            setIsDownloading(false)
-            setIsDownloaded(true)
-        }, 200)
+        exportDownload("folders")
     }
 
-    async function labelFilenamesDownload() {
+    function labelFilenamesDownload() {
         if (labels.length == 0) {
             notification("Cannot download datasets without labels.", "failure")
             return;
         }
-        
-        const zip = new JSZip();
-
-        const labelToNbr = {
-            
-        }
-
-        setDownloadingPercentage(0)
-        setIsDownloading(true)
-        let NUM_ELEMENTS = elements.length
-
-        for (let i=0; i < elements.length; i++) {
-
-            let label = idToLabel[elements[i].label]
-            if (label && !labelToNbr[label.id]) {
-                labelToNbr[label.id] = 0
-            }
-            if (!label && !labelToNbr["No_Label"]) {
-                labelToNbr["No_Label"] = 0
-            }
-
-            try {
-                const response = await fetch(elements[i].file, {
-                    headers: {
-                        'pragma': 'no-cache',
-                        'cache-control': 'no-cache'
-                    }
-                });
-
-                const blob = await response.blob();
-
-                let extension = elements[i].file.split(".").pop()
-                let filename = (label ? label.name + "_" + labelToNbr[label.id] : "no_label_" + labelToNbr["no_label"])
-
-                if (filename.split(".").pop() != extension) {
-                    filename += "." + extension
-                }
-
-                zip.file(filename, blob);
-                labelToNbr[(label ? label.id: "no_label")] += 1
-            } catch (e) {
-                console.log(e)
-                notification("Error: " + e, "failure")
-            }
-            
-            setDownloadingPercentage(Math.round(100 * (i / NUM_ELEMENTS)))
-        }
-        setDownloadingPercentage(100)
-
-        // Generate the ZIP file and trigger download
-        const zipBlob = await zip.generateAsync({ type: "blob" });
-        
-        setTimeout(() => {
-            saveAs(zipBlob, dataset.name.replaceAll(" ", "_") + ".zip");
-
-            downloadAPICall()
-            setDownloadingPercentage(0)
-
-            setIsDownloading(false)
-            setDownloadType("files")
-            setIsDownloaded(true)
-        }, 200)
+        exportDownload("files")
     }
 
-    async function areaDatasetDownload() {
-        const zip = new JSZip();
-
-        setDownloadingPercentage(0)
-        setIsDownloading(true)
-        let NUM_ELEMENTS = elements.length
-        for (let i=0; i < elements.length; i++) {
-            const response = await fetch(elements[i].file, {
-                headers: {
-                    'pragma': 'no-cache',
-                    'cache-control': 'no-cache'
-                }
-            });
-            const blob = await response.blob();
-
-            zip.file(elements[i].name, blob);
-
-            setDownloadingPercentage(Math.round(100 * (i / NUM_ELEMENTS)))
-        }
-        
-        const jsonContent = createJSON();
-        const blob = new Blob([jsonContent], { type: 'application/json' });
-        zip.file(dataset.name + ".json", blob)
-
-        setDownloadingPercentage(100)
-        
-        // Generate the ZIP file and trigger download
-        const zipBlob = await zip.generateAsync({ type: "blob" });
-
-        setTimeout(() => {
-            saveAs(zipBlob, dataset.name.replaceAll(" ", "_") + ".zip");
-
-            downloadAPICall()
-            setDownloadingPercentage(0)
-
-            setIsDownloaded(true)
-        }, 200)
+    function areaDatasetDownload() {
+        exportDownload("area")
     }
 
     // FRONTEND FUNCTIONALITY
@@ -899,7 +734,7 @@ function PublicDataset({currentProfile, BACKEND_URL, notification}) {   // Curre
             
             <div className="dataset-toolbar-left" style={{width: toolbarLeftWidth + "px"}}>
                 <div className="dataset-elements">
-                    <div className="dataset-elements-scrollable">
+                    <div className="dataset-elements-scrollable" ref={elementsScrollableRef}>
                         <p className={"dataset-sidebar-title " + (toolbarLeftWidth < 150 ? "dataset-sidebar-title-small" : "")}>Elements</p>
                         
                         <DragDropContext className="dataset-elements-list" onDragEnd={elementsHandleDragEnd}>
@@ -961,6 +796,8 @@ function PublicDataset({currentProfile, BACKEND_URL, notification}) {   // Curre
                                 )}
                             </Droppable>
                         </DragDropContext>
+                        {!loading && <LoadMore next={nextElements} loading={loadingMoreElements} onLoad={getMoreElements} root={elementsScrollableRef}/>}
+                        
                         {elements.length == 0 && !loading && <p className="dataset-no-items">Elements will show here</p>}
                     </div>
                     
@@ -1060,9 +897,9 @@ function PublicDataset({currentProfile, BACKEND_URL, notification}) {   // Curre
                                     {dataset.downloaders.length + (dataset.downloaders.length == 1 ? " download" : " downloads")}
                                 </div>}
 
-                                {elements && <div className="dataset-description-stats-element">
+                                {dataset.element_count !== undefined && <div className="dataset-description-stats-element">
                                     <img className="dataset-description-stats-icon" src={BACKEND_URL + "/static/images/classification.png"}/>
-                                    {elements.length + (elements.length == 1 ? " element" : " elements")}
+                                    {dataset.element_count + (dataset.element_count == 1 ? " element" : " elements")}
                                 </div>}
 
                                 {labels && <div className="dataset-description-stats-element">
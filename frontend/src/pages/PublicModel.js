@@ -79,7 +79,10 @@ function PublicModel({currentProfile, activateConfirmPopup, notification, BACKEN
         "dropout": "blue",
         "rescaling": "darkblue",
         "randomflip": "cyan",
-        "resizing": "green"
+        "resizing": "green",
+        "batchnormalization": "orange",
+        "globalaveragepooling2d": "yellow",
+        "separableconv2d": "teal"
     }
 
     useEffect(() => {
@@ -180,6 +183,12 @@ function PublicModel({currentProfile, activateConfirmPopup, notification, BACKEN
             return "RandomFlip (" + layer.mode + ")"
         } else if (type == "resizing") {
             return "Resizing (" + layer.input_x + ", " + layer.input_y + ")"
+        } else if (type == "batchnormalization") {
+            return "BatchNormalization (" + layer.momentum + ", " + layer.epsilon + ")"
+        } else if (type == "globalaveragepooling2d") {
+            return "GlobalAveragePooling2D"
+        } else if (type == "separableconv2d") {
+            return "SeparableConv2D - (" + layer.filters + ", " + layer.kernel_size + ")"
         }
     }
 
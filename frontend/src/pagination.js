@@ -0,0 +1,42 @@
+import React, { useEffect, useRef, useState } from "react"
+import axios from 'axios'
+
+// Gets one page of a cursor paginated list endpoint, resolving to its results and the URL of the next page (or null)
+export function getPage(url) {
+    return axios({
+        method: 'GET',
+        url: url,
+    })
+    .then((res) => {
+        return {results: res.data.results, next: res.data.next}
+    })
+}
+
+// Placed after a paginated list, calls onLoad when scrolled into view while there is a next page and it isn't loading.
+// root is a ref to the scrollable container of the list, when it isn't the page itself.
+export function LoadMore({next, loading, onLoad, root=null}) {
+    const ref = useRef(null)
+    const [visible, setVisible] = useState(false)
+
+    useEffect(() => {
+        const observer = new IntersectionObserver((entries) => {
+            setVisible(entries[0].isIntersecting)
+        }, {root: (root ? root.current : null), rootMargin: "300px"})  // Starts loading a bit before the end of the list is reached
+        observer.observe(ref.current)
+
+        return () => {
+            observer.disconnect()
+        }
+    }, [])
+
+    // Also runs after a page is loaded, in case the end of the list is still visible
+    useEffect(() => {
+        if (visible && next && !loading) {
+            onLoad()
+        }
+    }, [visible, next, loading])
+
+    return <div ref={ref} className="load-more">
+        {loading && next && <p className="gray-text">Loading...</p>}
+    </div>
+}
@@ -5,8 +5,8 @@ function CreateLayerPopup({BACKEND_URL, setShowCreateLayerPopup, onSubmit, proce
     // Data fields for different layers
     const [type, setType] = useState("dense")
 
-    const [filters, setFilters] = useState(1)   // Used for layers of type ["conv2d"]
-    const [kernelSize, setKernelSize] = useState(3) // Used for layers of type ["conv2d"]
+    const [filters, setFilters] = useState(1)   // Used for layers of type ["conv2d", "separableconv2d"]
+    const [kernelSize, setKernelSize] = useState(3) // Used for layers of type ["conv2d", "separableconv2d"]
     const [nodesCount, setNodesCount] = useState(8) // Used for layers of type ["dense"]
     const [inputX, setInputX] = useState("")    // Used for layers of type ["conv2d", "flatten", "rescaling"]
     const [inputY, setInputY] = useState("")    // Used for layers of type ["conv2d", "flatten", "rescaling"]
@@ -18,6 +18,8 @@ function CreateLayerPopup({BACKEND_URL, setShowCreateLayerPopup, onSubmit, proce
     const [mode, setMode] = useState("horizontal_and_vertical") // Used for layers of type ["randomflip"]
     const [outputX, setOutputX] = useState(256)
     const [outputY, setOutputY] = useState(256)
+    const [momentum, setMomentum] = useState(0.99)  // Used for layers of type ["batchnormalization"]
+    const [epsilon, setEpsilon] = useState(0.001)   // Used for layers of type ["batchnormalization"]
 
     const [activation, setActivation] = useState("")    // Used for layers of type ["dense", "conv2d"]
 
@@ -83,7 +85,7 @@ function CreateLayerPopup({BACKEND_URL, setShowCreateLayerPopup, onSubmit, proce
                         }
                         
                     }
-                    else if (type == "conv2d") {
+                    else if (type == "conv2d" || type == "separableconv2d") {
                         data["filters"] = filters
                         data["kernel_size"] = kernelSize
 
@@ -151,8 +153,16 @@ function CreateLayerPopup({BACKEND_URL, setShowCreateLayerPopup, onSubmit, proce
                         data["output_x"] = outputX
                         data["output_y"] = outputY
                     }
+                    else if (type == "batchnormalization") {
+                        if (momentum < 0 || momentum > 1 || epsilon < 0) {
+                            notification("Momentum must be between 0 and 1, and epsilon positive.", "failure")
+                            return
+                        }
+                        data["momentum"] = momentum
+                        data["epsilon"] = epsilon
+                    }
 
-                    const NO_ACTIVATION = new Set(["flatten", "dropout", "rescaling", "randomflip", "maxpool2d", "resizing"])
+                    const NO_ACTIVATION = new Set(["flatten", "dropout", "rescaling", "randomflip", "maxpool2d", "resizing", "batchnormalization", "globalaveragepooling2d"])
                     if (NO_ACTIVATION.has(type)) {    // These layers cannot have activation functions
                         data["activation_function"] = ""
                     }
@@ -168,6 +178,7 @@ function CreateLayerPopup({BACKEND_URL, setShowCreateLayerPopup, onSubmit, proce
                                 <option value="dense">Dense</option>
                                 <option value="flatten">Flatten</option>
                                 <option value="dropout">Dropout</option>
+                                <option value="batchnormalization">BatchNormalization</option>
                             </optgroup>
                             <optgroup label="Image Preprocessing">
                                 <option value="resizing">Resizing</option>
@@ -177,6 +188,8 @@ function CreateLayerPopup({BACKEND_URL, setShowCreateLayerPopup, onSubmit, proce
                             <optgroup label="Computer Vision">
                                 <option value="conv2d">Conv2D</option>
                                 <option value="maxpool2d">MaxPool2D</option>
+                                <option value="separableconv2d">SeparableConv2D</option>
+                                <option value="globalaveragepooling2d">GlobalAveragePooling2D</option>
                             </optgroup>
                             
                             
@@ -212,7 +225,7 @@ function CreateLayerPopup({BACKEND_URL, setShowCreateLayerPopup, onSubmit, proce
                         </div>
                     </div>}
 
-                    {type == "conv2d" && <div className="create-layer-type-fields">
+                    {(type == "conv2d" || type == "separableconv2d") && <div className="create-layer-type-fields">
                         <div className="create-layer-label-inp">
                             <label className="create-dataset-label" htmlFor="layer-filters">Number of filters</label>
                             <input className="create-dataset-inp" id="layer-filters" type="number" required value={filters} onChange={(e) => {
@@ -280,6 +293,22 @@ function CreateLayerPopup({BACKEND_URL, setShowCreateLayerPopup, onSubmit, proce
                         </div>
                     </div>}
 
+                    {type == "batchnormalization" && <div className="create-layer-type-fields">
+                        <div className="create-layer-label-inp">
+                            <label className="create-dataset-label" htmlFor="layer-momentum">Momentum</label>
+                            <input className="create-dataset-inp" id="layer-momentum" type="number" value={momentum} step="0.01" onChange={(e) => {
+                                setMomentum(Math.max(0, Math.min(1, e.target.value)))
+                            }} />
+                        </div>
+
+                        <div className="create-layer-label-inp">
+                            <label className="create-dataset-label" htmlFor="layer-epsilon">Epsilon</label>
+                            <input className="create-dataset-inp" id="layer-epsilon" type="number" value={epsilon} step="0.001" onChange={(e) => {
+                                setEpsilon(e.target.value)
+                            }} />
+                        </div>
+                    </div>}
+
                     {type == "dropout" && <div className="create-layer-type-fields">
                         <div className="create-layer-label-inp">
                             <label className="create-dataset-label" htmlFor="layer-rate">Rate</label>
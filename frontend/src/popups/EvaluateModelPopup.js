@@ -1,18 +1,24 @@
 import React, {useState, useEffect, useRef} from "react"
 import axios from 'axios'
-import DatasetElement from "../components/DatasetElement"
+import DatasetElement, { elementCount, labelCount, downloadCount } from "../components/DatasetElement"
+import { getPage, LoadMore } from "../pagination"
 import DatasetElementLoading from "../components/DatasetElementLoading"
 import ProgressBar from "../components/ProgressBar"
 
+const DATASETS_PAGE_SIZE = 24  // Page size of dataset lists, see DatasetCursorPagination
+
 function EvaluateModelPopup({setShowEvaluateModelPopup, model_id, currentProfile, BACKEND_URL, notification, activateConfirmPopup}) {
 
     const [datasets, setDatasets] = useState([])
+    const [nextDatasets, setNextDatasets] = useState(null)  // URL of the next page of datasets
     const [savedDatasets, setSavedDatasets] = useState([])
 
     const [isEvaluating, setIsEvaluating] = useState(false)
     const [evaluationProgress, setEvaluationProgress] = useState(0)
 
     const [loading, setLoading] = useState(false)
+    const [loadingMoreDatasets, setLoadingMoreDatasets] = useState(false)
+    const datasetsRequest = useRef(0)   // Pages of a previous search or sort are ignored
 
     const [sortDatasets, setSortDatasets] = useState("downloads")
     const [search, setSearch] = useState("")
@@ -43,18 +49,16 @@ function EvaluateModelPopup({setShowEvaluateModelPopup, model_id, currentProfile
         }
     }, [currentProfile])
 
+    // Datasets are sorted by the server and loaded a page at a time, see LoadMore
     function getDatasets() {
         setLoading(true)
-        axios({
-            method: 'GET',
-            url: window.location.origin + '/api/my-datasets/' + (search ? "?search=" + search : ""),
-        })
-        .then((res) => {
-            if (res.data) {
-                setDatasets(sort_datasets(res.data))
-            } else {
-                setDatasets([])
-            }
+        setNextDatasets(null)
+        const request = ++datasetsRequest.current
+        getPage(window.location.origin + '/api/my-datasets/?sort=' + sortDatasets + (search ? "&search=" + encodeURIComponent(search) : ""))
+        .then((page) => {
+            if (request != datasetsRequest.current) {return}
+            setDatasets(page.results)
+            setNextDatasets(page.next)
 
         }).catch((err) => {
             notification("An error occured while loading your datasets.", "failure")
@@ -64,6 +68,23 @@ function EvaluateModelPopup({setShowEvaluateModelPopup, model_id, currentProfile
         })
     }
 
+    function getMoreDatasets() {
+        setLoadingMoreDatasets(true)
+        const request = datasetsRequest.current
+        getPage(nextDatasets)
+        .then((page) => {
+            if (request != datasetsRequest.current) {return}
+            setDatasets((datasets) => datasets.concat(page.results))
+            setNextDatasets(page.next)
+
+        }).catch((err) => {
+            notification("An error occured while loading more datasets.", "failure")
+            console.log(err)
+        }).finally(() => {
+            setLoadingMoreDatasets(false)
+        })
+    }
+
     function evaluateModel(dataset_id) {
         const URL = window.location.origin + '/api/evaluate-model/'
         const config = {headers: {'Content-Type': 'application/json'}}
@@ -112,49 +133,13 @@ function EvaluateModelPopup({setShowEvaluateModelPopup, model_id, currentProfile
         })
     }
 
-    function sort_datasets(ds) {
-        let tempDatasets = [...ds]
-
-        tempDatasets.sort((d1, d2) => {
-            if (sortDatasets == "downloads") {
-                if (d1.downloaders.length != d2.downloaders.length) {
-                    return d2.downloaders.length - d1.downloaders.length
-                } else {
-                    return d1.name.localeCompare(d2.name)
-                }
-                
-            } else if (sortDatasets == "alphabetical") {
-                return d1.name.localeCompare(d2.name)
-            } else if (sortDatasets == "date") {
-                return new Date(d2.created_at) - new Date(d1.created_at)
-            } else if (sortDatasets == "elements") {
-                if (d1.elements.length != d2.elements.length) {
-                    return d2.elements.length - d1.elements.length
-                } else {
-                    return d1.name.localeCompare(d2.name)
-                }
-                
-            } else if (sortDatasets == "labels") {
-                if (d1.labels.length != d2.labels.length) {
-                    return d2.labels.length - d1.labels.length
-                } else {
-                    return d1.name.localeCompare(d2.name)
-                }
-                
-            }
-        })
-
-        return tempDatasets
-
-    }
-
     function sort_saved_datasets(ds) {
         let tempDatasets = [...ds]
         
         tempDatasets.sort((d1, d2) => {
             if (sortSavedDatasets == "downloads") {
-                if (d1.downloaders.length != d2.downloaders.length) {
-                    return d2.downloaders.length - d1.downloaders.length
+                if (downloadCount(d1) != downloadCount(d2)) {
+                    return downloadCount(d2) - downloadCount(d1)
                 } else {
                     return d1.name.localeCompare(d2.name)
                 }
@@ -163,14 +148,14 @@ function EvaluateModelPopup({setShowEvaluateModelPopup, model_id, currentProfile
             } else if (sortSavedDatasets == "date") {
                 return new Date(d2.created_at) - new Date(d1.created_at)
             } else if (sortSavedDatasets == "elements") {
-                if (d1.elements.length != d2.elements.length) {
-                    return d2.elements.length - d1.elements.length
+                if (elementCount(d1) != elementCount(d2)) {
+                    return elementCount(d2) - elementCount(d1)
                 } else {
                     return d1.name.localeCompare(d2.name)
                 }
             } else if (sortSavedDatasets == "labels") {
-                if (d1.labels.length != d2.labels.length) {
-                    return d2.labels.length - d1.labels.length
+                if (labelCount(d1) != labelCount(d2)) {
+                    return labelCount(d2) - labelCount(d1)
                 } else {
                     return d1.name.localeCompare(d2.name)
                 }
@@ -187,10 +172,13 @@ function EvaluateModelPopup({setShowEvaluateModelPopup, model_id, currentProfile
         }
     }, [sortSavedDatasets])
     
+    const firstSort = useRef(true)
     useEffect(() => {
-        if (!loading) {
-            setDatasets(sort_datasets(datasets))
+        if (firstSort.current) {
+            firstSort.current = false
+            return
         }
+        getDatasets()
     }, [sortDatasets])
 
 
@@ -355,10 +343,11 @@ function EvaluateModelPopup({setShowEvaluateModelPopup, model_id, currentProfile
                         </div> : "")
                     ))}
                     {!loading && datasets.length == 0 && search.length > 0 && <p className="gray-text">No such datasets found.</p>}
-                    {loading && datasets.length == 0 && currentProfile.datasetsCount > 0 && [...Array(currentProfile.datasetsCount)].map((e, i) => (
+                    {loading && datasets.length == 0 && currentProfile.datasetsCount > 0 && [...Array(Math.min(currentProfile.datasetsCount, DATASETS_PAGE_SIZE))].map((e, i) => (
                         <DatasetElementLoading key={i} BACKEND_URL={BACKEND_URL} isPublic={true} isTraining={true}/>
                     ))}
                 </div>}
+                {datasetTypeShown == "my" && !loading && <LoadMore next={nextDatasets} loading={loadingMoreDatasets} onLoad={getMoreDatasets}/>}
 
                 {savedDatasets && datasetTypeShown == "saved" && <div className="my-datasets-container" style={{padding: 0, justifyContent: "center"}}>
                     {savedDatasets.map((dataset) => (
@@ -1,18 +1,25 @@
 import React, {useState, useEffect, useRef} from "react"
 import axios from 'axios'
-import DatasetElement from "../components/DatasetElement"
+import DatasetElement, { elementCount, labelCount, downloadCount } from "../components/DatasetElement"
+import { getPage, LoadMore } from "../pagination"
 import DatasetElementLoading from "../components/DatasetElementLoading"
 import ProgressBar from "../components/ProgressBar"
 
+const DATASETS_PAGE_SIZE = 24  // Page size of dataset lists, see DatasetCursorPagination
+
 function TrainModelPopup({setShowTrainModelPopup, model_id, currentProfile, BACKEND_URL, notification, activateConfirmPopup, setModelTrained, getModel}) {
 
     const [datasets, setDatasets] = useState([])
+    const [nextDatasets, setNextDatasets] = useState(null)  // URL of the next page of datasets
     const [savedDatasets, setSavedDatasets] = useState([])
 
     const [isTraining, setIsTraining] = useState(false)
     const [trainingProgress, setTrainingProgress] = useState(0)
+    const [trainingInfo, setTrainingInfo] = useState(null)     // progress_info of the training job
 
     const [loading, setLoading] = useState(false)
+    const [loadingMoreDatasets, setLoadingMoreDatasets] = useState(false)
+    const datasetsRequest = useRef(0)   // Pages of a previous search or sort are ignored
 
     const [sortDatasets, setSortDatasets] = useState("downloads")
     const [search, setSearch] = useState("")
@@ -50,18 +57,16 @@ function TrainModelPopup({setShowTrainModelPopup, model_id, currentProfile, BACK
         }
     }, [currentProfile])
 
+    // Datasets are sorted by the server and loaded a page at a time, see LoadMore
     function getDatasets() {
         setLoading(true)
-        axios({
-            method: 'GET',
-            url: window.location.origin + '/api/my-datasets/' + (search ? "?search=" + search : ""),
-        })
-        .then((res) => {
-            if (res.data) {
-                setDatasets(sort_datasets(res.data))
-            } else {
-                setDatasets([])
-            }
+        setNextDatasets(null)
+        const request = ++datasetsRequest.current
+        getPage(window.location.origin + '/api/my-datasets/?sort=' + sortDatasets + (search ? "&search=" + encodeURIComponent(search) : ""))
+        .then((page) => {
+            if (request != datasetsRequest.current) {return}
+            setDatasets(page.results)
+            setNextDatasets(page.next)
 
         }).catch((err) => {
             notification("An error occured while loading your datasets.", "failure")
@@ -71,6 +76,84 @@ function TrainModelPopup({setShowTrainModelPopup, model_id, currentProfile, BACK
         })
     }
 
+    function getMoreDatasets() {
+        setLoadingMoreDatasets(true)
+        const request = datasetsRequest.current
+        getPage(nextDatasets)
+        .then((page) => {
+            if (request != datasetsRequest.current) {return}
+            setDatasets((datasets) => datasets.concat(page.results))
+            setNextDatasets(page.next)
+
+        }).catch((err) => {
+            notification("An error occured while loading more datasets.", "failure")
+            console.log(err)
+        }).finally(() => {
+            setLoadingMoreDatasets(false)
+        })
+    }
+
+    // Formats the progress_info of a training job for the progress bar
+    function trainingMessage(info) {
+        if (!info) {return "Training..."}
+
+        let message = "Epoch " + info.epoch + "/" + info.epochs
+        if (info.loss !== undefined) {message += ", loss " + info.loss.toFixed(3)}
+        if (info.accuracy !== undefined) {message += ", accuracy " + info.accuracy.toFixed(3)}
+        if (info.samples_per_second) {message += ", " + Math.round(info.samples_per_second) + " samples/s"}
+        if (info.eta_seconds !== null && info.eta_seconds !== undefined) {message += ", " + Math.ceil(info.eta_seconds) + "s left"}
+        return message
+    }
+
+    function trainingFinished() {
+        setTrainingProgress(100)
+
+        setTimeout(() => {
+            setIsTraining(false)
+            setTrainingProgress(0)
+            setTrainingInfo(null)
+        }, 200)
+    }
+
+    // Follows the training job through Server-Sent Events until it is done
+    function followTrainingJob(job_id) {
+        const events = new EventSource(window.location.origin + '/api/jobs/' + job_id + '/events', {withCredentials: true})
+
+        events.addEventListener("progress", (e) => {
+            const job = JSON.parse(e.data)
+            setTrainingProgress(Math.round(100 * job.progress))
+            setTrainingInfo(job.progress_info)
+        })
+
+        events.addEventListener("end", (e) => {
+            events.close()
+            const job = JSON.parse(e.data)
+
+            if (job.status == "done") {
+                notification("Successfully trained dataset.", "success")
+
+                setEpochAccuracy(job.result["accuracy"])
+                setEpochLoss(job.result["loss"])
+                setEpochAccuracyValidation(job.result["val_accuracy"])
+                setEpochLossValidation(job.result["val_loss"])
+
+                setWasTrained(true)
+            } else if (job.status == "failed") {
+                notification(job.error, "failure")
+            } else {
+                notification("Training was cancelled.", "failure")
+            }
+            trainingFinished()
+        })
+
+        events.onerror = () => {
+            if (events.readyState == EventSource.CLOSED) {
+                notification("Lost connection to the training job.", "failure")
+                trainingFinished()
+            }
+        }
+    }
+
     function trainModel(dataset_id, tensorflowDatasetSelected = "") {
         const URL = window.location.origin + '/api/train-model/'
         const config = {headers: {'Content-Type': 'application/json'}}
@@ -80,7 +163,8 @@ function TrainModelPopup({setShowTrainModelPopup, model_id, currentProfile, BACK
             "dataset": dataset_id,
             "epochs": epochs,
             "validation_split": validationSplit,
-            "tensorflow_dataset": tensorflowDatasetSelected
+            "tensorflow_dataset": tensorflowDatasetSelected,
+            "background": true
         }
 
         axios.defaults.withCredentials = true;
@@ -93,18 +177,7 @@ function TrainModelPopup({setShowTrainModelPopup, model_id, currentProfile, BACK
 
         axios.post(URL, data, config)
         .then((res) => {
-            
-            data = res.data
-            if (!data) {return}
-
-            notification("Successfully trained dataset.", "success")
-
-            setEpochAccuracy(res.data["accuracy"])
-            setEpochLoss(res.data["loss"])
-            setEpochAccuracyValidation(res.data["val_accuracy"])
-            setEpochLossValidation(res.data["val_loss"])
-
-            setWasTrained(true)
+            followTrainingJob(res.data.id)
 
         }).catch((error) => {
             console.log(error)
@@ -113,53 +186,8 @@ function TrainModelPopup({setShowTrainModelPopup, model_id, currentProfile, BACK
             } else {
                 notification("Error: " + error, "failure")
             }
-
-            
-        }).finally(() => {
-            setTrainingProgress(100)
-
-            setTimeout(() => {
-                setIsTraining(false)
-                setTrainingProgress(0)
-            }, 200)
-
-        })
-    }
-
-    function sort_datasets(ds) {
-        let tempDatasets = [...ds]
-
-        tempDatasets.sort((d1, d2) => {
-            if (sortDatasets == "downloads") {
-                if (d1.downloaders.length != d2.downloaders.length) {
-                    return d2.downloaders.length - d1.downloaders.length
-                } else {
-                    return d1.name.localeCompare(d2.name)
-                }
-                
-            } else if (sortDatasets == "alphabetical") {
-                return d1.name.localeCompare(d2.name)
-            } else if (sortDatasets == "date") {
-                return new Date(d2.created_at) - new Date(d1.created_at)
-            } else if (sortDatasets == "elements") {
-                if (d1.elements.length != d2.elements.length) {
-                    return d2.elements.length - d1.elements.length
-                } else {
-                    return d1.name.localeCompare(d2.name)
-                }
-                
-            } else if (sortDatasets == "labels") {
-                if (d1.labels.length != d2.labels.length) {
-                    return d2.labels.length - d1.labels.length
-                } else {
-                    return d1.name.localeCompare(d2.name)
-                }
-                
-            }
+            trainingFinished()
         })
-
-        return tempDatasets
-
     }
 
     function sort_saved_datasets(ds) {
@@ -167,8 +195,8 @@ function TrainModelPopup({setShowTrainModelPopup, model_id, currentProfile, BACK
         
         tempDatasets.sort((d1, d2) => {
             if (sortSavedDatasets == "downloads") {
-                if (d1.downloaders.length != d2.downloaders.length) {
-                    return d2.downloaders.length - d1.downloaders.length
+                if (downloadCount(d1) != downloadCount(d2)) {
+                    return downloadCount(d2) - downloadCount(d1)
                 } else {
                     return d1.name.localeCompare(d2.name)
                 }
@@ -177,14 +205,14 @@ function TrainModelPopup({setShowTrainModelPopup, model_id, currentProfile, BACK
             } else if (sortSavedDatasets == "date") {
                 return new Date(d2.created_at) - new Date(d1.created_at)
             } else if (sortSavedDatasets == "elements") {
-                if (d1.elements.length != d2.elements.length) {
-                    return d2.elements.length - d1.elements.length
+                if (elementCount(d1) != elementCount(d2)) {
+                    return elementCount(d2) - elementCount(d1)
                 } else {
                     return d1.name.localeCompare(d2.name)
                 }
             } else if (sortSavedDatasets == "labels") {
-                if (d1.labels.length != d2.labels.length) {
-                    return d2.labels.length - d1.labels.length
+                if (labelCount(d1) != labelCount(d2)) {
+                    return labelCount(d2) - labelCount(d1)
                 } else {
                     return d1.name.localeCompare(d2.name)
                 }
@@ -201,10 +229,13 @@ function TrainModelPopup({setShowTrainModelPopup, model_id, currentProfile, BACK
         }
     }, [sortSavedDatasets])
     
+    const firstSort = useRef(true)
     useEffect(() => {
-        if (!loading) {
-            setDatasets(sort_datasets(datasets))
+        if (firstSort.current) {
+            firstSort.current = false
+            return
         }
+        getDatasets()
     }, [sortDatasets])
 
 
@@ -277,7 +308,7 @@ function TrainModelPopup({setShowTrainModelPopup, model_id, currentProfile, BACK
             }
         }}>
 
-            {isTraining && <ProgressBar progress={trainingProgress} message="Training..." BACKEND_URL={BACKEND_URL}></ProgressBar>}
+            {isTraining && <ProgressBar progress={trainingProgress} message={trainingMessage(trainingInfo)} BACKEND_URL={BACKEND_URL}></ProgressBar>}
 
             {!wasTrained && <div className="train-model-popup-container" onClick={(e) => {
                 e.stopPropagation()
@@ -453,10 +484,11 @@ function TrainModelPopup({setShowTrainModelPopup, model_id, currentProfile, BACK
                         </div> : "")
                     ))}
                     {!loading && datasets.length == 0 && search.length > 0 && <p className="gray-text">No such datasets found.</p>}
-                    {loading && datasets.length == 0 && currentProfile.datasetsCount > 0 && [...Array(currentProfile.datasetsCount)].map((e, i) => (
+                    {loading && datasets.length == 0 && currentProfile.datasetsCount > 0 && [...Array(Math.min(currentProfile.datasetsCount, DATASETS_PAGE_SIZE))].map((e, i) => (
                         <DatasetElementLoading key={i} BACKEND_URL={BACKEND_URL} isPublic={true} isTraining={true}/>
                     ))}
                 </div>}
+                {datasetTypeShown == "my" && !loading && <LoadMore next={nextDatasets} loading={loadingMoreDatasets} onLoad={getMoreDatasets}/>}
 
                 {savedDatasets && datasetTypeShown == "saved" && <div className="my-datasets-container" style={{padding: 0, justifyContent: "center"}}>
                     {savedDatasets.map((dataset) => (